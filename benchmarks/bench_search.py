@@ -0,0 +1,111 @@
+"""
+Benchmark for Database.search() on a large synthetic complaints table.
+
+Usage:
+    python benchmarks/bench_search.py --rows 100000
+"""
+import os
+import sys
+import time
+import random
+import itertools
+import sqlite3
+import argparse
+import tempfile
+import statistics
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import Database
+
+TOPIC_WORDS = (
+    "cobrança indevida cartão tag pedágio estorno atendimento demora cancelamento "
+    "reembolso fatura aplicativo erro cadastro veículo placa bloqueio saldo recarga "
+    "débito automático protocolo suporte telefone email resposta prazo valor multa"
+).split()
+
+# Large filler vocabulary so topic words only match a realistic share of rows
+FILLER_WORDS = [f"palavra{i}" for i in range(20000)]
+
+QUERIES = [
+    ("texto simples", {"query": "estorno"}),
+    ("prefixo", {"query": "cancel"}),
+    ("vários termos", {"query": "cobrança indevida cartão"}),
+    ("texto + status", {"query": "pedágio", "status": "failed"}),
+    ("texto + datas", {"query": "reembolso", "date_from": "2024-03-01", "date_to": "2024-03-31"}),
+    ("só filtros", {"status": "completed", "date_from": "2024-06-01"}),
+    ("página profunda", {"query": "fatura", "page": 50}),
+]
+
+
+def text(filler_weights, length):
+    """Build a pseudo-complaint of `length` words with a few topic words."""
+    words = random.choices(FILLER_WORDS, cum_weights=filler_weights, k=length)
+    words += random.sample(TOPIC_WORDS, k=3)
+    random.shuffle(words)
+    return " ".join(words)
+
+
+def populate(db_path, rows, seed=42):
+    """Fill a fresh database with synthetic complaints."""
+    random.seed(seed)
+    filler_weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(FILLER_WORDS))))
+    Database(db_path=db_path)
+
+    start = datetime(2024, 1, 1)
+    conn = sqlite3.connect(db_path)
+    data = []
+    for i in range(rows):
+        created = int((start + timedelta(minutes=5 * i)).timestamp())
+        data.append((
+            f"BENCH-{i}",
+            f"Cliente {i}",
+            text(filler_weights, random.randint(30, 120)),
+            text(filler_weights, random.randint(20, 60)),
+            "completed" if random.random() < 0.85 else "failed",
+            created,
+            created
+        ))
+    conn.executemany(
+        "INSERT INTO complaints (complaint_id, customer_name, complaint_text, response_text, "
+        "status, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        data
+    )
+    conn.commit()
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100000, help="Number of complaints to generate")
+    parser.add_argument("--repeat", type=int, default=20, help="Runs per query")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+
+        t0 = time.perf_counter()
+        populate(db_path, args.rows)
+        print(f"Populated {args.rows} rows in {time.perf_counter() - t0:.1f}s")
+
+        db = Database(db_path=db_path)
+
+        t0 = time.perf_counter()
+        db.rebuild_search_index()
+        print(f"Rebuilt search index in {time.perf_counter() - t0:.1f}s\n")
+
+        print(f"{'consulta':<18}{'total':>8}{'p50 ms':>10}{'p95 ms':>10}")
+        for name, params in QUERIES:
+            timings = []
+            for _ in range(args.repeat):
+                t0 = time.perf_counter()
+                result = db.search(**params)
+                timings.append((time.perf_counter() - t0) * 1000)
+            timings.sort()
+            p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+            print(f"{name:<18}{result['total']:>8}{statistics.median(timings):>10.1f}{p95:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
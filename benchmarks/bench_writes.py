@@ -0,0 +1,106 @@
+"""
+Benchmark of complaint writes: one commit per row versus batched transactions.
+
+Reports rows/sec for save_complaint() in a loop, save_complaints_bulk() in
+group commits of --batch-size rows, a single bulk transaction, and the same
+bulk upsert over rows that already exist (re-processing).
+
+Usage:
+    python benchmarks/bench_writes.py --sizes 1000 100000
+    python benchmarks/bench_writes.py --database-url postgresql://localhost/bench
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import open_database
+
+WORDS = (
+    "comprei tag pedágio cobrança indevida cartão estorno atendimento demora "
+    "cancelamento reembolso fatura aplicativo erro cadastro veículo placa bloqueio"
+).split()
+
+
+def make_complaints(count, prefix, seed=42):
+    """Build `count` synthetic complaint dicts."""
+    rng = random.Random(seed)
+    return [
+        {
+            "complaint_id": f"{prefix}-{i}",
+            "customer_name": f"Cliente {i}",
+            "complaint_text": " ".join(rng.choices(WORDS, k=rng.randint(40, 200))),
+            "response_text": " ".join(rng.choices(WORDS, k=rng.randint(20, 60))),
+            "status": "completed" if rng.random() < 0.9 else "failed"
+        }
+        for i in range(count)
+    ]
+
+
+def per_row(db, complaints):
+    for complaint in complaints:
+        db.save_complaint(
+            complaint_id=complaint["complaint_id"],
+            customer_name=complaint["customer_name"],
+            complaint_text=complaint["complaint_text"],
+            response_text=complaint["response_text"],
+            status=complaint["status"]
+        )
+
+
+def batched(batch_size):
+    def run(db, complaints):
+        for start in range(0, len(complaints), batch_size):
+            db.save_complaints_bulk(complaints[start:start + batch_size])
+    return run
+
+
+def single_transaction(db, complaints):
+    db.save_complaints_bulk(complaints)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 100000], help="Rows to write")
+    parser.add_argument("--batch-size", type=int, default=10, help="Rows per group commit")
+    parser.add_argument("--max-per-row", type=int, default=10000,
+                        help="Skip the one-commit-per-row mode above this size (it is slow)")
+    parser.add_argument("--database-url", help="Benchmark this database instead of a temporary SQLite file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = open_database(args.database_url or os.path.join(tmp, "bench.db"))
+
+        modes = [
+            ("um commit por linha", per_row),
+            (f"lotes de {args.batch_size}", batched(args.batch_size)),
+            ("uma transação", single_transaction),
+        ]
+
+        print(f"{'linhas':>8}  {'modo':<22}{'tempo (s)':>11}{'linhas/s':>12}")
+        for size in args.sizes:
+            for name, run in modes:
+                if run is per_row and size > args.max_per_row:
+                    print(f"{size:>8}  {name:<22}{'ignorado':>11}")
+                    continue
+
+                complaints = make_complaints(size, prefix=f"{name}-{size}")
+                t0 = time.perf_counter()
+                run(db, complaints)
+                elapsed = time.perf_counter() - t0
+                print(f"{size:>8}  {name:<22}{elapsed:>11.2f}{size / elapsed:>12.0f}")
+
+                # Same rows again: every insert takes the ON CONFLICT update path
+                if run is single_transaction:
+                    t0 = time.perf_counter()
+                    run(db, complaints)
+                    elapsed = time.perf_counter() - t0
+                    print(f"{size:>8}  {'upsert (existentes)':<22}{elapsed:>11.2f}{size / elapsed:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Local OpenAI-compatible stub for the chat completions endpoint.
+
+Point the OpenAI client at it with OPENAI_BASE_URL=<url>/v1. Every request
+waits for a configurable latency and returns a canned response with a usage
+block, so token and cost accounting work as in production.
+"""
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+RESPONSE_TEXT = (
+    "Olá! Lamentamos muito pelo transtorno. Analisamos o seu caso e já "
+    "encaminhamos a solicitação para a equipe responsável, que entrará em "
+    "contato em até 48 horas úteis. Agradecemos a oportunidade de resolver "
+    "a situação."
+)
+
+
+class MockOpenAIServer:
+    """Threaded HTTP server answering POST /v1/chat/completions."""
+
+    def __init__(self, latency=0.0, response_text=RESPONSE_TEXT, port=0):
+        """
+        Initialize the stub.
+
+        Args:
+            latency (float, optional): Delay in seconds before each response
+            response_text (str, optional): Content returned for every completion
+            port (int, optional): Port to listen on; 0 picks a free one
+        """
+        self.latency = latency
+        self.response_text = response_text
+        self.requests = 0
+        self._lock = threading.Lock()
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler_class())
+        self._server.daemon_threads = True
+
+    @property
+    def url(self):
+        """Value for OPENAI_BASE_URL."""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        """Serve requests on a background thread."""
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        """Shut the server down."""
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _handler_class(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                payload = json.loads(self.rfile.read(length) or b"{}")
+
+                if not self.path.rstrip("/").endswith("/chat/completions"):
+                    self.send_error(404)
+                    return
+
+                time.sleep(stub.latency)
+                with stub._lock:
+                    stub.requests += 1
+                    request_number = stub.requests
+
+                prompt_chars = sum(len(message.get("content", "")) for message in payload.get("messages", []))
+                prompt_tokens = prompt_chars // 4 + 1
+                completion_tokens = len(stub.response_text) // 4 + 1
+
+                body = json.dumps({
+                    "id": f"chatcmpl-mock-{request_number}",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": payload.get("model", "gpt-4o"),
+                    "choices": [{
+                        "index": 0,
+                        "message": {"role": "assistant", "content": stub.response_text},
+                        "finish_reason": "stop"
+                    }],
+                    "usage": {
+                        "prompt_tokens": prompt_tokens,
+                        "completion_tokens": completion_tokens,
+                        "total_tokens": prompt_tokens + completion_tokens
+                    }
+                }).encode("utf-8")
+
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        return Handler
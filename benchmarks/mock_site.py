@@ -0,0 +1,162 @@
+"""
+Local stand-in for the Reclame Aqui company dashboard.
+
+Serves the pages ReclamaBot navigates (login, new complaints list, complaint
+details and the response form) with a configurable number of complaints and
+a configurable delay on every request.
+"""
+import html
+import time
+import random
+import threading
+from urllib.parse import parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+WORDS = (
+    "comprei tag pedágio cobrança indevida cartão estorno atendimento demora "
+    "cancelamento reembolso fatura aplicativo erro cadastro veículo placa bloqueio "
+    "saldo recarga débito protocolo suporte telefone resposta prazo valor multa "
+    "não consigo resolver já liguei várias vezes ninguém retorna preciso urgente"
+).split()
+
+PAGE = """<!DOCTYPE html>
+<html lang="pt-br"><head><meta charset="utf-8"><title>{title}</title></head>
+<body>{body}</body></html>"""
+
+
+class MockReclameAquiSite:
+    """Threaded HTTP server with the pages used by ReclamaBot."""
+
+    def __init__(self, complaints=10, latency=0.0, words=(40, 200), seed=42, port=0):
+        """
+        Initialize the fixture site.
+
+        Args:
+            complaints (int, optional): Number of new complaints listed
+            latency (float, optional): Delay in seconds added to every request
+            words (tuple, optional): Min and max words per complaint text
+            seed (int, optional): Random seed for the generated complaints
+            port (int, optional): Port to listen on; 0 picks a free one
+        """
+        self.latency = latency
+        self.submitted = {}
+        self._lock = threading.Lock()
+
+        rng = random.Random(seed)
+        self.complaints = {}
+        for i in range(complaints):
+            complaint_id = f"MOCK-{i:06d}"
+            self.complaints[complaint_id] = {
+                "customer_name": f"Cliente {i}",
+                "text": " ".join(rng.choices(WORDS, k=rng.randint(*words))).capitalize() + "."
+            }
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        """Base URL to pass to ReclamaBot."""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        """Serve requests on a background thread."""
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Shut the server down."""
+        self._server.shutdown()
+        self._server.server_close()
+
+    def pending(self):
+        """Return the IDs of complaints that have not been answered yet."""
+        with self._lock:
+            return [cid for cid in self.complaints if cid not in self.submitted]
+
+    def _handler_class(self):
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, body, title="Reclame Aqui", status=200):
+                content = PAGE.format(title=title, body=body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            def _redirect(self, location):
+                self.send_response(303)
+                self.send_header("Location", location)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def _form(self):
+                length = int(self.headers.get("Content-Length", 0))
+                return parse_qs(self.rfile.read(length).decode("utf-8"))
+
+            def do_GET(self):
+                time.sleep(site.latency)
+                path = self.path.split("?")[0].rstrip("/")
+                parts = path.split("/")
+
+                if path == "/login":
+                    self._send(
+                        '<form method="post" action="/login">'
+                        '<input id="email" name="email" type="email">'
+                        '<input id="password" name="password" type="password">'
+                        '<button type="submit">Entrar</button></form>',
+                        title="Login"
+                    )
+                elif path == "/empresa/dashboard":
+                    self._send("<h1>Painel da empresa</h1>", title="Dashboard")
+                elif path == "/empresa/dashboard/reclamacoes/novas":
+                    items = "".join(
+                        f'<a class="complaint-list-item" data-id="{cid}" '
+                        f'href="/empresa/reclamacao/{cid}/detalhes" style="display:block">'
+                        f'<span class="customer-name">{html.escape(site.complaints[cid]["customer_name"])}</span>'
+                        f'</a>'
+                        for cid in site.pending()
+                    )
+                    self._send(f"<h1>Reclamações novas</h1>{items}", title="Novas")
+                elif len(parts) == 5 and parts[1:3] == ["empresa", "reclamacao"] and parts[4] == "detalhes":
+                    complaint = site.complaints.get(parts[3])
+                    if complaint is None:
+                        self._send("Não encontrada", status=404)
+                        return
+                    self._send(f'<div class="complaint-text">{html.escape(complaint["text"])}</div>')
+                elif len(parts) == 4 and parts[1:3] == ["empresa", "reclamacao"]:
+                    if parts[3] not in site.complaints:
+                        self._send("Não encontrada", status=404)
+                        return
+                    self._send(
+                        f'<form method="post" action="/empresa/reclamacao/{parts[3]}">'
+                        '<textarea class="response-field" name="response"></textarea>'
+                        '<button type="submit" class="submit-response">Responder</button></form>'
+                    )
+                else:
+                    self._send("Não encontrada", status=404)
+
+            def do_POST(self):
+                time.sleep(site.latency)
+                path = self.path.split("?")[0].rstrip("/")
+                parts = path.split("/")
+                form = self._form()
+
+                if path == "/login":
+                    self._redirect("/empresa/dashboard")
+                elif len(parts) == 4 and parts[1:3] == ["empresa", "reclamacao"] and parts[3] in site.complaints:
+                    with site._lock:
+                        site.submitted[parts[3]] = form.get("response", [""])[0]
+                    self._send('<div class="success-message">Resposta enviada</div>')
+                else:
+                    self._send("Não encontrada", status=404)
+
+        return Handler
@@ -0,0 +1,175 @@
+"""
+End-to-end benchmark of process_complaints against local mock services.
+
+Each size runs in its own subprocess with a fresh database, a mock Reclame
+Aqui site and a mock OpenAI server, and reports cycle time, per-stage
+breakdown, complaints per minute and peak RSS. Needs a local Chrome or
+Firefox with its WebDriver, like the bot itself.
+
+Usage:
+    python benchmarks/run_benchmark.py --sizes 10 100 1000
+    python benchmarks/run_benchmark.py --output results.json
+    python benchmarks/run_benchmark.py --baseline results.json --max-regression 0.1
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import tempfile
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_worker(args):
+    """Run one processing cycle and print its results as JSON."""
+    from mock_site import MockReclameAquiSite
+    from mock_openai import MockOpenAIServer
+
+    site = MockReclameAquiSite(complaints=args.worker, latency=args.site_latency).start()
+    openai_stub = MockOpenAIServer(latency=args.openai_latency).start()
+    tmp = tempfile.mkdtemp(prefix="reclamebot-bench-")
+
+    os.environ.update({
+        "RECLAMEAQUI_EMAIL": "bench@example.com",
+        "RECLAMEAQUI_PASSWORD": "bench",
+        "RECLAMEAQUI_BASE_URL": site.url,
+        "OPENAI_API_KEY": "sk-bench",
+        "OPENAI_BASE_URL": openai_stub.url,
+        "BROWSER_TYPE": args.browser,
+        "DATABASE_PATH": os.path.join(tmp, "bench.db"),
+        "LOG_FILE": os.path.join(tmp, "bench.log"),
+        "LOG_LEVEL": "WARNING",
+        "COMPLAINT_DELAY_SECONDS": "2" if args.realistic_delays else "0",
+        "TYPING_DELAY_SECONDS": "0.01" if args.realistic_delays else "0",
+    })
+
+    import main
+    import metrics
+
+    start = time.perf_counter()
+    main.process_complaints()
+    cycle_seconds = time.perf_counter() - start
+
+    processed = len(site.submitted)
+    site.stop()
+    openai_stub.stop()
+
+    print(json.dumps({
+        "complaints": args.worker,
+        "processed": processed,
+        "cycle_seconds": cycle_seconds,
+        "complaints_per_minute": processed / cycle_seconds * 60 if cycle_seconds else 0.0,
+        # ru_maxrss is in KiB on Linux; children covers the WebDriver and browser
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "peak_child_rss_mb": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024,
+        "openai_requests": openai_stub.requests,
+        "stages": metrics.summary()["stages"],
+        "triage": metrics.summary()["triage"],
+    }))
+
+
+def run_size(size, args):
+    """Run the worker for one size in a fresh interpreter."""
+    command = [
+        sys.executable, os.path.abspath(__file__),
+        "--worker", str(size),
+        "--site-latency", str(args.site_latency),
+        "--openai-latency", str(args.openai_latency),
+        "--browser", args.browser,
+    ]
+    if args.realistic_delays:
+        command.append("--realistic-delays")
+
+    completed = subprocess.run(command, cwd=ROOT, capture_output=True, text=True)
+    if completed.returncode != 0:
+        sys.stderr.write(completed.stderr)
+        raise RuntimeError(f"Benchmark worker for {size} complaints failed")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def print_report(results):
+    """Print a summary table and the per-stage breakdown of each run."""
+    print(f"{'reclamações':>12}{'processadas':>13}{'ciclo (s)':>12}{'por minuto':>12}{'RSS (MB)':>10}{'RSS filhos':>12}")
+    for result in results:
+        print(
+            f"{result['complaints']:>12}{result['processed']:>13}{result['cycle_seconds']:>12.1f}"
+            f"{result['complaints_per_minute']:>12.1f}{result['peak_rss_mb']:>10.0f}{result['peak_child_rss_mb']:>12.0f}"
+        )
+
+    for result in results:
+        print(f"\n{result['complaints']} reclamações")
+        print(f"  {'etapa':<28}{'n':>6}{'total (s)':>11}{'média (s)':>11}{'p95 (s)':>10}")
+        for stage in result["stages"]:
+            total = stage["mean"] * stage["count"]
+            print(
+                f"  {stage['label']:<28}{stage['count']:>6}{total:>11.2f}"
+                f"{stage['mean']:>11.3f}{stage['p95']:>10.3f}"
+            )
+        triage = result.get("triage")
+        if triage and triage["total"]:
+            routes = ", ".join(f"{route}: {count}" for route, count in sorted(triage["routes"].items()))
+            print(
+                f"  triagem: {triage['fast_path']:.0%} sem o modelo principal ({routes}), "
+                f"{triage['seconds_saved']:.1f}s economizados"
+            )
+
+
+def check_regression(results, baseline_path, max_regression):
+    """
+    Compare throughput against a saved run.
+
+    Returns:
+        bool: True if no size is slower than the baseline by more than `max_regression`
+    """
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {result["complaints"]: result for result in json.load(f)}
+
+    ok = True
+    for result in results:
+        previous = baseline.get(result["complaints"])
+        if not previous or not previous["complaints_per_minute"]:
+            continue
+        change = result["complaints_per_minute"] / previous["complaints_per_minute"] - 1
+        status = "OK" if change >= -max_regression else "REGRESSÃO"
+        ok = ok and status == "OK"
+        print(f"{result['complaints']:>6} reclamações: {change:+.1%} por minuto vs. baseline [{status}]")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000], help="Complaint counts to run")
+    parser.add_argument("--site-latency", type=float, default=0.05, help="Mock site delay per request (s)")
+    parser.add_argument("--openai-latency", type=float, default=1.0, help="Mock OpenAI delay per request (s)")
+    parser.add_argument("--browser", default="chrome", choices=["chrome", "firefox"])
+    parser.add_argument("--realistic-delays", action="store_true",
+                        help="Keep the anti-bot typing and per-complaint pauses")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--baseline", help="JSON results of a previous run to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.10,
+                        help="Allowed throughput drop versus the baseline (fraction)")
+    parser.add_argument("--worker", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker is not None:
+        run_worker(args)
+        return
+
+    results = [run_size(size, args) for size in args.sizes]
+    print_report(results)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline and not check_regression(results, args.baseline, args.max_regression):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
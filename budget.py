@@ -0,0 +1,229 @@
+import os
+import time
+import logging
+import threading
+from datetime import date
+
+logger = logging.getLogger(__name__)
+
+# USD per 1M tokens (input, cached input, output); update when OpenAI pricing changes
+MODEL_PRICES = {
+    "gpt-4o": (2.50, 1.25, 10.00),
+    "gpt-4o-mini": (0.15, 0.075, 0.60),
+    "gpt-4.1": (2.00, 0.50, 8.00),
+    "gpt-4.1-mini": (0.40, 0.10, 1.60),
+    "gpt-4.1-nano": (0.10, 0.025, 0.40),
+}
+
+
+def estimate_cost(model, prompt_tokens, completion_tokens, cached_tokens=0):
+    """
+    Estimate the cost of a completion.
+
+    Args:
+        model (str): Model name as returned by the API
+        prompt_tokens (int): Input tokens, including cached ones
+        completion_tokens (int): Output tokens
+        cached_tokens (int, optional): Input tokens served from the prompt cache
+
+    Returns:
+        float: Cost in USD, or 0.0 if the model has no known price
+    """
+    prices = MODEL_PRICES.get(model)
+    if prices is None:
+        # Dated snapshots such as "gpt-4o-2024-08-06" share the base model price
+        prices = next(
+            (price for name, price in sorted(MODEL_PRICES.items(), key=lambda item: -len(item[0]))
+             if model.startswith(name + "-")),
+            None
+        )
+    if prices is None:
+        logger.warning("No price configured for model %s; cost recorded as 0", model)
+        return 0.0
+
+    input_price, cached_price, output_price = prices
+    uncached_tokens = prompt_tokens - cached_tokens
+    return (
+        uncached_tokens * input_price + cached_tokens * cached_price + completion_tokens * output_price
+    ) / 1_000_000
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled continuously up to its capacity."""
+
+    def __init__(self, capacity, refill_per_second, clock=time.monotonic):
+        """
+        Initialize a full bucket.
+
+        Args:
+            capacity (float): Maximum number of tokens in the bucket
+            refill_per_second (float): Tokens added per second
+            clock (callable, optional): Returns the current time in seconds
+        """
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self._clock = clock
+        self._tokens = capacity
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.refill_per_second)
+        self._updated = now
+
+    def reserve(self, amount):
+        """
+        Take `amount` tokens, allowing the balance to go negative.
+
+        Args:
+            amount (float): Tokens to take; requests larger than the capacity
+                are clamped so they can eventually proceed
+
+        Returns:
+            float: Seconds the caller must wait before proceeding
+        """
+        with self._lock:
+            self._refill()
+            self._tokens -= min(amount, self.capacity)
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.refill_per_second
+
+    def adjust(self, amount):
+        """
+        Return (positive) or take (negative) tokens after the real cost is known.
+
+        Args:
+            amount (float): Tokens to add back to the bucket
+        """
+        with self._lock:
+            self._refill()
+            self._tokens = min(self.capacity, self._tokens + amount)
+
+
+class RateLimiter:
+    """Client-side limiter for OpenAI requests per minute and tokens per minute."""
+
+    def __init__(self, requests_per_minute=0, tokens_per_minute=0, clock=time.monotonic, sleep=time.sleep):
+        """
+        Initialize the limiter. A limit of 0 disables that bucket.
+
+        Args:
+            requests_per_minute (int, optional): Maximum requests per minute
+            tokens_per_minute (int, optional): Maximum tokens per minute
+            clock (callable, optional): Returns the current time in seconds
+            sleep (callable, optional): Waits the given number of seconds
+        """
+        self.requests = (
+            TokenBucket(requests_per_minute, requests_per_minute / 60, clock) if requests_per_minute else None
+        )
+        self.tokens = TokenBucket(tokens_per_minute, tokens_per_minute / 60, clock) if tokens_per_minute else None
+        self._sleep = sleep
+
+    def acquire(self, estimated_tokens):
+        """
+        Block until a request of `estimated_tokens` fits in both buckets.
+
+        Args:
+            estimated_tokens (int): Expected prompt plus completion tokens
+
+        Returns:
+            float: Seconds spent waiting
+        """
+        wait = 0.0
+        if self.requests:
+            wait = max(wait, self.requests.reserve(1))
+        if self.tokens:
+            wait = max(wait, self.tokens.reserve(estimated_tokens))
+
+        if wait > 0:
+            logger.info("OpenAI rate limit reached; waiting %.1fs", wait)
+            self._sleep(wait)
+        return wait
+
+    def record_usage(self, estimated_tokens, actual_tokens):
+        """
+        Correct the token bucket once the real usage of a request is known.
+
+        Args:
+            estimated_tokens (int): Tokens reserved by `acquire`
+            actual_tokens (int): Tokens reported by the API
+        """
+        if self.tokens:
+            self.tokens.adjust(estimated_tokens - actual_tokens)
+
+
+class BudgetGuard:
+    """Pick the model for the next request based on today's OpenAI spend."""
+
+    def __init__(self, db, daily_budget=0.0, soft_limit_ratio=0.8, fallback_model="gpt-4o-mini"):
+        """
+        Initialize the guard.
+
+        Args:
+            db (Database): Database holding the recorded usage
+            daily_budget (float, optional): Daily spend limit in USD; 0 disables the guard
+            soft_limit_ratio (float, optional): Fraction of the budget after which
+                the fallback model is used
+            fallback_model (str, optional): Cheaper model used past the soft limit
+        """
+        self.db = db
+        self.daily_budget = daily_budget
+        self.soft_limit_ratio = soft_limit_ratio
+        self.fallback_model = fallback_model
+
+    def select_model(self, default_model):
+        """
+        Choose the model for the next request.
+
+        Args:
+            default_model (str): Model used while spend is below the soft limit
+
+        Returns:
+            str: Model to use, or None when the daily budget is exhausted and
+            the work should wait for the next day
+        """
+        if not self.daily_budget:
+            return default_model
+
+        spent = self.db.get_usage_cost(since=date.today().isoformat())
+        if spent >= self.daily_budget:
+            logger.warning("Daily OpenAI budget of $%.2f reached ($%.2f spent)", self.daily_budget, spent)
+            return None
+        if spent >= self.daily_budget * self.soft_limit_ratio:
+            logger.info("OpenAI spend at $%.2f of $%.2f; using %s", spent, self.daily_budget, self.fallback_model)
+            return self.fallback_model
+        return default_model
+
+    @classmethod
+    def from_env(cls, db):
+        """Create a guard configured by OPENAI_DAILY_BUDGET_USD, OPENAI_BUDGET_SOFT_LIMIT and OPENAI_FALLBACK_MODEL."""
+        return cls(
+            db,
+            daily_budget=float(os.getenv("OPENAI_DAILY_BUDGET_USD", "0")),
+            soft_limit_ratio=float(os.getenv("OPENAI_BUDGET_SOFT_LIMIT", "0.8")),
+            fallback_model=os.getenv("OPENAI_FALLBACK_MODEL", "gpt-4o-mini"),
+        )
+
+
+_rate_limiter = None
+_rate_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter():
+    """
+    Get the process-wide rate limiter configured by OPENAI_RPM_LIMIT and OPENAI_TPM_LIMIT.
+
+    Returns:
+        RateLimiter: Limiter shared by every IAResponder in the process
+    """
+    global _rate_limiter
+
+    with _rate_limiter_lock:
+        if _rate_limiter is None:
+            _rate_limiter = RateLimiter(
+                requests_per_minute=int(os.getenv("OPENAI_RPM_LIMIT", "0")),
+                tokens_per_minute=int(os.getenv("OPENAI_TPM_LIMIT", "0")),
+            )
+        return _rate_limiter
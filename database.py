@@ -1,11 +1,76 @@
-import os
+import time
 import sqlite3
 import json
 import logging
-from datetime import datetime
+from datetime import datetime, timedelta
+from metrics import DB_SECONDS
 
 logger = logging.getLogger(__name__)
 
+# Insert a complaint, or update it when it is processed again. The original
+# created_at is kept so the complaint stays in place in date-ordered lists.
+UPSERT_COMPLAINT_SQL = """
+    INSERT INTO complaints (
+        complaint_id, customer_name, complaint_text,
+        response_text, status, created_at, updated_at, company_id
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (complaint_id) DO UPDATE SET
+        customer_name = excluded.customer_name,
+        complaint_text = excluded.complaint_text,
+        response_text = excluded.response_text,
+        status = excluded.status,
+        updated_at = excluded.updated_at,
+        company_id = COALESCE(excluded.company_id, complaints.company_id)
+"""
+
+# Record how far a company's run has walked its list of new complaints
+SAVE_CHECKPOINT_SQL = """
+    INSERT OR REPLACE INTO scrape_checkpoints
+        (company_key, run_id, position, total, last_complaint_id, updated_at)
+    VALUES (?, ?, ?, ?, ?, ?)
+"""
+
+def open_database(url):
+    """
+    Open the storage backend for a database URL or path.
+    
+    Args:
+        url (str): A postgresql:// URL for PostgreSQL, or a SQLite file path
+            (optionally written as sqlite:///path)
+        
+    Returns:
+        Database: SQLite `Database` or `PostgresDatabase` instance
+    """
+    if url.startswith(("postgresql:", "postgresql+", "postgres:")):
+        # Imported lazily so SQLite installs do not need SQLAlchemy/psycopg2
+        from postgres_database import PostgresDatabase
+        
+        # SQLAlchemy only accepts the postgresql:// scheme
+        if url.startswith("postgres:"):
+            url = "postgresql:" + url[len("postgres:"):]
+        return PostgresDatabase(url)
+    
+    if url.startswith("sqlite:///"):
+        url = url[len("sqlite:///"):]
+    return Database(db_path=url)
+
+# Complaint columns without the large text ones, for list and count queries
+COMPLAINT_SUMMARY_COLUMNS = "complaint_id, customer_name, status, created_at, updated_at, company_id"
+
+def _epoch(value):
+    """Convert a datetime or date to integer seconds since the epoch."""
+    if not isinstance(value, datetime):
+        value = datetime.combine(value, datetime.min.time())
+    return int(value.timestamp())
+
+def _complaint_dict(row):
+    """Convert a complaint row to a dict with ISO timestamps, as the templates and exports expect."""
+    complaint = dict(row)
+    for key in ("created_at", "updated_at"):
+        if isinstance(complaint.get(key), int):
+            complaint[key] = datetime.fromtimestamp(complaint[key]).isoformat()
+    return complaint
+
 class Database:
     """Class for handling local storage of complaint data and response status."""
     
@@ -18,7 +83,7 @@ class Database:
         """
         self.db_path = db_path
         self._create_tables()
-        logger.info(f"Database initialized at {db_path}")
+        logger.info("Database initialized at %s", db_path)
     
     def _create_tables(self):
         """Create necessary database tables if they don't exist."""
@@ -34,23 +99,188 @@ class Database:
                     complaint_text TEXT,
                     response_text TEXT,
                     status TEXT,
+                    created_at INTEGER,
+                    updated_at INTEGER,
+                    company_id INTEGER
+                )
+            ''')
+
+            # Databases created before multi-company support lack company_id
+            cursor.execute("PRAGMA table_info(complaints)")
+            complaint_columns = {row[1]: row[2] for row in cursor.fetchall()}
+            if "company_id" not in complaint_columns:
+                cursor.execute("ALTER TABLE complaints ADD COLUMN company_id INTEGER")
+
+            # Older databases store timestamps as ISO text
+            if complaint_columns["created_at"].upper() == "TEXT":
+                self._migrate_epoch_timestamps(cursor)
+
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_complaints_created_at ON complaints(created_at)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_complaints_status_created_at ON complaints(status, created_at)")
+            cursor.execute(
+                "CREATE INDEX IF NOT EXISTS idx_complaints_customer_created_at ON complaints(customer_name, created_at)"
+            )
+            cursor.execute(
+                "CREATE INDEX IF NOT EXISTS idx_complaints_company_created_at ON complaints(company_id, created_at)"
+            )
+            cursor.execute(
+                "CREATE INDEX IF NOT EXISTS idx_complaints_company_status_created_at "
+                "ON complaints(company_id, status, created_at)"
+            )
+
+            # Create companies table (one row per Reclame Aqui account)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS companies (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    name TEXT NOT NULL UNIQUE,
+                    email TEXT NOT NULL,
+                    password TEXT NOT NULL,
+                    system_prompt TEXT,
+                    check_interval_minutes INTEGER NOT NULL DEFAULT 60,
+                    browser_type TEXT NOT NULL DEFAULT 'chrome',
+                    active INTEGER NOT NULL DEFAULT 1,
                     created_at TEXT,
                     updated_at TEXT
                 )
             ''')
+
+            # Create the full-text index over complaint and response text.
+            # It is an external-content table: the text lives only in
+            # `complaints` and the triggers below keep the index in sync.
+            cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'complaints_fts'"
+            )
+            fts_exists = cursor.fetchone() is not None
+
+            cursor.execute('''
+                CREATE VIRTUAL TABLE IF NOT EXISTS complaints_fts USING fts5(
+                    complaint_text,
+                    response_text,
+                    content='complaints',
+                    content_rowid='rowid',
+                    tokenize='unicode61 remove_diacritics 2'
+                )
+            ''')
+
+            cursor.execute('''
+                CREATE TRIGGER IF NOT EXISTS complaints_fts_insert AFTER INSERT ON complaints BEGIN
+                    INSERT INTO complaints_fts(rowid, complaint_text, response_text)
+                    VALUES (new.rowid, new.complaint_text, new.response_text);
+                END
+            ''')
+            cursor.execute('''
+                CREATE TRIGGER IF NOT EXISTS complaints_fts_delete AFTER DELETE ON complaints BEGIN
+                    INSERT INTO complaints_fts(complaints_fts, rowid, complaint_text, response_text)
+                    VALUES ('delete', old.rowid, old.complaint_text, old.response_text);
+                END
+            ''')
+            cursor.execute('''
+                CREATE TRIGGER IF NOT EXISTS complaints_fts_update
+                AFTER UPDATE OF complaint_text, response_text ON complaints BEGIN
+                    INSERT INTO complaints_fts(complaints_fts, rowid, complaint_text, response_text)
+                    VALUES ('delete', old.rowid, old.complaint_text, old.response_text);
+                    INSERT INTO complaints_fts(rowid, complaint_text, response_text)
+                    VALUES (new.rowid, new.complaint_text, new.response_text);
+                END
+            ''')
+
+            # Create OpenAI usage table (one row per API call)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS ai_usage (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    complaint_id TEXT,
+                    run_id TEXT,
+                    model TEXT,
+                    prompt_tokens INTEGER,
+                    completion_tokens INTEGER,
+                    cached_tokens INTEGER DEFAULT 0,
+                    saved_tokens INTEGER DEFAULT 0,
+                    latency_ms INTEGER,
+                    cost_usd REAL,
+                    created_at TEXT
+                )
+            ''')
+            cursor.execute("PRAGMA table_info(ai_usage)")
+            usage_columns = {row[1] for row in cursor.fetchall()}
+            for column in ["cached_tokens", "saved_tokens"]:
+                if column not in usage_columns:
+                    cursor.execute(f"ALTER TABLE ai_usage ADD COLUMN {column} INTEGER DEFAULT 0")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_ai_usage_created_at ON ai_usage(created_at)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_ai_usage_run_id ON ai_usage(run_id)")
             
+            # Create scrape checkpoints table (progress of the inbox walk per
+            # company; company_key is 0 for the company configured in .env)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS scrape_checkpoints (
+                    company_key INTEGER PRIMARY KEY,
+                    run_id TEXT,
+                    position INTEGER,
+                    total INTEGER,
+                    last_complaint_id TEXT,
+                    updated_at INTEGER
+                )
+            ''')
+
+            # Databases created before the index existed need a one-off rebuild
+            if not fts_exists:
+                cursor.execute("INSERT INTO complaints_fts(complaints_fts) VALUES ('rebuild')")
+
             conn.commit()
             conn.close()
-            logger.info("Database tables created or already exist")
+            logger.debug("Database tables created or already exist")
             
         except Exception as e:
-            logger.error(f"Error creating database tables: {str(e)}")
+            logger.error("Error creating database tables: %s", e)
             raise
     
+    @staticmethod
+    def _migrate_epoch_timestamps(cursor):
+        """
+        Rebuild the complaints table with integer epoch timestamps.
+        
+        SQLite cannot change a column's type in place, and a TEXT column would
+        turn integers back into text, so the rows are copied into a new table.
+        Row IDs are kept, which keeps the full-text index valid; the indexes
+        and triggers dropped with the old table are recreated afterwards by
+        _create_tables().
+        """
+        logger.info("Converting complaint timestamps to epoch seconds")
+        
+        cursor.execute("DROP TABLE IF EXISTS complaints_new")
+        cursor.execute('''
+            CREATE TABLE complaints_new (
+                complaint_id TEXT PRIMARY KEY,
+                customer_name TEXT,
+                complaint_text TEXT,
+                response_text TEXT,
+                status TEXT,
+                created_at INTEGER,
+                updated_at INTEGER,
+                company_id INTEGER
+            )
+        ''')
+        # The stored ISO strings are local time; 'utc' converts them to UTC first
+        cursor.execute('''
+            INSERT INTO complaints_new (
+                rowid, complaint_id, customer_name, complaint_text, response_text,
+                status, created_at, updated_at, company_id
+            )
+            SELECT rowid, complaint_id, customer_name, complaint_text, response_text, status,
+                CAST(strftime('%s', created_at, 'utc') AS INTEGER),
+                CAST(strftime('%s', updated_at, 'utc') AS INTEGER),
+                company_id
+            FROM complaints
+        ''')
+        cursor.execute("DROP TABLE complaints")
+        cursor.execute("ALTER TABLE complaints_new RENAME TO complaints")
+    
+    @DB_SECONDS.time(operation="is_complaint_processed")
     def is_complaint_processed(self, complaint_id):
         """
         Check if a complaint has already been processed.
         
+        Complaints that were scraped but not answered yet ('pending') don't count.
+        
         Args:
             complaint_id (str): ID of the complaint to check
             
@@ -62,7 +292,7 @@ class Database:
             cursor = conn.cursor()
             
             cursor.execute(
-                "SELECT 1 FROM complaints WHERE complaint_id = ?",
+                "SELECT 1 FROM complaints WHERE complaint_id = ? AND status != 'pending'",
                 (complaint_id,)
             )
             
@@ -72,52 +302,100 @@ class Database:
             return result
             
         except Exception as e:
-            logger.error(f"Error checking if complaint is processed: {str(e)}")
+            logger.error("Error checking if complaint is processed: %s", e)
             return False
     
-    def save_complaint(self, complaint_id, customer_name, complaint_text, response_text, status):
+    @staticmethod
+    def _complaint_row(complaint, now, company_id=None):
+        """Build the upsert parameters for one complaint dict."""
+        return (
+            complaint["complaint_id"], complaint.get("customer_name"), complaint.get("complaint_text"),
+            complaint.get("response_text"), complaint.get("status"), now, now,
+            complaint.get("company_id", company_id)
+        )
+    
+    @DB_SECONDS.time(operation="save_complaint")
+    def save_complaint(self, complaint_id, customer_name, complaint_text, response_text, status, company_id=None):
         """
         Save complaint details and response status to the database.
         
+        Saving a complaint that is already stored (e.g. one processed again
+        after a failure) updates it and keeps its original creation date.
+        
         Args:
             complaint_id (str): ID of the complaint
             customer_name (str): Name of the customer
             complaint_text (str): Text of the complaint
             response_text (str): Generated response text
-            status (str): Status of the response ('completed' or 'failed')
+            status (str): Status of the response ('completed' or 'failed', or
+                'pending' for a scraped complaint that is not answered yet)
+            company_id (int, optional): Company the complaint belongs to
             
         Returns:
             bool: True if the save was successful, False otherwise
         """
         try:
-            now = datetime.now().isoformat()
+            now = int(time.time())
             
             conn = sqlite3.connect(self.db_path)
             cursor = conn.cursor()
             
             cursor.execute(
-                """
-                INSERT INTO complaints (
-                    complaint_id, customer_name, complaint_text, 
-                    response_text, status, created_at, updated_at
-                ) VALUES (?, ?, ?, ?, ?, ?, ?)
-                """,
+                UPSERT_COMPLAINT_SQL,
                 (
                     complaint_id, customer_name, complaint_text,
-                    response_text, status, now, now
+                    response_text, status, now, now, company_id
                 )
             )
             
             conn.commit()
             conn.close()
             
-            logger.info(f"Complaint ID {complaint_id} saved to database with status: {status}")
+            logger.debug("Complaint ID %s saved to database with status: %s", complaint_id, status)
             return True
             
         except Exception as e:
-            logger.error(f"Error saving complaint to database: {str(e)}")
+            logger.error("Error saving complaint to database: %s", e)
             return False
     
+    @DB_SECONDS.time(operation="save_complaints_bulk")
+    def save_complaints_bulk(self, complaints, company_id=None):
+        """
+        Save many complaints in a single transaction.
+        
+        Uses the same insert-or-update semantics as save_complaint(), but
+        commits (and syncs to disk) once for the whole batch.
+        
+        Args:
+            complaints (list): Dicts with 'complaint_id', 'customer_name',
+                'complaint_text', 'response_text', 'status' and optionally 'company_id'
+            company_id (int, optional): Company for complaints that don't set their own
+            
+        Returns:
+            int: Number of complaints saved (0 if the batch failed and was rolled back)
+        """
+        if not complaints:
+            return 0
+        
+        conn = sqlite3.connect(self.db_path)
+        try:
+            now = int(time.time())
+            rows = [self._complaint_row(complaint, now, company_id) for complaint in complaints]
+            
+            with conn:  # commits on success, rolls back on error
+                conn.executemany(UPSERT_COMPLAINT_SQL, rows)
+            
+            logger.debug("Saved %s complaints in one transaction", len(rows))
+            return len(rows)
+            
+        except Exception as e:
+            logger.error("Error saving %s complaints to database: %s", len(complaints), e)
+            return 0
+        
+        finally:
+            conn.close()
+    
+    @DB_SECONDS.time(operation="update_complaint_status")
     def update_complaint_status(self, complaint_id, status):
         """
         Update the status of a complaint.
@@ -130,7 +408,7 @@ class Database:
             bool: True if the update was successful, False otherwise
         """
         try:
-            now = datetime.now().isoformat()
+            now = int(time.time())
             
             conn = sqlite3.connect(self.db_path)
             cursor = conn.cursor()
@@ -143,19 +421,23 @@ class Database:
             conn.commit()
             conn.close()
             
-            logger.info(f"Updated complaint ID {complaint_id} status to: {status}")
+            logger.debug("Updated complaint ID %s status to: %s", complaint_id, status)
             return True
             
         except Exception as e:
-            logger.error(f"Error updating complaint status: {str(e)}")
+            logger.error("Error updating complaint status: %s", e)
             return False
     
-    def get_all_complaints(self, limit=100):
+    @DB_SECONDS.time(operation="get_all_complaints")
+    def get_all_complaints(self, limit=100, text_limit=None):
         """
         Retrieve all complaints from the database.
         
         Args:
             limit (int, optional): Maximum number of complaints to retrieve
+            text_limit (int, optional): Read only this many characters of the
+                complaint and response texts (plus one, so callers can tell
+                a text was cut). Full texts are returned when None.
             
         Returns:
             list: List of dictionaries containing complaint details
@@ -165,67 +447,835 @@ class Database:
             conn.row_factory = sqlite3.Row  # This enables column access by name
             cursor = conn.cursor()
             
+            if text_limit is None:
+                text_columns, params = "complaint_text, response_text", (limit,)
+            else:
+                text_columns = "substr(complaint_text, 1, ?) AS complaint_text, substr(response_text, 1, ?) AS response_text"
+                params = (text_limit + 1, text_limit + 1, limit)
+            
             cursor.execute(
-                """
-                SELECT * FROM complaints 
+                f"""
+                SELECT {COMPLAINT_SUMMARY_COLUMNS}, {text_columns} FROM complaints 
                 ORDER BY created_at DESC 
                 LIMIT ?
                 """,
-                (limit,)
+                params
             )
             
             rows = cursor.fetchall()
             conn.close()
             
             # Convert rows to dictionaries
-            complaints = [dict(row) for row in rows]
+            complaints = [_complaint_dict(row) for row in rows]
+            
+            logger.debug("Retrieved %s complaints from database", len(complaints))
+            return complaints
+            
+        except Exception as e:
+            logger.error("Error retrieving complaints from database: %s", e)
+            return []
+    
+    @DB_SECONDS.time(operation="rebuild_search_index")
+    def rebuild_search_index(self):
+        """
+        Rebuild the full-text search index from the complaints table.
+
+        Returns:
+            bool: True if the rebuild was successful, False otherwise
+        """
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+
+            cursor.execute("INSERT INTO complaints_fts(complaints_fts) VALUES ('rebuild')")
+            cursor.execute("INSERT INTO complaints_fts(complaints_fts) VALUES ('optimize')")
+
+            conn.commit()
+            conn.close()
+
+            logger.info("Full-text search index rebuilt")
+            return True
+
+        except Exception as e:
+            logger.error("Error rebuilding search index: %s", e)
+            return False
+
+    @DB_SECONDS.time(operation="get_complaints_by_customer")
+    def get_complaints_by_customer(self, customer_name, company_id=None, limit=20):
+        """
+        Retrieve the most recent complaints of one customer.
+        
+        Args:
+            customer_name (str): Customer name as scraped from Reclame Aqui
+            company_id (int, optional): Company the complaints belong to; None
+                for the company configured in .env
+            limit (int, optional): Maximum number of complaints to retrieve
+            
+        Returns:
+            list: Complaint dicts, newest first
+        """
+        try:
+            conn = sqlite3.connect(self.db_path)
+            conn.row_factory = sqlite3.Row
+            cursor = conn.cursor()
+            
+            cursor.execute(
+                "SELECT * FROM complaints WHERE customer_name = ? AND company_id IS ? ORDER BY created_at DESC LIMIT ?",
+                (customer_name, company_id, limit)
+            )
+            
+            complaints = [_complaint_dict(row) for row in cursor.fetchall()]
+            conn.close()
+            
+            return complaints
+            
+        except Exception as e:
+            logger.error("Error retrieving complaints of customer from database: %s", e)
+            return []
+
+    @DB_SECONDS.time(operation="get_pending_complaints")
+    def get_pending_complaints(self, company_id=None, limit=500):
+        """
+        Retrieve complaints that were scraped but not answered yet.
+        
+        Args:
+            company_id (int, optional): Company the complaints belong to; None
+                for the company configured in .env
+            limit (int, optional): Maximum number of complaints to retrieve
+            
+        Returns:
+            list: Complaint dicts, oldest first
+        """
+        try:
+            conn = sqlite3.connect(self.db_path)
+            conn.row_factory = sqlite3.Row
+            cursor = conn.cursor()
+            
+            cursor.execute(
+                "SELECT * FROM complaints WHERE status = 'pending' AND company_id IS ? ORDER BY created_at LIMIT ?",
+                (company_id, limit)
+            )
+            
+            complaints = [_complaint_dict(row) for row in cursor.fetchall()]
+            conn.close()
             
-            logger.info(f"Retrieved {len(complaints)} complaints from database")
             return complaints
             
         except Exception as e:
-            logger.error(f"Error retrieving complaints from database: {str(e)}")
+            logger.error("Error retrieving pending complaints from database: %s", e)
             return []
+
+    @DB_SECONDS.time(operation="get_complaints_before")
+    def get_complaints_before(self, before, limit=1000):
+        """
+        Retrieve the oldest complaints created before a given time.
+        
+        Pending complaints are left out: they are still waiting to be answered.
+        
+        Args:
+            before (datetime): Only complaints created earlier are returned
+            limit (int, optional): Maximum number of complaints to retrieve
+            
+        Returns:
+            list: Complaint dicts, oldest first
+        """
+        try:
+            conn = sqlite3.connect(self.db_path)
+            conn.row_factory = sqlite3.Row
+            cursor = conn.cursor()
+            
+            cursor.execute(
+                "SELECT * FROM complaints WHERE created_at < ? AND status != 'pending' ORDER BY created_at LIMIT ?",
+                (_epoch(before), limit)
+            )
+            
+            complaints = [_complaint_dict(row) for row in cursor.fetchall()]
+            conn.close()
+            
+            return complaints
+            
+        except Exception as e:
+            logger.error("Error retrieving old complaints from database: %s", e)
+            return []
+    
+    @DB_SECONDS.time(operation="delete_complaints")
+    def delete_complaints(self, complaint_ids):
+        """
+        Delete complaints in a single transaction.
+        
+        Args:
+            complaint_ids (list): IDs of the complaints to delete
+            
+        Returns:
+            int: Number of complaints deleted (0 if the transaction failed)
+        """
+        if not complaint_ids:
+            return 0
+        
+        conn = sqlite3.connect(self.db_path)
+        try:
+            with conn:
+                cursor = conn.executemany(
+                    "DELETE FROM complaints WHERE complaint_id = ?",
+                    [(complaint_id,) for complaint_id in complaint_ids]
+                )
+            
+            logger.debug("Deleted %s complaints", cursor.rowcount)
+            return cursor.rowcount
+            
+        except Exception as e:
+            logger.error("Error deleting complaints: %s", e)
+            return 0
+        
+        finally:
+            conn.close()
+    
+    @DB_SECONDS.time(operation="save_checkpoint")
+    def save_checkpoint(self, company_id, run_id, position, total, last_complaint_id):
+        """
+        Record how far a run has walked the list of new complaints.
+        
+        Args:
+            company_id (int): Company being processed, or None for the company configured in .env
+            run_id (str): Processing cycle that is scraping
+            position (int): Number of list items handled so far
+            total (int): Number of items in the list
+            last_complaint_id (str): ID of the last complaint handled
+            
+        Returns:
+            bool: True if the checkpoint was saved, False otherwise
+        """
+        try:
+            conn = sqlite3.connect(self.db_path)
+            with conn:
+                conn.execute(
+                    SAVE_CHECKPOINT_SQL,
+                    (company_id or 0, run_id, position, total, last_complaint_id, int(time.time()))
+                )
+            conn.close()
+            return True
+            
+        except Exception as e:
+            logger.error("Error saving scrape checkpoint: %s", e)
+            return False
+    
+    @DB_SECONDS.time(operation="save_pending_with_checkpoint")
+    def save_pending_with_checkpoint(self, complaint_id, customer_name, complaint_text, company_id,
+                                     run_id, position, total):
+        """
+        Store a scraped complaint as pending and move the checkpoint past it.
+        
+        Both are written in one transaction, so each scraped complaint costs a
+        single commit and a crash never leaves one without the other.
+        
+        Args:
+            complaint_id (str): ID of the complaint
+            customer_name (str): Name of the customer
+            complaint_text (str): Text of the complaint
+            company_id (int): Company being processed, or None for the company configured in .env
+            run_id (str): Processing cycle that is scraping
+            position (int): Place of the complaint in the list (1-based)
+            total (int): Number of items in the list
+            
+        Returns:
+            bool: True if both were saved, False otherwise
+        """
+        conn = sqlite3.connect(self.db_path)
+        try:
+            now = int(time.time())
+            with conn:
+                conn.execute(
+                    UPSERT_COMPLAINT_SQL,
+                    (complaint_id, customer_name, complaint_text, None, "pending", now, now, company_id)
+                )
+                conn.execute(SAVE_CHECKPOINT_SQL, (company_id or 0, run_id, position, total, complaint_id, now))
+            
+            logger.debug("Complaint ID %s saved as pending at item %s of %s", complaint_id, position, total)
+            return True
+            
+        except Exception as e:
+            logger.error("Error saving pending complaint and checkpoint: %s", e)
+            return False
+        
+        finally:
+            conn.close()
+    
+    @DB_SECONDS.time(operation="get_checkpoint")
+    def get_checkpoint(self, company_id):
+        """
+        Get the checkpoint left by a run that did not finish scraping.
+        
+        Args:
+            company_id (int): Company to look up, or None for the company configured in .env
+            
+        Returns:
+            dict: Checkpoint with 'run_id', 'position', 'total', 'last_complaint_id'
+            and 'updated_at' (ISO text), or None if there is none
+        """
+        try:
+            conn = sqlite3.connect(self.db_path)
+            conn.row_factory = sqlite3.Row
+            row = conn.execute(
+                "SELECT * FROM scrape_checkpoints WHERE company_key = ?", (company_id or 0,)
+            ).fetchone()
+            conn.close()
+            
+            if row is None:
+                return None
+            checkpoint = dict(row)
+            checkpoint["updated_at"] = datetime.fromtimestamp(checkpoint["updated_at"]).isoformat()
+            return checkpoint
+            
+        except Exception as e:
+            logger.error("Error retrieving scrape checkpoint: %s", e)
+            return None
     
-    def get_statistics(self):
+    @DB_SECONDS.time(operation="clear_checkpoint")
+    def clear_checkpoint(self, company_id):
+        """
+        Remove the checkpoint of a company once its list has been walked completely.
+        
+        Args:
+            company_id (int): Company, or None for the company configured in .env
+            
+        Returns:
+            bool: True if the checkpoint was removed, False otherwise
+        """
+        try:
+            conn = sqlite3.connect(self.db_path)
+            with conn:
+                conn.execute("DELETE FROM scrape_checkpoints WHERE company_key = ?", (company_id or 0,))
+            conn.close()
+            return True
+            
+        except Exception as e:
+            logger.error("Error clearing scrape checkpoint: %s", e)
+            return False
+    
+    @DB_SECONDS.time(operation="optimize")
+    def optimize(self, vacuum=False):
+        """
+        Refresh query planner statistics and compact the search index.
+        
+        Args:
+            vacuum (bool, optional): Also rewrite the file to return the space
+                of deleted rows to the filesystem. Blocks writers while it runs.
+            
+        Returns:
+            bool: True if the maintenance was successful, False otherwise
+        """
+        try:
+            # Autocommit: VACUUM cannot run inside a transaction
+            conn = sqlite3.connect(self.db_path, isolation_level=None)
+            cursor = conn.cursor()
+            
+            size_before = self._file_size(cursor)
+            
+            cursor.execute("INSERT INTO complaints_fts(complaints_fts) VALUES ('optimize')")
+            cursor.execute("ANALYZE")
+            cursor.execute("PRAGMA optimize")
+            if vacuum:
+                cursor.execute("VACUUM")
+            
+            size_after = self._file_size(cursor)
+            conn.close()
+            
+            logger.info("Database optimized (%s -> %s bytes)", size_before, size_after)
+            return True
+            
+        except Exception as e:
+            logger.error("Error optimizing database: %s", e)
+            return False
+    
+    @staticmethod
+    def _file_size(cursor):
+        """Return the database size in bytes."""
+        cursor.execute("PRAGMA page_count")
+        page_count = cursor.fetchone()[0]
+        cursor.execute("PRAGMA page_size")
+        return page_count * cursor.fetchone()[0]
+    
+    @staticmethod
+    def _build_match_query(query):
+        """
+        Turn free text typed by a user into a safe FTS5 MATCH expression.
+
+        Every word is quoted so FTS5 operators and punctuation are matched
+        literally; the last word is treated as a prefix.
+
+        Args:
+            query (str): Raw search text
+
+        Returns:
+            str: FTS5 query string, or None if the text has no searchable terms
+        """
+        terms = [term.replace('"', '""') for term in query.split()]
+        if not terms:
+            return None
+
+        quoted = [f'"{term}"' for term in terms]
+        quoted[-1] += "*"
+        return " ".join(quoted)
+
+    @DB_SECONDS.time(operation="search")
+    def search(self, query=None, status=None, date_from=None, date_to=None, page=1, per_page=25,
+               company_id=None):
+        """
+        Search complaints by text with optional status and date filters.
+
+        Text matches are ranked by relevance (BM25); without a text query the
+        results are ordered by creation date, newest first.
+
+        Args:
+            query (str, optional): Words to look for in complaint or response text
+            status (str, optional): Only return complaints with this status
+            date_from (str, optional): First creation date to include (YYYY-MM-DD)
+            date_to (str, optional): Last creation date to include (YYYY-MM-DD)
+            page (int, optional): 1-based page number
+            per_page (int, optional): Number of results per page
+            company_id (int, optional): Only return complaints of this company
+
+        Returns:
+            dict: Page of results with keys 'results', 'total', 'page', 'per_page' and 'pages'
+        """
+        page = max(int(page), 1)
+        per_page = max(int(per_page), 1)
+
+        try:
+            conditions = []
+            params = []
+
+            match_query = self._build_match_query(query) if query else None
+            if match_query:
+                # CROSS JOIN keeps the FTS index as the outer loop; otherwise the
+                # planner may walk the status index and probe FTS once per row
+                source = "complaints_fts CROSS JOIN complaints c ON c.rowid = complaints_fts.rowid"
+                conditions.append("complaints_fts MATCH ?")
+                params.append(match_query)
+                order_by = "bm25(complaints_fts), c.created_at DESC"
+            else:
+                source = "complaints c"
+                order_by = "c.created_at DESC"
+
+            if company_id is not None:
+                conditions.append("c.company_id = ?")
+                params.append(company_id)
+
+            if status:
+                conditions.append("c.status = ?")
+                params.append(status)
+
+            if date_from:
+                conditions.append("c.created_at >= ?")
+                params.append(_epoch(datetime.strptime(date_from, "%Y-%m-%d")))
+
+            if date_to:
+                # created_at holds full timestamps, so compare against the next day
+                end = datetime.strptime(date_to, "%Y-%m-%d") + timedelta(days=1)
+                conditions.append("c.created_at < ?")
+                params.append(_epoch(end))
+
+            where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+            conn = sqlite3.connect(self.db_path)
+            conn.row_factory = sqlite3.Row
+            cursor = conn.cursor()
+
+            cursor.execute(f"SELECT COUNT(*) FROM {source} {where}", params)
+            total = cursor.fetchone()[0]
+
+            cursor.execute(
+                f"""
+                SELECT c.rowid
+                FROM {source}
+                {where}
+                ORDER BY {order_by}
+                LIMIT ? OFFSET ?
+                """,
+                params + [per_page, (page - 1) * per_page]
+            )
+            rowids = [row[0] for row in cursor.fetchall()]
+
+            # Load full rows (and snippets) only for the current page
+            placeholders = ", ".join("?" for _ in rowids)
+            if match_query and rowids:
+                cursor.execute(
+                    f"""
+                    SELECT c.rowid AS _rowid, c.*,
+                        snippet(complaints_fts, 0, '[', ']', '...', 12) AS complaint_snippet,
+                        snippet(complaints_fts, 1, '[', ']', '...', 12) AS response_snippet
+                    FROM {source}
+                    WHERE complaints_fts MATCH ? AND complaints_fts.rowid IN ({placeholders})
+                    """,
+                    [match_query] + rowids
+                )
+            elif rowids:
+                cursor.execute(
+                    f"""
+                    SELECT c.rowid AS _rowid, c.*,
+                        NULL AS complaint_snippet, NULL AS response_snippet
+                    FROM complaints c
+                    WHERE c.rowid IN ({placeholders})
+                    """,
+                    rowids
+                )
+
+            rows_by_id = {row["_rowid"]: row for row in cursor.fetchall()} if rowids else {}
+            conn.close()
+
+            results = []
+            for rowid in rowids:
+                result = _complaint_dict(rows_by_id[rowid])
+                del result["_rowid"]
+                results.append(result)
+
+            logger.debug("Search returned %s of %s complaints", len(results), total)
+            return {
+                "results": results,
+                "total": total,
+                "page": page,
+                "per_page": per_page,
+                "pages": (total + per_page - 1) // per_page
+            }
+
+        except Exception as e:
+            logger.error("Error searching complaints: %s", e)
+            return {"results": [], "total": 0, "page": page, "per_page": per_page, "pages": 0}
+
+    @DB_SECONDS.time(operation="get_statistics")
+    def get_statistics(self, company_id=None):
         """
         Get statistics about the complaints.
         
+        Args:
+            company_id (int, optional): Only count complaints of this company
+            
         Returns:
-            dict: Statistics including total, completed, and failed complaints
+            dict: Statistics including total, completed, failed and pending complaints
         """
         try:
             conn = sqlite3.connect(self.db_path)
             cursor = conn.cursor()
             
-            # Get total complaints
-            cursor.execute("SELECT COUNT(*) FROM complaints")
+            where, params = ("AND company_id = ?", (company_id,)) if company_id is not None else ("", ())
+            
+            # Get total answered complaints
+            cursor.execute(f"SELECT COUNT(*) FROM complaints WHERE status != 'pending' {where}", params)
             total = cursor.fetchone()[0]
             
             # Get completed complaints
-            cursor.execute("SELECT COUNT(*) FROM complaints WHERE status = 'completed'")
+            cursor.execute(f"SELECT COUNT(*) FROM complaints WHERE status = 'completed' {where}", params)
             completed = cursor.fetchone()[0]
             
             # Get failed complaints
-            cursor.execute("SELECT COUNT(*) FROM complaints WHERE status = 'failed'")
+            cursor.execute(f"SELECT COUNT(*) FROM complaints WHERE status = 'failed' {where}", params)
             failed = cursor.fetchone()[0]
             
+            # Get complaints scraped but not answered yet
+            cursor.execute(f"SELECT COUNT(*) FROM complaints WHERE status = 'pending' {where}", params)
+            pending = cursor.fetchone()[0]
+            
             conn.close()
             
             stats = {
                 "total": total,
                 "completed": completed,
                 "failed": failed,
+                "pending": pending,
                 "success_rate": (completed / total * 100) if total > 0 else 0
             }
             
-            logger.info(f"Retrieved statistics: {stats}")
+            logger.debug("Retrieved statistics: %s", stats)
             return stats
             
         except Exception as e:
-            logger.error(f"Error retrieving statistics from database: {str(e)}")
-            return {"total": 0, "completed": 0, "failed": 0, "success_rate": 0}
-    
+            logger.error("Error retrieving statistics from database: %s", e)
+            return {"total": 0, "completed": 0, "failed": 0, "pending": 0, "success_rate": 0}
+
+    @DB_SECONDS.time(operation="record_usage")
+    def record_usage(self, complaint_id, model, prompt_tokens, completion_tokens, latency_ms, cost_usd,
+                     cached_tokens=0, saved_tokens=0, run_id=None):
+        """
+        Save the token usage and cost of one OpenAI call.
+
+        Args:
+            complaint_id (str): ID of the complaint the call answered, or None for tests
+            model (str): Model that served the request
+            prompt_tokens (int): Input tokens
+            completion_tokens (int): Output tokens
+            latency_ms (int): Request duration in milliseconds
+            cost_usd (float): Estimated cost in USD
+            cached_tokens (int, optional): Input tokens served from the prompt cache
+            saved_tokens (int, optional): Input tokens removed by complaint truncation
+            run_id (str, optional): Processing cycle that made the call
+
+        Returns:
+            bool: True if the save was successful, False otherwise
+        """
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+
+            cursor.execute(
+                """
+                INSERT INTO ai_usage (
+                    complaint_id, run_id, model, prompt_tokens, completion_tokens,
+                    cached_tokens, saved_tokens, latency_ms, cost_usd, created_at
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    complaint_id, run_id, model, prompt_tokens, completion_tokens,
+                    cached_tokens, saved_tokens, latency_ms, cost_usd, datetime.now().isoformat()
+                )
+            )
+
+            conn.commit()
+            conn.close()
+            return True
+
+        except Exception as e:
+            logger.error("Error saving OpenAI usage: %s", e)
+            return False
+
+    @DB_SECONDS.time(operation="get_usage_cost")
+    def get_usage_cost(self, since):
+        """
+        Get the total OpenAI cost recorded since a given date.
+
+        Args:
+            since (str): First date to include (YYYY-MM-DD)
+
+        Returns:
+            float: Cost in USD
+        """
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+
+            cursor.execute("SELECT COALESCE(SUM(cost_usd), 0) FROM ai_usage WHERE created_at >= ?", (since,))
+            cost = cursor.fetchone()[0]
+
+            conn.close()
+            return cost
+
+        except Exception as e:
+            logger.error("Error retrieving OpenAI cost: %s", e)
+            return 0.0
+
+    @DB_SECONDS.time(operation="get_usage_statistics")
+    def get_usage_statistics(self, days=30, runs=10):
+        """
+        Get OpenAI token and cost rollups.
+
+        Args:
+            days (int, optional): Number of days included in the daily rollup
+            runs (int, optional): Number of recent processing cycles included
+
+        Returns:
+            dict: 'today' totals, plus 'by_day', 'by_model' and 'by_run' lists
+        """
+        totals = "COUNT(*) AS requests, COALESCE(SUM(prompt_tokens), 0) AS prompt_tokens, " \
+                 "COALESCE(SUM(completion_tokens), 0) AS completion_tokens, " \
+                 "COALESCE(SUM(cached_tokens), 0) AS cached_tokens, COALESCE(SUM(saved_tokens), 0) AS saved_tokens, " \
+                 "COALESCE(SUM(cost_usd), 0) AS cost"
+        today = datetime.now().date()
+        since = (today - timedelta(days=days - 1)).isoformat()
+
+        try:
+            conn = sqlite3.connect(self.db_path)
+            conn.row_factory = sqlite3.Row
+            cursor = conn.cursor()
+
+            cursor.execute(f"SELECT {totals} FROM ai_usage WHERE created_at >= ?", (today.isoformat(),))
+            today_totals = dict(cursor.fetchone())
+
+            cursor.execute(
+                f"""
+                SELECT substr(created_at, 1, 10) AS day, {totals}
+                FROM ai_usage WHERE created_at >= ?
+                GROUP BY day ORDER BY day DESC
+                """,
+                (since,)
+            )
+            by_day = [dict(row) for row in cursor.fetchall()]
+
+            cursor.execute(
+                f"""
+                SELECT model, {totals}, AVG(latency_ms) AS avg_latency_ms
+                FROM ai_usage WHERE created_at >= ?
+                GROUP BY model ORDER BY cost DESC
+                """,
+                (since,)
+            )
+            by_model = [dict(row) for row in cursor.fetchall()]
+
+            cursor.execute(
+                f"""
+                SELECT run_id, MIN(created_at) AS started_at, {totals}
+                FROM ai_usage WHERE run_id IS NOT NULL
+                GROUP BY run_id ORDER BY started_at DESC LIMIT ?
+                """,
+                (runs,)
+            )
+            by_run = [dict(row) for row in cursor.fetchall()]
+
+            conn.close()
+
+            return {"today": today_totals, "by_day": by_day, "by_model": by_model, "by_run": by_run}
+
+        except Exception as e:
+            logger.error("Error retrieving OpenAI usage statistics: %s", e)
+            return {
+                "today": {
+                    "requests": 0, "prompt_tokens": 0, "completion_tokens": 0,
+                    "cached_tokens": 0, "saved_tokens": 0, "cost": 0.0
+                },
+                "by_day": [], "by_model": [], "by_run": []
+            }
+
+    @DB_SECONDS.time(operation="get_companies")
+    def get_companies(self, active_only=False):
+        """
+        Retrieve the configured companies.
+        
+        Args:
+            active_only (bool, optional): Skip companies that are switched off
+            
+        Returns:
+            list: List of dictionaries with company settings, ordered by name
+        """
+        try:
+            conn = sqlite3.connect(self.db_path)
+            conn.row_factory = sqlite3.Row
+            cursor = conn.cursor()
+
+            where = "WHERE active = 1" if active_only else ""
+            cursor.execute(f"SELECT * FROM companies {where} ORDER BY name")
+
+            companies = [dict(row) for row in cursor.fetchall()]
+            conn.close()
+
+            return companies
+
+        except Exception as e:
+            logger.error("Error retrieving companies from database: %s", e)
+            return []
+
+    @DB_SECONDS.time(operation="get_company")
+    def get_company(self, company_id):
+        """
+        Retrieve one company.
+        
+        Args:
+            company_id (int): ID of the company
+            
+        Returns:
+            dict: Company settings, or None if it does not exist
+        """
+        try:
+            conn = sqlite3.connect(self.db_path)
+            conn.row_factory = sqlite3.Row
+            cursor = conn.cursor()
+
+            cursor.execute("SELECT * FROM companies WHERE id = ?", (company_id,))
+            row = cursor.fetchone()
+            conn.close()
+
+            return dict(row) if row else None
+
+        except Exception as e:
+            logger.error("Error retrieving company %s from database: %s", company_id, e)
+            return None
+
+    @DB_SECONDS.time(operation="save_company")
+    def save_company(self, name, email, password, system_prompt=None, check_interval_minutes=60,
+                     browser_type="chrome", active=True, company_id=None):
+        """
+        Create a company, or update it when `company_id` is given.
+        
+        Args:
+            name (str): Display name, unique across companies
+            email (str): Email for the company's Reclame Aqui login
+            password (str): Password for the company's Reclame Aqui login
+            system_prompt (str, optional): Prompt used for this company's responses
+            check_interval_minutes (int, optional): How often to check for new complaints
+            browser_type (str, optional): 'chrome' or 'firefox'
+            active (bool, optional): Whether the scheduler processes this company
+            company_id (int, optional): ID of the company to update
+            
+        Returns:
+            int: ID of the saved company, or None if the save failed
+        """
+        now = datetime.now().isoformat()
+        values = (name, email, password, system_prompt, check_interval_minutes, browser_type, int(active))
+
+        conn = sqlite3.connect(self.db_path)
+        try:
+            # Rolls back a failed insert, so the write lock is released even
+            # while the error (and its cursor) is still referenced
+            with conn:
+                cursor = conn.cursor()
+
+                if company_id is None:
+                    cursor.execute(
+                        """
+                        INSERT INTO companies (
+                            name, email, password, system_prompt, check_interval_minutes,
+                            browser_type, active, created_at, updated_at
+                        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                        """,
+                        values + (now, now)
+                    )
+                    company_id = cursor.lastrowid
+                else:
+                    cursor.execute(
+                        """
+                        UPDATE companies SET
+                            name = ?, email = ?, password = ?, system_prompt = ?,
+                            check_interval_minutes = ?, browser_type = ?, active = ?, updated_at = ?
+                        WHERE id = ?
+                        """,
+                        values + (now, company_id)
+                    )
+
+            logger.info("Company %s saved with ID %s", name, company_id)
+            return company_id
+
+        except Exception as e:
+            # Usually a duplicate name
+            logger.error("Error saving company to database: %s", e)
+            return None
+
+        finally:
+            conn.close()
+
+    @DB_SECONDS.time(operation="delete_company")
+    def delete_company(self, company_id):
+        """
+        Delete a company. Its complaints are kept.
+        
+        Args:
+            company_id (int): ID of the company to delete
+            
+        Returns:
+            bool: True if the delete was successful, False otherwise
+        """
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+
+            cursor.execute("DELETE FROM companies WHERE id = ?", (company_id,))
+
+            conn.commit()
+            conn.close()
+
+            logger.info("Company ID %s deleted", company_id)
+            return True
+
+        except Exception as e:
+            logger.error("Error deleting company: %s", e)
+            return False
+
     def export_to_json(self, file_path="complaints_export.json"):
         """
         Export all complaints to a JSON file.
@@ -242,9 +1292,9 @@ class Database:
             with open(file_path, 'w', encoding='utf-8') as f:
                 json.dump(complaints, f, ensure_ascii=False, indent=4)
             
-            logger.info(f"Exported {len(complaints)} complaints to {file_path}")
+            logger.info("Exported %s complaints to %s", len(complaints), file_path)
             return True
             
         except Exception as e:
-            logger.error(f"Error exporting complaints to JSON: {str(e)}")
+            logger.error("Error exporting complaints to JSON: %s", e)
             return False
@@ -1,6 +1,10 @@
 import os
+import time
 import logging
 from openai import OpenAI
+from metrics import STAGE_SECONDS, STAGE_ERRORS, OPENAI_TOKENS, OPENAI_COST, PROMPT_TOKENS_SAVED
+from budget import estimate_cost, get_rate_limiter
+from prompt_builder import PromptBuilder
 
 # the newest OpenAI model is "gpt-4o" which was released May 13, 2024.
 # do not change this unless explicitly requested by the user
@@ -10,76 +14,116 @@ logger = logging.getLogger(__name__)
 class IAResponder:
     """Class for generating AI responses to customer complaints using OpenAI API."""
     
-    def __init__(self, api_key=None):
+    def __init__(self, api_key=None, rate_limiter=None, system_prompt=None, client=None):
         """
         Initialize the AI responder with an OpenAI API key.
         
         Args:
             api_key (str, optional): OpenAI API key. If None, will attempt to get from environment.
+            system_prompt (str, optional): Default system prompt. If None, SYSTEM_PROMPT from
+                the environment or the built-in iPass prompt is used.
+            rate_limiter (RateLimiter, optional): Request/token limiter. Defaults to the
+                process-wide limiter configured from the environment.
+            client (OpenAI, optional): Client to share between responders, so concurrent
+                runs reuse one connection pool
         """
         self.api_key = api_key or os.getenv("OPENAI_API_KEY")
         if not self.api_key:
             logger.error("OpenAI API key not provided or found in environment")
             raise ValueError("OpenAI API key is required")
         
-        self.client = OpenAI(api_key=self.api_key)
+        self.client = client or OpenAI(api_key=self.api_key)
         self.model = "gpt-4o"  # Using the latest model
+        self.max_tokens = 500
+        self.rate_limiter = rate_limiter or get_rate_limiter()
+        self.prompt_builder = PromptBuilder(system_prompt, model=self.model)
+        
+        # Usage of the most recent call: model, prompt_tokens, completion_tokens,
+        # cached_tokens, saved_tokens, latency_ms and cost_usd (None if the call failed)
+        self.last_usage = None
         
         logger.info("IAResponder initialized with OpenAI API")
     
-    def generate_response(self, complaint_text, system_prompt=None):
+    def generate_response(self, complaint_text, system_prompt=None, model=None):
         """
         Generate a response to a customer complaint using the OpenAI API.
         
+        Token usage, latency and estimated cost of the call are left in
+        `last_usage`.
+        
         Args:
             complaint_text (str): The text of the customer complaint
             system_prompt (str, optional): Custom system prompt to use for this response
+            model (str, optional): Model to use instead of `self.model`
             
         Returns:
             str: AI-generated response to the complaint
         """
+        self.last_usage = None
+        model = model or self.model
+        
         try:
-            logger.info(f"Generating response for complaint: {complaint_text[:50]}...")
+            logger.debug("Generating response for complaint: %s...", complaint_text[:50])
             
-            # Create the prompt for the AI
-            if system_prompt is None:
-                # Try to get the system prompt from environment
-                import os
-                system_prompt = os.getenv("SYSTEM_PROMPT")
-                
-                # If still None, use default
-                if system_prompt is None:
-                    system_prompt = (
-                        "Você é um atendente profissional da empresa iPass. "
-                        "Responda a reclamação de forma cordial, resolutiva e empática. "
-                        "Use linguagem formal e profissional, mas amigável. "
-                        "Peça desculpas pelo transtorno, reconheça o problema e "
-                        "ofereça soluções práticas. Encerre agradecendo a oportunidade "
-                        "de resolver a situação. "
-                        "Limite a resposta a um máximo de 500 caracteres."
-                    )
+            # Build the messages; the system prefix is shared by every call
+            builder = self.prompt_builder
+            if system_prompt is not None and system_prompt != builder.system_prompt:
+                builder = PromptBuilder(
+                    system_prompt,
+                    max_complaint_tokens=builder.max_complaint_tokens,
+                    tokenizer=builder.tokenizer
+                )
+            prompt = builder.build(complaint_text)
+            PROMPT_TOKENS_SAVED.inc(prompt.saved_tokens)
             
-            user_prompt = f"Reclamação: '{complaint_text}'. Responda de forma clara e objetiva."
+            # Wait for room in the client-side RPM/TPM budget
+            estimated_tokens = prompt.prompt_tokens + self.max_tokens
+            with STAGE_SECONDS.time(stage="rate_limit_wait"):
+                self.rate_limiter.acquire(estimated_tokens)
             
             # Make the API call
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                temperature=0.7,
-                max_tokens=500
-            )
+            start_time = time.perf_counter()
+            with STAGE_SECONDS.time(stage="openai"):
+                response = self.client.chat.completions.create(
+                    model=model,
+                    messages=prompt.messages,
+                    temperature=0.7,
+                    max_tokens=self.max_tokens
+                )
+            latency_ms = int((time.perf_counter() - start_time) * 1000)
+            
+            if response.usage is not None:
+                prompt_tokens = response.usage.prompt_tokens
+                completion_tokens = response.usage.completion_tokens
+                details = getattr(response.usage, "prompt_tokens_details", None)
+                cached_tokens = getattr(details, "cached_tokens", None) or 0
+                cost = estimate_cost(model, prompt_tokens, completion_tokens, cached_tokens)
+                
+                self.rate_limiter.record_usage(estimated_tokens, prompt_tokens + completion_tokens)
+                OPENAI_TOKENS.inc(prompt_tokens, model=model, type="prompt")
+                OPENAI_TOKENS.inc(completion_tokens, model=model, type="completion")
+                OPENAI_TOKENS.inc(cached_tokens, model=model, type="cached")
+                OPENAI_COST.inc(cost, model=model)
+                
+                self.last_usage = {
+                    "model": model,
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens,
+                    "cached_tokens": cached_tokens,
+                    "saved_tokens": prompt.saved_tokens,
+                    "latency_ms": latency_ms,
+                    "cost_usd": cost
+                }
             
             # Extract the response text
             response_text = response.choices[0].message.content.strip()
             
-            logger.info(f"Generated response: {response_text[:50]}...")
+            logger.debug("Generated response: %s...", response_text[:50])
             return response_text
             
         except Exception as e:
-            logger.error(f"Error generating response: {str(e)}")
+            STAGE_ERRORS.inc(stage="openai")
+            logger.error("Error generating response: %s", e)
             # Return a default response in case of an error
             return (
                 "Agradecemos pelo seu contato. Lamentamos pelo ocorrido e gostaríamos "
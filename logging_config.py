@@ -0,0 +1,201 @@
+import os
+import gzip
+import json
+import queue
+import atexit
+import shutil
+import logging
+import contextvars
+import logging.handlers
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+# Identifiers attached to every record logged inside a processing cycle
+_CONTEXT_VARS = {
+    name: contextvars.ContextVar(name, default=None)
+    for name in ("company_id", "run_id", "complaint_id")
+}
+
+_listener = None
+
+
+@contextmanager
+def log_context(**ids):
+    """
+    Attach identifiers to every log record emitted inside the block.
+
+    Args:
+        **ids: `company_id`, `run_id` and/or `complaint_id` values
+    """
+    tokens = []
+    for name, value in ids.items():
+        var = _CONTEXT_VARS[name]
+        tokens.append((var, var.set(value)))
+    try:
+        yield
+    finally:
+        for var, token in reversed(tokens):
+            var.reset(token)
+
+
+class ContextFilter(logging.Filter):
+    """Copy the current company, run and complaint IDs onto each record."""
+
+    def filter(self, record):
+        # Runs in the emitting thread, before the record crosses the queue
+        for name, var in _CONTEXT_VARS.items():
+            setattr(record, name, var.get())
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """Format records as one JSON object per line."""
+
+    def format(self, record):
+        entry = {
+            "timestamp": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "thread": record.threadName,
+        }
+        for key in _CONTEXT_VARS:
+            value = getattr(record, key, None)
+            if value is not None:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class ConsoleFormatter(logging.Formatter):
+    """Human-readable format that shows the company, run and complaint IDs when set."""
+
+    def __init__(self):
+        super().__init__('%(asctime)s - %(levelname)s - %(name)s - %(context)s%(message)s')
+
+    def format(self, record):
+        ids = [
+            f"{key}={getattr(record, key)}"
+            for key in _CONTEXT_VARS
+            if getattr(record, key, None) is not None
+        ]
+        record.context = f"[{' '.join(ids)}] " if ids else ""
+        return super().format(record)
+
+
+class _PreparedQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that keeps tracebacks apart from the message text."""
+
+    def prepare(self, record):
+        # The default implementation folds the traceback into `msg`; keep it
+        # in `exc_text` instead so the JSON formatter can emit it separately.
+        # Rendering it now also stops the queued record from keeping frames alive.
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.exc_info = None
+        return record
+
+
+def _gzip_namer(name):
+    return name + ".gz"
+
+
+def _gzip_rotator(source, dest):
+    with open(source, "rb") as src, gzip.open(dest, "wb") as dst:
+        shutil.copyfileobj(src, dst)
+    os.remove(source)
+
+
+def _file_handler(log_file, max_bytes, rotate_when, backup_count):
+    """Create a rotating file handler that gzips rotated files."""
+    if rotate_when:
+        handler = logging.handlers.TimedRotatingFileHandler(
+            log_file, when=rotate_when, backupCount=backup_count, encoding="utf-8"
+        )
+    else:
+        handler = logging.handlers.RotatingFileHandler(
+            log_file, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8"
+        )
+    handler.namer = _gzip_namer
+    handler.rotator = _gzip_rotator
+    return handler
+
+
+def _parse_levels(spec):
+    """
+    Parse per-module levels such as "database=WARNING,reclama_bot=DEBUG".
+
+    Returns:
+        dict: Level name by logger name
+    """
+    levels = {}
+    for item in (spec or "").split(","):
+        if "=" in item:
+            name, level = item.split("=", 1)
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def setup_logging():
+    """
+    Configure non-blocking application logging.
+
+    Records are put on an in-memory queue by the calling thread and written
+    by a background QueueListener, so file and console I/O never run on the
+    request or scraping threads. Configuration comes from the environment:
+    LOG_LEVEL, LOG_LEVELS (per-module), LOG_FILE, LOG_FORMAT (json or text),
+    LOG_MAX_BYTES, LOG_ROTATE_WHEN (time-based rotation, e.g. 'midnight')
+    and LOG_BACKUP_COUNT.
+
+    Calling it again is a no-op.
+    """
+    global _listener
+
+    if _listener is not None:
+        return
+
+    log_file = os.getenv("LOG_FILE", "reclame_aqui_bot.log")
+    file_format = os.getenv("LOG_FORMAT", "json").lower()
+    max_bytes = int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+    rotate_when = os.getenv("LOG_ROTATE_WHEN")
+    backup_count = int(os.getenv("LOG_BACKUP_COUNT", "5"))
+
+    file_handler = _file_handler(log_file, max_bytes, rotate_when, backup_count)
+    file_handler.setFormatter(JsonFormatter() if file_format == "json" else ConsoleFormatter())
+
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(ConsoleFormatter())
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = _PreparedQueueHandler(log_queue)
+    queue_handler.addFilter(ContextFilter())
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+
+    for name, level in _parse_levels(os.getenv("LOG_LEVELS")).items():
+        logging.getLogger(name).setLevel(level)
+
+    _listener = logging.handlers.QueueListener(
+        log_queue, file_handler, console_handler, respect_handler_level=True
+    )
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging():
+    """Flush queued records and stop the background listener."""
+    global _listener
+
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -1,192 +1,572 @@
 import os
 import time
+import uuid
 import threading
-import schedule
 import logging
-from flask import Flask, render_template, request, jsonify, redirect, url_for, flash
-from flask_sqlalchemy import SQLAlchemy
+from datetime import datetime
+from flask import Flask, render_template, request, jsonify, redirect, url_for, flash, Response, send_from_directory
 from dotenv import load_dotenv
-from reclama_bot import ReclamaBot
-from database import Database
-from ia_responder import IAResponder
-
-# Set up logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler("reclame_aqui_bot.log"),
-        logging.StreamHandler()
-    ]
-)
-logger = logging.getLogger(__name__)
+from database import open_database
+import metrics
+from logging_config import setup_logging, log_context
+from budget import BudgetGuard
+from prompt_builder import DEFAULT_SYSTEM_PROMPT
+from tenants import TenantScheduler
+from maintenance import MaintenanceJob
+from triage import Triage
+from pregeneration import ResponsePregenerator
+
+# reclama_bot (Selenium) and ia_responder (OpenAI SDK) are imported where they
+# are used, so web workers that only serve the dashboard start without them.
 
 # Load environment variables
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 # Configuration from environment variables
 RECLAMEAQUI_EMAIL = os.getenv("RECLAMEAQUI_EMAIL")
 RECLAMEAQUI_PASSWORD = os.getenv("RECLAMEAQUI_PASSWORD")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 CHECK_INTERVAL_MINUTES = int(os.getenv("CHECK_INTERVAL_MINUTES", "60"))
 BROWSER_TYPE = os.getenv("BROWSER_TYPE", "chrome").lower()  # chrome or firefox
+COMPLAINTS_PER_PAGE = int(os.getenv("COMPLAINTS_PER_PAGE", "25"))
+RECLAMEAQUI_BASE_URL = os.getenv("RECLAMEAQUI_BASE_URL")  # defaults to the public site
+DATABASE_PATH = os.getenv("DATABASE_PATH", "reclameaqui_data.db")
+DATABASE_URL = os.getenv("DATABASE_URL")  # postgresql://... to use PostgreSQL instead of SQLite
+
+# Pauses that make the automation look less like a bot (in seconds)
+COMPLAINT_DELAY_SECONDS = float(os.getenv("COMPLAINT_DELAY_SECONDS", "2"))
+TYPING_DELAY_SECONDS = float(os.getenv("TYPING_DELAY_SECONDS", "0.01"))
 
 # Default prompt for OpenAI
-SYSTEM_PROMPT = os.getenv("SYSTEM_PROMPT", 
-    "Você é um atendente profissional da empresa iPass. "
-    "Responda a reclamação de forma cordial, resolutiva e empática. "
-    "Use linguagem formal e profissional, mas amigável. "
-    "Peça desculpas pelo transtorno, reconheça o problema e "
-    "ofereça soluções práticas. Encerre agradecendo a oportunidade "
-    "de resolver a situação. "
-    "Limite a resposta a um máximo de 500 caracteres."
-)
-
-# Initialize Flask app
-app = Flask(__name__)
-app.secret_key = os.environ.get("SESSION_SECRET", "reclameaqui-bot-secret-key")
-
-# Create a global database instance
-db_instance = Database()
-
-# Flag to track if the bot is currently running
-is_bot_running = False
-scheduler_thread = None
+SYSTEM_PROMPT = os.getenv("SYSTEM_PROMPT", DEFAULT_SYSTEM_PROMPT)
 
-def process_complaints():
-    """Main function to process complaints."""
-    global is_bot_running
+# Shared services, created on first use (see _service)
+_services = {}
+_services_lock = threading.RLock()
+
+def _service(name, factory):
+    """Return the shared service `name`, creating it with `factory` the first time."""
+    with _services_lock:
+        if name not in _services:
+            _services[name] = factory()
+        return _services[name]
+
+def get_db():
+    """Return the database, opening it (and creating its tables) on first use."""
+    return _service("db", lambda: open_database(DATABASE_URL or DATABASE_PATH))
+
+def get_budget_guard():
+    """Return the guard that switches to a cheaper model or defers work as daily OpenAI spend grows."""
+    return _service("budget_guard", lambda: BudgetGuard.from_env(get_db()))
+
+def get_scheduler():
+    """Return the scheduler that shares the browser worker pool between companies."""
+    return _service("scheduler", lambda: TenantScheduler(load_companies, process_company))
+
+def get_maintenance_job():
+    """Return the job that archives old complaints and optimizes the database."""
+    return _service("maintenance_job", lambda: MaintenanceJob(get_db()))
+
+# Complaints a company may process before yielding its browser worker to
+# another company that is waiting
+MAX_COMPLAINTS_PER_TURN = int(os.getenv("MAX_COMPLAINTS_PER_TURN", "20"))
+
+# Processed complaints are written in one transaction per this many rows
+# (and always at the end of a run), instead of one commit per complaint
+COMPLAINT_SAVE_BATCH_SIZE = int(os.getenv("COMPLAINT_SAVE_BATCH_SIZE", "10"))
+
+# Answer repeated and simple complaints locally or with a cheaper model
+# before falling back to the default OpenAI model
+TRIAGE_ENABLED = os.getenv("TRIAGE_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# Name used in template responses for the company configured in .env
+# (registered companies use their own name)
+COMPANY_NAME = os.getenv("COMPANY_NAME")
+
+# Responses generated in parallel while the browser is still scraping
+# (0 generates each response right before it is submitted)
+PREGENERATE_WORKERS = int(os.getenv("PREGENERATE_WORKERS", "2"))
+
+# Capture cProfile, stack samples and WebDriver command timings of each run
+# (can also be switched on the Configurações page)
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() in ("1", "true", "yes")
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+
+# Times a crashed browser is restarted (and logged in again) within one run
+BROWSER_MAX_RESTARTS = int(os.getenv("BROWSER_MAX_RESTARTS", "2"))
+
+# One OpenAI client (and connection pool) shared by every company
+_openai_client = None
+_openai_client_key = None
+_openai_client_lock = threading.Lock()
+
+def get_openai_client():
+    """Return the shared OpenAI client, recreating it if the API key changed."""
+    global _openai_client, _openai_client_key
     
-    try:
-        # Set the running flag
-        is_bot_running = True
-        
-        # Initialize OpenAI responder
-        responder = IAResponder(api_key=OPENAI_API_KEY)
-        
-        # Initialize browser automation
-        reclama_bot = ReclamaBot(
-            email=RECLAMEAQUI_EMAIL,
-            password=RECLAMEAQUI_PASSWORD,
-            browser_type=BROWSER_TYPE
-        )
-        
-        logger.info("Starting complaint processing")
-        
-        # Login to Reclame Aqui
-        login_success = reclama_bot.login()
-        if not login_success:
-            logger.error("Failed to login. Exiting.")
-            return
-        
-        # Get new complaints
-        complaints = reclama_bot.get_new_complaints()
-        logger.info(f"Found {len(complaints)} new complaints")
+    from openai import OpenAI
+    
+    with _openai_client_lock:
+        if _openai_client is None or _openai_client_key != OPENAI_API_KEY:
+            _openai_client = OpenAI(api_key=OPENAI_API_KEY)
+            _openai_client_key = OPENAI_API_KEY
+        return _openai_client
+
+def load_companies():
+    """
+    Return the active companies to process.
+    
+    Without any company registered, the account configured in the
+    environment is processed as the only one.
+    """
+    companies = get_db().get_companies(active_only=True)
+    if companies:
+        return companies
+    
+    if not all([RECLAMEAQUI_EMAIL, RECLAMEAQUI_PASSWORD]):
+        return []
+    
+    return [{
+        "id": None,
+        "name": "Padrão",
+        "email": RECLAMEAQUI_EMAIL,
+        "password": RECLAMEAQUI_PASSWORD,
+        "system_prompt": SYSTEM_PROMPT,
+        "check_interval_minutes": CHECK_INTERVAL_MINUTES,
+        "browser_type": BROWSER_TYPE
+    }]
+
+def process_company(company, should_yield=lambda: False):
+    """
+    Process the new complaints of one company.
+    
+    While profiling is enabled the run is captured with RunProfiler and its
+    artifacts are listed on the Perfis page. cProfile covers the run's own
+    thread; stack samples also cover the threads generating responses.
+    
+    Args:
+        company (dict): Company settings as returned by load_companies()
+        should_yield (callable, optional): Returns True when other companies are
+            waiting for a browser worker
+    
+    Returns:
+        bool: True if the company still has unprocessed complaints
+    """
+    run_id = uuid.uuid4().hex[:12]
+    if not PROFILING_ENABLED:
+        return _run_company(company, should_yield, run_id)
+    
+    from profiling import RunProfiler
+    
+    name = f"{datetime.now():%Y%m%d-%H%M%S}-{company['id'] or 0}-{run_id}"
+    with RunProfiler(name, directory=PROFILE_DIR) as profiler:
+        profiler.details = {"company": company["name"], "run_id": run_id}
+        return _run_company(company, should_yield, run_id, profiler=profiler)
+
+def _run_company(company, should_yield, run_id, profiler=None):
+    """Run process_company(), recording WebDriver commands and worker stacks in `profiler` if given."""
+    from ia_responder import IAResponder
+    from reclama_bot import ReclamaBot
+    
+    company_id = company["id"]
+    
+    with log_context(company_id=company_id, run_id=run_id):
+        cycle_start = time.perf_counter()
+        pending_saves = []
         
-        # Process each complaint
-        for complaint in complaints:
-            # Check if we've already responded to this complaint
-            if db_instance.is_complaint_processed(complaint['id']):
-                logger.info(f"Complaint ID {complaint['id']} already processed. Skipping.")
-                continue
+        try:
+            # One responder per generating thread keeps last_usage private to it
+            responders = threading.local()
+            
+            def get_responder():
+                if not hasattr(responders, "responder"):
+                    responders.responder = IAResponder(
+                        api_key=OPENAI_API_KEY,
+                        system_prompt=company.get("system_prompt") or SYSTEM_PROMPT,
+                        client=get_openai_client()
+                    )
+                return responders.responder
+            
+            get_responder()
+            triage = Triage(
+                get_db(), company_id=company_id,
+                company_name=company["name"] if company_id is not None else COMPANY_NAME
+            ) if TRIAGE_ENABLED else None
+            # Responses are generated while the browser keeps scraping, at most one
+            # turn's worth ahead of the complaints being submitted
+            pregenerator = ResponsePregenerator(
+                workers=PREGENERATE_WORKERS, lookahead=MAX_COMPLAINTS_PER_TURN,
+                initializer=profiler.sample_thread if profiler else None
+            )
+            
+            # Initialize browser automation
+            reclama_bot = ReclamaBot(
+                email=company["email"],
+                password=company["password"],
+                browser_type=company.get("browser_type") or BROWSER_TYPE,
+                base_url=RECLAMEAQUI_BASE_URL,
+                typing_delay=TYPING_DELAY_SECONDS,
+                max_restarts=BROWSER_MAX_RESTARTS,
+                command_profiler=profiler.commands if profiler else None
+            )
             
-            logger.info(f"Processing complaint ID: {complaint['id']}")
+            logger.info("Starting complaint processing for %s", company["name"])
             
-            # Generate AI response
-            response_text = responder.generate_response(complaint['text'], system_prompt=SYSTEM_PROMPT)
+            # Login to Reclame Aqui
+            login_success = reclama_bot.login()
+            if not login_success:
+                logger.error("Failed to login. Exiting.")
+                return False
             
-            # Submit response
-            response_success = reclama_bot.submit_response(complaint['id'], response_text)
+            # Complaints scraped by an earlier run that stopped before answering them
+            checkpoint = get_db().get_checkpoint(company_id)
+            if checkpoint:
+                logger.info(
+                    "Resuming after run %s, which stopped at item %s of %s (complaint ID %s)",
+                    checkpoint["run_id"], checkpoint["position"], checkpoint["total"], checkpoint["last_complaint_id"]
+                )
+            stored = {row["complaint_id"]: row for row in get_db().get_pending_complaints(company_id)}
+            resumed_ids = set()
+            # Every complaint ID in the inbox list, read or not
+            listed = set()
             
-            # Save to database
-            db_instance.save_complaint(
-                complaint_id=complaint['id'],
-                customer_name=complaint['customer_name'],
-                complaint_text=complaint['text'],
-                response_text=response_text,
-                status="completed" if response_success else "failed"
+            def generate(complaint, decision, model, remembered=None):
+                # Runs on a pregeneration thread
+                with log_context(complaint_id=complaint['id']):
+                    generation_start = time.perf_counter()
+                    try:
+                        responder = get_responder()
+                        response_text = responder.generate_response(
+                            decision.text if decision else complaint['text'], model=model
+                        )
+                    except BaseException as e:
+                        # Repeats of this complaint must not wait for a response that never comes
+                        if remembered is not None:
+                            remembered.set_exception(e)
+                        raise
+                    generation_seconds = time.perf_counter() - generation_start
+                    # Repeats of this complaint read meanwhile are waiting for this response
+                    if remembered is not None:
+                        remembered.set_result(response_text)
+                    if responder.last_usage:
+                        get_db().record_usage(complaint_id=complaint['id'], run_id=run_id, **responder.last_usage)
+                    return response_text, generation_seconds
+            
+            def queue(complaint, stored_response=None):
+                with log_context(complaint_id=complaint['id']):
+                    # Response generated by an earlier run that stopped before submitting it
+                    if stored_response:
+                        if triage:
+                            triage.remember(complaint, stored_response)
+                        pregenerator.add_ready(complaint, (stored_response, 0.0))
+                        return
+                    
+                    decision = triage.decide(complaint) if triage else None
+                    if decision is not None and decision.response is not None:
+                        triage.remember(complaint, decision.response)
+                        pregenerator.add_ready(complaint, (decision.response, 0.0), payload=decision)
+                        return
+                    if decision is not None and decision.pending is not None:
+                        # Repeat of a complaint of this run whose response is still being generated
+                        pregenerator.add(complaint, lambda: (decision.pending.result(), 0.0), payload=decision)
+                        return
+                    
+                    # Leave the complaint for a later cycle once the daily budget is spent
+                    model = get_budget_guard().select_model(decision and decision.model or get_responder().model)
+                    if model is None:
+                        metrics.COMPLAINTS_PROCESSED.inc(status="deferred")
+                        logger.warning("Complaint ID %s deferred: daily OpenAI budget reached", complaint['id'])
+                        return
+                    
+                    remembered = triage.remember(complaint) if triage else None
+                    pregenerator.add(complaint, lambda: generate(complaint, decision, model, remembered), payload=decision)
+            
+            def skip(complaint_id):
+                listed.add(complaint_id)
+                if complaint_id in stored:
+                    # Only stored complaints still listed as new are answered; the others were
+                    # answered meanwhile (possibly by a run that died before saving)
+                    row = stored[complaint_id]
+                    resumed_ids.add(complaint_id)
+                    queue(
+                        {"id": complaint_id, "customer_name": row["customer_name"], "text": row["complaint_text"]},
+                        stored_response=row["response_text"]
+                    )
+                    return True
+                if get_db().is_complaint_processed(complaint_id):
+                    metrics.COMPLAINTS_PROCESSED.inc(status="skipped")
+                    logger.info("Complaint ID %s already processed. Skipping.", complaint_id)
+                    return True
+                return False
+            
+            # Get new complaints; each one is stored and queued for generation as
+            # soon as it is read, so a crash loses no scraping work
+            scraped = 0
+            for complaint in reclama_bot.iter_new_complaints(skip=skip):
+                get_db().save_pending_with_checkpoint(
+                    complaint_id=complaint["id"],
+                    customer_name=complaint["customer_name"],
+                    complaint_text=complaint["text"],
+                    company_id=company_id,
+                    run_id=run_id,
+                    position=complaint["position"],
+                    total=complaint["total"]
+                )
+                queue(complaint)
+                scraped += 1
+            
+            if reclama_bot.walk_complete:
+                get_db().clear_checkpoint(company_id)
+                # Stored complaints no longer listed were answered or closed outside this bot
+                stale_ids = [complaint_id for complaint_id in stored if complaint_id not in listed]
+                if stale_ids:
+                    get_db().delete_complaints(stale_ids)
+                    logger.info("Removed %s pending complaints that left the inbox", len(stale_ids))
+            logger.info(
+                "Found %s new complaints (%s more resumed from an earlier run)", scraped, len(resumed_ids)
             )
             
-            logger.info(f"Complaint ID {complaint['id']} processed with status: {'success' if response_success else 'failed'}")
+            # Submit each response in the order the complaints were read
+            processed = 0
+            for complaint, decision, (response_text, generation_seconds) in pregenerator:
+                with log_context(complaint_id=complaint['id']):
+                    logger.info("Processing complaint ID: %s", complaint['id'])
+                    processed += 1
+                    
+                    if decision is not None:
+                        triage.record(complaint, decision, response_text, generation_seconds)
+                    
+                    # Submit response
+                    response_success = reclama_bot.submit_response(complaint['id'], response_text)
+                    if not response_success and not reclama_bot.is_alive() and reclama_bot.restart():
+                        response_success = reclama_bot.submit_response(complaint['id'], response_text)
+                    
+                    # Queue for the next group commit
+                    pending_saves.append({
+                        "complaint_id": complaint['id'],
+                        "customer_name": complaint['customer_name'],
+                        "complaint_text": complaint['text'],
+                        "response_text": response_text,
+                        "status": "completed" if response_success else "failed"
+                    })
+                    if len(pending_saves) >= COMPLAINT_SAVE_BATCH_SIZE:
+                        get_db().save_complaints_bulk(pending_saves, company_id=company_id)
+                        pending_saves.clear()
+                    
+                    metrics.COMPLAINTS_PROCESSED.inc(status="completed" if response_success else "failed")
+                    logger.info("Complaint ID %s processed with status: %s", complaint['id'], 'success' if response_success else 'failed')
+                    
+                    # Small delay to avoid being flagged as a bot
+                    time.sleep(COMPLAINT_DELAY_SECONDS)
+                
+                # Hand the worker to a waiting company; the rest is picked up next turn.
+                # The browser is closed so the pool stays within BROWSER_POOL_SIZE, which
+                # means the next turn logs in and reloads the list again (its complaints
+                # are already stored, so they are not scraped twice)
+                if processed >= MAX_COMPLAINTS_PER_TURN and len(pregenerator) and should_yield():
+                    logger.info("Yielding after %s complaints to let other companies run", processed)
+                    return True
             
-            # Small delay to avoid being flagged as a bot
-            time.sleep(2)
-        
-        logger.info("Completed complaint processing cycle")
-        
-    except Exception as e:
-        logger.error(f"Error in process_complaints: {str(e)}", exc_info=True)
-    
-    finally:
-        # Ensure the browser is closed even if there's an error
-        if 'reclama_bot' in locals():
-            reclama_bot.close()
+            logger.info("Completed complaint processing cycle")
+            return False
+            
+        except Exception as e:
+            metrics.STAGE_ERRORS.inc(stage="cycle")
+            logger.error("Error in process_company: %s", e, exc_info=True)
+            return False
         
-        # Reset the running flag
-        is_bot_running = False
+        finally:
+            # Keep responses generated but not submitted for the next run
+            if 'pregenerator' in locals():
+                for complaint, _, (response_text, _) in pregenerator.close():
+                    pending_saves.append({
+                        "complaint_id": complaint['id'],
+                        "customer_name": complaint['customer_name'],
+                        "complaint_text": complaint['text'],
+                        "response_text": response_text,
+                        "status": "pending"
+                    })
+            
+            # Write what is still queued, also when the run stopped early
+            if pending_saves:
+                get_db().save_complaints_bulk(pending_saves, company_id=company_id)
+            
+            # Ensure the browser is closed even if there's an error
+            if 'reclama_bot' in locals():
+                reclama_bot.close()
+            
+            metrics.STAGE_SECONDS.observe(time.perf_counter() - cycle_start, stage="cycle")
 
-def run_scheduler():
-    """Run the scheduler to periodically check for complaints."""
-    logger.info(f"Starting scheduler to run every {CHECK_INTERVAL_MINUTES} minutes")
-    
-    # Run immediately the first time
-    process_complaints()
-    
-    # Schedule to run periodically
-    schedule.every(CHECK_INTERVAL_MINUTES).minutes.do(process_complaints)
-    
-    while True:
-        schedule.run_pending()
-        time.sleep(1)
+def process_complaints():
+    """Process the new complaints of every active company and wait for them to finish."""
+    scheduler = get_scheduler()
+    scheduler.run_all_now()
+    scheduler.wait_idle()
 
-def start_scheduler_thread():
-    """Start the scheduler in a separate thread."""
-    global scheduler_thread
-    
-    # Only start if not already running
-    if scheduler_thread is None or not scheduler_thread.is_alive():
-        scheduler_thread = threading.Thread(target=run_scheduler)
-        scheduler_thread.daemon = True  # Daemon thread will be killed when the main process exits
-        scheduler_thread.start()
-        logger.info("Scheduler thread started")
-        return True
-    
-    return False
+# Flask routes, registered on the app by create_app()
+_routes = []
+
+def route(rule, **options):
+    """Record a view function to be registered by create_app()."""
+    def decorator(view):
+        _routes.append((rule, view, options))
+        return view
+    return decorator
 
-# Flask routes
-@app.route('/')
+@route('/')
 def index():
     """Main dashboard page"""
     # Get statistics
-    stats = db_instance.get_statistics()
+    stats = get_db().get_statistics()
     
-    # Get the most recent complaints
-    complaints = db_instance.get_all_complaints(limit=10)
+    # Get the most recent complaints; the table only shows the start of each text
+    complaints = get_db().get_all_complaints(limit=10, text_limit=50)
+    
+    # Get OpenAI token and cost rollups
+    usage = get_db().get_usage_statistics(days=7, runs=5)
     
     return render_template('index.html', 
                           stats=stats, 
                           complaints=complaints, 
-                          bot_running=is_bot_running,
+                          bot_running=get_scheduler().is_running(),
+                          metrics_summary=metrics.summary(),
+                          usage=usage,
+                          daily_budget=get_budget_guard().daily_budget,
                           CHECK_INTERVAL_MINUTES=CHECK_INTERVAL_MINUTES,
                           BROWSER_TYPE=BROWSER_TYPE,
                           RECLAMEAQUI_EMAIL=RECLAMEAQUI_EMAIL,
                           RECLAMEAQUI_PASSWORD=RECLAMEAQUI_PASSWORD,
                           OPENAI_API_KEY=OPENAI_API_KEY)
 
-@app.route('/complaints')
+@route('/complaints')
 def view_complaints():
-    """View all complaints"""
-    complaints = db_instance.get_all_complaints(limit=100)
-    return render_template('complaints.html', complaints=complaints)
+    """View and search complaints"""
+    filters = {
+        'q': request.args.get('q', '').strip(),
+        'status': request.args.get('status', ''),
+        'date_from': request.args.get('date_from', ''),
+        'date_to': request.args.get('date_to', ''),
+        'company_id': request.args.get('company_id', type=int)
+    }
+    page = request.args.get('page', 1, type=int)
+
+    if filters['status'] not in ['', 'completed', 'failed', 'pending']:
+        filters['status'] = ''
+
+    for key in ['date_from', 'date_to']:
+        try:
+            if filters[key]:
+                datetime.strptime(filters[key], '%Y-%m-%d')
+        except ValueError:
+            flash('Data inválida. Use o formato AAAA-MM-DD.', 'warning')
+            filters[key] = ''
 
-@app.route('/start_bot', methods=['POST'])
+    search_result = get_db().search(
+        query=filters['q'] or None,
+        status=filters['status'] or None,
+        date_from=filters['date_from'] or None,
+        date_to=filters['date_to'] or None,
+        page=page,
+        per_page=COMPLAINTS_PER_PAGE,
+        company_id=filters['company_id']
+    )
+
+    return render_template('complaints.html',
+                          complaints=search_result['results'],
+                          search=search_result,
+                          filters=filters,
+                          companies=get_db().get_companies())
+
+@route('/companies')
+def companies_page():
+    """List companies and edit their settings"""
+    companies = get_db().get_companies()
+    for company in companies:
+        company['stats'] = get_db().get_statistics(company_id=company['id'])
+    
+    edit_company = None
+    edit_id = request.args.get('edit', type=int)
+    if edit_id is not None:
+        edit_company = get_db().get_company(edit_id)
+    
+    return render_template('companies.html',
+                          companies=companies,
+                          edit_company=edit_company,
+                          DEFAULT_SYSTEM_PROMPT=SYSTEM_PROMPT)
+
+@route('/save_company', methods=['POST'])
+def save_company():
+    """Create or update a company"""
+    company_id = request.form.get('company_id', type=int)
+    name = request.form.get('name', '').strip()
+    email = request.form.get('email', '').strip()
+    password = request.form.get('password', '')
+    system_prompt = request.form.get('system_prompt', '').strip()
+    check_interval = request.form.get('check_interval', '60')
+    browser_type = request.form.get('browser_type', 'chrome')
+    
+    # Keep the stored password when editing without typing a new one
+    if not password and company_id is not None:
+        existing = get_db().get_company(company_id)
+        password = existing['password'] if existing else ''
+    
+    if not all([name, email, password]):
+        flash('Nome, email e senha são obrigatórios.', 'warning')
+        return redirect(url_for('companies_page'))
+    
+    try:
+        check_interval_int = int(check_interval)
+        if check_interval_int < 5 or check_interval_int > 1440:
+            raise ValueError("Intervalo deve estar entre 5 e 1440 minutos")
+    except ValueError:
+        flash('Intervalo de verificação inválido. Deve ser um número entre 5 e 1440.', 'danger')
+        return redirect(url_for('companies_page'))
+    
+    if browser_type not in ['chrome', 'firefox']:
+        flash('Tipo de navegador inválido.', 'danger')
+        return redirect(url_for('companies_page'))
+    
+    saved_id = get_db().save_company(
+        name=name,
+        email=email,
+        password=password,
+        system_prompt=system_prompt or None,
+        check_interval_minutes=check_interval_int,
+        browser_type=browser_type,
+        active=request.form.get('active') == 'on',
+        company_id=company_id
+    )
+    
+    if saved_id is not None:
+        get_scheduler().refresh()
+        flash(f'Empresa {name} salva com sucesso!', 'success')
+    else:
+        flash('Erro ao salvar empresa. Verifique se o nome já não está em uso.', 'danger')
+    
+    return redirect(url_for('companies_page'))
+
+@route('/delete_company/<int:company_id>', methods=['POST'])
+def delete_company(company_id):
+    """Delete a company, keeping its complaints"""
+    if get_db().delete_company(company_id):
+        get_scheduler().refresh()
+        flash('Empresa removida.', 'success')
+    else:
+        flash('Erro ao remover empresa.', 'danger')
+    
+    return redirect(url_for('companies_page'))
+
+@route('/start_bot', methods=['POST'])
 def start_bot():
     """Start the bot manually"""
-    if not all([RECLAMEAQUI_EMAIL, RECLAMEAQUI_PASSWORD, OPENAI_API_KEY]):
+    if not OPENAI_API_KEY or not load_companies():
         flash("Erro: Faltam variáveis de ambiente. Verifique seu arquivo .env", "danger")
         return redirect(url_for('index'))
     
-    success = start_scheduler_thread()
+    success = get_scheduler().enable_schedule()
+    get_maintenance_job().start()
     
     if success:
         flash("Bot iniciado com sucesso! Verificando reclamações...", "success")
@@ -195,23 +575,23 @@ def start_bot():
     
     return redirect(url_for('index'))
 
-@app.route('/run_once', methods=['POST'])
+@route('/run_once', methods=['POST'])
 def run_once():
     """Run the bot once manually"""
-    if is_bot_running:
+    if get_scheduler().is_running():
         flash("O bot já está em execução. Aguarde a conclusão.", "warning")
         return redirect(url_for('index'))
     
-    # Start in a separate thread to not block the web server
-    threading.Thread(target=process_complaints).start()
+    # Runs on the scheduler's worker pool, not blocking the web server
+    get_scheduler().run_all_now()
     flash("Processamento manual iniciado!", "success")
     
     return redirect(url_for('index'))
 
-@app.route('/export', methods=['POST'])
+@route('/export', methods=['POST'])
 def export_data():
     """Export complaint data to JSON"""
-    success = db_instance.export_to_json()
+    success = get_db().export_to_json()
     
     if success:
         flash("Dados exportados com sucesso para 'complaints_export.json'", "success")
@@ -220,30 +600,117 @@ def export_data():
     
     return redirect(url_for('index'))
 
-@app.route('/api/stats')
+@route('/api/stats')
 def api_stats():
     """API endpoint for current statistics"""
-    return jsonify(db_instance.get_statistics())
+    stats = get_db().get_statistics()
+    stats["usage"] = get_db().get_usage_statistics()
+    return jsonify(stats)
+
+@route('/metrics')
+def metrics_endpoint():
+    """Prometheus metrics endpoint"""
+    return Response(metrics.registry.render_prometheus(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+@route('/profiles')
+def profiles_page():
+    """List the profiled processing runs."""
+    from profiling import list_profiles
+    
+    return render_template('profiles.html', profiles=list_profiles(PROFILE_DIR), profiling_enabled=PROFILING_ENABLED)
 
-@app.route('/api/status')
+@route('/profiles/<name>')
+def profile_detail(name):
+    """Show the flame graph, slowest functions and WebDriver commands of one run."""
+    from profiling import load_profile
+    
+    profile = load_profile(name, PROFILE_DIR)
+    if profile is None:
+        flash('Perfil não encontrado.', 'warning')
+        return redirect(url_for('profiles_page'))
+    return render_template('profile.html', profile=profile)
+
+@route('/profiles/<name>/<kind>')
+def download_profile(name, kind):
+    """Download the cProfile statistics or folded stacks of one run."""
+    if kind not in ('prof', 'folded'):
+        flash('Arquivo de perfil inválido.', 'warning')
+        return redirect(url_for('profiles_page'))
+    return send_from_directory(os.path.abspath(PROFILE_DIR), f"{name}.{kind}", as_attachment=True)
+
+def _update_env_file(values, comments=None, path='.env'):
+    """
+    Set keys in the .env file, keeping every other line as it is.
+    
+    Args:
+        values (dict): Key -> value; existing lines of a key are replaced in place
+        comments (dict, optional): Key -> comment written above a key that is appended
+        path (str, optional): File to update
+    """
+    import re
+    
+    env_content = ""
+    if os.path.exists(path):
+        with open(path, 'r') as f:
+            env_content = f.read()
+    
+    comments = comments or {}
+    for key, value in values.items():
+        line = f"{key}={value}"
+        pattern = re.compile(rf'^{re.escape(key)}=.*$', re.MULTILINE)
+        if pattern.search(env_content):
+            env_content = pattern.sub(lambda match: line, env_content)
+        else:
+            if env_content and not env_content.endswith("\n"):
+                env_content += "\n"
+            if key in comments:
+                env_content += f"\n# {comments[key]}\n"
+            env_content += line + "\n"
+    
+    with open(path, 'w') as f:
+        f.write(env_content)
+
+@route('/save_profiling', methods=['POST'])
+def save_profiling():
+    """Switch run profiling on or off and save the choice to the .env file."""
+    global PROFILING_ENABLED
+    
+    PROFILING_ENABLED = request.form.get('profiling_enabled') == 'on'
+    
+    try:
+        _update_env_file(
+            {"PROFILING_ENABLED": 'true' if PROFILING_ENABLED else 'false'},
+            comments={"PROFILING_ENABLED": "Profile each processing run"}
+        )
+        
+        flash('Perfil de execução ' + ('ativado' if PROFILING_ENABLED else 'desativado') + '.', 'success')
+        logger.info("Run profiling %s", "enabled" if PROFILING_ENABLED else "disabled")
+        
+    except Exception as e:
+        flash(f'Erro ao salvar configuração de perfil: {str(e)}', 'danger')
+        logger.error("Error saving profiling setting to .env file: %s", e)
+    
+    return redirect(url_for('config_page'))
+
+@route('/api/status')
 def api_status():
     """API endpoint for bot status"""
-    return jsonify({"running": is_bot_running})
+    scheduler = get_scheduler()
+    return jsonify({"running": scheduler.is_running(), "scheduled": scheduler.is_scheduled()})
 
 # Custom Jinja2 filter for newlines
-@app.template_filter('nl2br')
 def nl2br(value):
     """Convert newlines to <br> tags for display in HTML."""
     if value:
         return value.replace('\n', '<br>')
     return ''
 
-@app.route('/test', methods=['GET'])
+@route('/test', methods=['GET'])
 def test_page():
     """Page to test OpenAI response generation."""
     return render_template('test_response.html')
 
-@app.route('/test_response', methods=['POST'])
+@route('/test_response', methods=['POST'])
 def test_response():
     """Generate a test AI response."""
     customer_name = request.form.get('customer_name', 'Cliente Teste')
@@ -253,30 +720,39 @@ def test_response():
         flash('Por favor, insira o texto da reclamação.', 'warning')
         return redirect(url_for('test_page'))
     
+    from ia_responder import IAResponder
+    
     try:
         # Initialize OpenAI responder
-        responder = IAResponder(api_key=OPENAI_API_KEY)
+        responder = IAResponder(api_key=OPENAI_API_KEY, system_prompt=SYSTEM_PROMPT)
         
         # Time the response generation
         start_time = time.time()
         response_text = responder.generate_response(complaint_text)
         generation_time = round(time.time() - start_time, 2)
         
+        if responder.last_usage:
+            get_db().record_usage(complaint_id=None, **responder.last_usage)
+        
         return render_template(
             'test_response.html',
             customer_name=customer_name,
             complaint_text=complaint_text,
             response_text=response_text,
             generation_time=generation_time,
-            model_name=responder.model
+            model_name=responder.model,
+            usage=responder.last_usage,
+            triage=Triage(company_name=COMPANY_NAME).decide(
+                {"id": "teste", "customer_name": customer_name, "text": complaint_text}
+            )
         )
         
     except Exception as e:
-        logger.error(f"Error generating test response: {str(e)}")
+        logger.error("Error generating test response: %s", e)
         flash(f'Erro ao gerar resposta: {str(e)}', 'danger')
         return redirect(url_for('test_page'))
 
-@app.route('/save_test', methods=['POST'])
+@route('/save_test', methods=['POST'])
 def save_test():
     """Save test complaint and response to database."""
     customer_name = request.form.get('customer_name', 'Cliente Teste')
@@ -288,11 +764,10 @@ def save_test():
         return redirect(url_for('test_page'))
     
     # Generate a unique ID for this test complaint
-    import uuid
     complaint_id = f"TEST-{uuid.uuid4().hex[:8]}"
     
     # Save to database
-    success = db_instance.save_complaint(
+    success = get_db().save_complaint(
         complaint_id=complaint_id,
         customer_name=customer_name,
         complaint_text=complaint_text,
@@ -307,7 +782,7 @@ def save_test():
     
     return redirect(url_for('index'))
 
-@app.route('/config', methods=['GET'])
+@route('/config', methods=['GET'])
 def config_page():
     """Configuration page."""
     return render_template('config.html',
@@ -316,9 +791,10 @@ def config_page():
                           OPENAI_API_KEY=OPENAI_API_KEY,
                           CHECK_INTERVAL_MINUTES=CHECK_INTERVAL_MINUTES,
                           BROWSER_TYPE=BROWSER_TYPE,
-                          SYSTEM_PROMPT=SYSTEM_PROMPT)
+                          SYSTEM_PROMPT=SYSTEM_PROMPT,
+                          PROFILING_ENABLED=PROFILING_ENABLED)
 
-@app.route('/save_config', methods=['POST'])
+@route('/save_config', methods=['POST'])
 def save_config():
     """Save configuration to .env file."""
     global RECLAMEAQUI_EMAIL, RECLAMEAQUI_PASSWORD, OPENAI_API_KEY, CHECK_INTERVAL_MINUTES, BROWSER_TYPE
@@ -350,34 +826,34 @@ def save_config():
     CHECK_INTERVAL_MINUTES = check_interval_int
     BROWSER_TYPE = browser_type
     
-    # Update .env file
+    # Update the form's keys in the .env file; the other settings stay as they are
     try:
-        with open('.env', 'w') as f:
-            f.write(f"# Reclame Aqui login credentials\n")
-            f.write(f"RECLAMEAQUI_EMAIL={reclameaqui_email}\n")
-            f.write(f"RECLAMEAQUI_PASSWORD={reclameaqui_password}\n")
-            f.write(f"\n# OpenAI API Key\n")
-            f.write(f"OPENAI_API_KEY={openai_api_key}\n")
-            f.write(f"\n# How often to check for new complaints (in minutes)\n")
-            f.write(f"CHECK_INTERVAL_MINUTES={check_interval_int}\n")
-            f.write(f"\n# Browser type (chrome or firefox)\n")
-            f.write(f"BROWSER_TYPE={browser_type}\n")
-            
-            # Preserve system prompt if it exists
-            if SYSTEM_PROMPT:
-                f.write(f"\n# System prompt for OpenAI\n")
-                f.write(f"SYSTEM_PROMPT=\"{SYSTEM_PROMPT}\"\n")
+        _update_env_file(
+            {
+                "RECLAMEAQUI_EMAIL": reclameaqui_email,
+                "RECLAMEAQUI_PASSWORD": reclameaqui_password,
+                "OPENAI_API_KEY": openai_api_key,
+                "CHECK_INTERVAL_MINUTES": check_interval_int,
+                "BROWSER_TYPE": browser_type,
+            },
+            comments={
+                "RECLAMEAQUI_EMAIL": "Reclame Aqui login credentials",
+                "OPENAI_API_KEY": "OpenAI API Key",
+                "CHECK_INTERVAL_MINUTES": "How often to check for new complaints (in minutes)",
+                "BROWSER_TYPE": "Browser type (chrome or firefox)",
+            }
+        )
         
         flash('Configurações salvas com sucesso!', 'success')
         logger.info("Configuration updated and saved to .env file")
         
     except Exception as e:
         flash(f'Erro ao salvar configurações: {str(e)}', 'danger')
-        logger.error(f"Error saving configuration to .env file: {str(e)}")
+        logger.error("Error saving configuration to .env file: %s", e)
     
     return redirect(url_for('config_page'))
 
-@app.route('/save_prompt', methods=['POST'])
+@route('/save_prompt', methods=['POST'])
 def save_prompt():
     """Save system prompt to .env file."""
     global SYSTEM_PROMPT
@@ -420,14 +896,38 @@ def save_prompt():
         
     except Exception as e:
         flash(f'Erro ao salvar prompt: {str(e)}', 'danger')
-        logger.error(f"Error saving system prompt to .env file: {str(e)}")
+        logger.error("Error saving system prompt to .env file: %s", e)
     
     return redirect(url_for('config_page'))
 
+def create_app():
+    """
+    Create the Flask application.
+    
+    Only the web layer is set up here; the database, scheduler and OpenAI
+    and browser libraries are loaded by the first request or run that needs them.
+    
+    Returns:
+        Flask: The configured application
+    """
+    setup_logging()
+    
+    app = Flask(__name__)
+    app.secret_key = os.environ.get("SESSION_SECRET", "reclameaqui-bot-secret-key")
+    
+    for rule, view, options in _routes:
+        app.add_url_rule(rule, view_func=view, **options)
+    app.add_template_filter(nl2br, 'nl2br')
+    
+    return app
+
 # Create templates directory and needed templates
 if not os.path.exists('templates'):
     os.makedirs('templates')
 
+# Module-level app for `gunicorn main:app` and `python main.py`
+app = create_app()
+
 if __name__ == "__main__":
     # Check if required environment variables are set
     if not all([RECLAMEAQUI_EMAIL, RECLAMEAQUI_PASSWORD, OPENAI_API_KEY]):
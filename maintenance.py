@@ -0,0 +1,185 @@
+"""
+Retention and upkeep of the complaints database.
+
+Complaints older than the retention period are moved out of the database
+into gzip-compressed JSON-lines files, one per month of creation
+(archive/complaints-2024-03.jsonl.gz), and the database is then analyzed
+and compacted. Runs on a schedule next to the bot, or by hand:
+
+    python maintenance.py --retention-days 365 --vacuum
+"""
+import os
+import sys
+import gzip
+import json
+import time
+import logging
+import argparse
+import threading
+from datetime import datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+
+def archive_complaints(db, before, archive_dir, batch_size=1000):
+    """
+    Move complaints created before a given time into monthly archive files.
+
+    Pending complaints stay in the database until they are answered. Each
+    batch is written and synced to disk before it is deleted from the
+    database, so an interruption can at worst archive a batch twice, never
+    lose it.
+
+    Args:
+        db (Database): Database to archive from
+        before (datetime): Complaints created earlier are archived
+        archive_dir (str): Directory for the archive files
+        batch_size (int, optional): Complaints moved per transaction
+
+    Returns:
+        int: Number of complaints archived
+    """
+    os.makedirs(archive_dir, exist_ok=True)
+    archived = 0
+
+    while True:
+        complaints = db.get_complaints_before(before, limit=batch_size)
+        if not complaints:
+            break
+
+        by_month = {}
+        for complaint in complaints:
+            by_month.setdefault(complaint["created_at"][:7], []).append(complaint)
+
+        for month, rows in by_month.items():
+            path = os.path.join(archive_dir, f"complaints-{month}.jsonl.gz")
+            lines = "".join(json.dumps(row, ensure_ascii=False) + "\n" for row in rows)
+            # Appending adds a new gzip member; readers see one continuous file
+            with open(path, "ab") as raw:
+                with gzip.GzipFile(fileobj=raw, mode="ab") as f:
+                    f.write(lines.encode("utf-8"))
+                raw.flush()
+                os.fsync(raw.fileno())
+
+        deleted = db.delete_complaints([complaint["complaint_id"] for complaint in complaints])
+        if deleted == 0:
+            logger.error("Archived complaints could not be deleted; stopping")
+            break
+        archived += deleted
+
+    if archived:
+        logger.info("Archived %s complaints created before %s to %s", archived, before.date(), archive_dir)
+    return archived
+
+
+def read_archive(path):
+    """
+    Yield the complaints stored in an archive file.
+
+    Args:
+        path (str): Path to a complaints-YYYY-MM.jsonl.gz file
+
+    Yields:
+        dict: One archived complaint
+    """
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            yield json.loads(line)
+
+
+class MaintenanceJob:
+    """Periodically archive old complaints and optimize the database."""
+
+    def __init__(self, db, retention_days=None, archive_dir=None, interval_hours=None):
+        """
+        Initialize the job.
+
+        Args:
+            db (Database): Database to maintain
+            retention_days (int, optional): Age in days after which complaints are
+                archived. Defaults to RETENTION_DAYS; 0 keeps everything.
+            archive_dir (str, optional): Directory for archive files. Defaults to
+                ARCHIVE_DIR ("archive").
+            interval_hours (float, optional): Hours between runs. Defaults to
+                MAINTENANCE_INTERVAL_HOURS (24).
+        """
+        if retention_days is None:
+            retention_days = int(os.getenv("RETENTION_DAYS", "0"))
+        if archive_dir is None:
+            archive_dir = os.getenv("ARCHIVE_DIR", "archive")
+        if interval_hours is None:
+            interval_hours = float(os.getenv("MAINTENANCE_INTERVAL_HOURS", "24"))
+
+        self.db = db
+        self.retention_days = retention_days
+        self.archive_dir = archive_dir
+        self.interval_hours = interval_hours
+        self._thread = None
+
+    def run_once(self, vacuum=None):
+        """
+        Archive expired complaints, then analyze and optimize the database.
+
+        Args:
+            vacuum (bool, optional): Compact the database file. By default it is
+                compacted only when complaints were archived.
+
+        Returns:
+            int: Number of complaints archived
+        """
+        archived = 0
+        if self.retention_days > 0:
+            before = datetime.now() - timedelta(days=self.retention_days)
+            archived = archive_complaints(self.db, before, self.archive_dir)
+
+        self.db.optimize(vacuum=bool(archived) if vacuum is None else vacuum)
+        return archived
+
+    def start(self):
+        """
+        Run the job in a background thread, the first time after one interval.
+
+        Returns:
+            bool: False if it was already running
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return False
+
+        self._thread = threading.Thread(target=self._loop, name="maintenance", daemon=True)
+        self._thread.start()
+        logger.info("Maintenance scheduled every %s hours (retention: %s days)",
+                    self.interval_hours, self.retention_days or "unlimited")
+        return True
+
+    def _loop(self):
+        while True:
+            time.sleep(self.interval_hours * 3600)
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error("Error in database maintenance: %s", e, exc_info=True)
+
+
+def main():
+    from dotenv import load_dotenv
+    from database import open_database
+
+    load_dotenv()
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--retention-days", type=int, default=int(os.getenv("RETENTION_DAYS", "0")),
+                        help="Archive complaints older than this many days (0 keeps everything)")
+    parser.add_argument("--archive-dir", default=os.getenv("ARCHIVE_DIR", "archive"))
+    parser.add_argument("--vacuum", action="store_true", help="Compact the database file even if nothing was archived")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    db = open_database(os.getenv("DATABASE_URL") or os.getenv("DATABASE_PATH", "reclameaqui_data.db"))
+    job = MaintenanceJob(db, retention_days=args.retention_days, archive_dir=args.archive_dir)
+    archived = job.run_once(vacuum=args.vacuum or None)
+    print(f"{archived} reclamações arquivadas")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
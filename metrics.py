@@ -0,0 +1,351 @@
+import time
+import threading
+from contextlib import contextmanager
+
+# Default histogram buckets in seconds, from fast DB calls up to slow page loads
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+
+class Counter:
+    """Monotonic counter with optional labels."""
+
+    type_name = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        """
+        Initialize the counter.
+
+        Args:
+            name (str): Metric name in Prometheus format
+            documentation (str): Help text shown in the exposition output
+            labelnames (tuple, optional): Names of the labels of this metric
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        """
+        Increase the counter.
+
+        Args:
+            amount (float, optional): Value to add, must not be negative
+            **labels: Label values, one per name in `labelnames`
+        """
+        if amount < 0:
+            raise ValueError("Counters can only be increased")
+
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        """
+        Get a snapshot of the counter values.
+
+        Returns:
+            dict: Counter value by tuple of label values
+        """
+        with self._lock:
+            return dict(self._values)
+
+    def render(self):
+        """Return the counter samples as Prometheus exposition lines."""
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in sorted(self.samples().items())
+        ]
+
+
+class Histogram:
+    """Histogram of observed values with cumulative buckets, sum and count."""
+
+    type_name = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        """
+        Initialize the histogram.
+
+        Args:
+            name (str): Metric name in Prometheus format
+            documentation (str): Help text shown in the exposition output
+            labelnames (tuple, optional): Names of the labels of this metric
+            buckets (tuple, optional): Sorted upper bounds of the buckets
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        """
+        Record an observation.
+
+        Args:
+            value (float): Observed value
+            **labels: Label values, one per name in `labelnames`
+        """
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0, "max": 0.0}
+                self._values[key] = state
+
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state["buckets"][i] += 1
+            state["sum"] += value
+            state["count"] += 1
+            state["max"] = max(state["max"], value)
+
+    @contextmanager
+    def time(self, **labels):
+        """
+        Measure the wall-clock duration of a block or function call.
+
+        Can be used as `with histogram.time(stage="login"):` or as a decorator.
+        The duration is recorded even if the block raises.
+
+        Args:
+            **labels: Label values, one per name in `labelnames`
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        """
+        Get a snapshot of the histogram state.
+
+        Returns:
+            dict: Bucket counts, sum, count and max by tuple of label values
+        """
+        with self._lock:
+            return {
+                key: {**state, "buckets": list(state["buckets"])}
+                for key, state in self._values.items()
+            }
+
+    def render(self):
+        """Return the histogram samples as Prometheus exposition lines."""
+        lines = []
+        for key, state in sorted(self.samples().items()):
+            for bound, count in zip(self.buckets, state["buckets"]):
+                labels = _format_labels(self.labelnames + ("le",), key + (_format_value(bound),))
+                lines.append(f"{self.name}_bucket{labels} {count}")
+            labels = _format_labels(self.labelnames + ("le",), key + ("+Inf",))
+            lines.append(f"{self.name}_bucket{labels} {state['count']}")
+
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(state['sum'])}")
+            lines.append(f"{self.name}_count{labels} {state['count']}")
+        return lines
+
+    def quantile(self, q, **labels):
+        """
+        Estimate a quantile from the bucket counts.
+
+        Args:
+            q (float): Quantile between 0 and 1
+            **labels: Label values, one per name in `labelnames`
+
+        Returns:
+            float: Upper bound of the bucket holding the quantile, or the
+            largest observed value if it falls beyond the last bucket
+        """
+        state = self.samples().get(_label_key(self.labelnames, labels))
+        if not state or not state["count"]:
+            return 0.0
+
+        rank = q * state["count"]
+        for bound, count in zip(self.buckets, state["buckets"]):
+            if count >= rank:
+                return min(bound, state["max"])
+        return state["max"]
+
+
+class MetricsRegistry:
+    """Collection of metrics exposed together at the `/metrics` endpoint."""
+
+    def __init__(self):
+        """Initialize an empty registry."""
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        """Create and register a Counter."""
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        """Create and register a Histogram."""
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render_prometheus(self):
+        """
+        Render every registered metric in the Prometheus text exposition format.
+
+        Returns:
+            str: Exposition text (format version 0.0.4)
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type_name}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+def _label_key(labelnames, labels):
+    if set(labels) != set(labelnames):
+        raise ValueError(f"Expected labels {labelnames}, got {tuple(labels)}")
+    return tuple(str(labels[name]) for name in labelnames)
+
+
+def _format_labels(labelnames, values):
+    if not labelnames:
+        return ""
+    pairs = []
+    for name, value in zip(labelnames, values):
+        escaped = value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        pairs.append(f'{name}="{escaped}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+def _format_value(value):
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+# Process-wide registry and the metrics recorded by the bot
+registry = MetricsRegistry()
+
+STAGE_SECONDS = registry.histogram(
+    "reclamebot_stage_duration_seconds",
+    "Duration of each processing stage",
+    labelnames=("stage",)
+)
+STAGE_ERRORS = registry.counter(
+    "reclamebot_stage_errors_total",
+    "Number of failures per processing stage",
+    labelnames=("stage",)
+)
+DB_SECONDS = registry.histogram(
+    "reclamebot_db_operation_duration_seconds",
+    "Duration of database calls",
+    labelnames=("operation",),
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+)
+OPENAI_TOKENS = registry.counter(
+    "reclamebot_openai_tokens_total",
+    "OpenAI tokens consumed",
+    labelnames=("model", "type")
+)
+OPENAI_COST = registry.counter(
+    "reclamebot_openai_cost_usd_total",
+    "Estimated OpenAI spend in USD",
+    labelnames=("model",)
+)
+PROMPT_TOKENS_SAVED = registry.counter(
+    "reclamebot_prompt_tokens_saved_total",
+    "Input tokens removed by truncating long complaints"
+)
+COMPLAINTS_PROCESSED = registry.counter(
+    "reclamebot_complaints_processed_total",
+    "Complaints handled by the bot",
+    labelnames=("status",)
+)
+BROWSER_RESTARTS = registry.counter(
+    "reclamebot_browser_restarts_total",
+    "Browsers restarted after a crash"
+)
+TRIAGE_DECISIONS = registry.counter(
+    "reclamebot_triage_decisions_total",
+    "Complaints per triage route (template, duplicate, cheap or full model)",
+    labelnames=("route", "category")
+)
+TRIAGE_SECONDS_SAVED = registry.counter(
+    "reclamebot_triage_seconds_saved_total",
+    "Estimated generation time saved by answering without the default model"
+)
+
+# Stages shown in the dashboard summary, in pipeline order
+STAGES = [
+    ("driver_startup", "Inicialização do navegador"),
+    ("login", "Login"),
+    ("list_load", "Carregamento da lista"),
+    ("scrape_complaint", "Extração por reclamação"),
+    ("triage", "Triagem local"),
+    ("rate_limit_wait", "Espera do limite OpenAI"),
+    ("openai", "Geração OpenAI"),
+    ("response_wait", "Espera da resposta pré-gerada"),
+    ("submit", "Envio da resposta"),
+    ("cycle", "Ciclo completo"),
+]
+
+
+def summary():
+    """
+    Build a compact summary of stage timings for the dashboard.
+
+    Returns:
+        dict: 'stages' (per-stage count, mean, p95 and max in seconds),
+        'db' (count and mean of database calls), 'tokens' and 'complaints' totals
+        and 'triage' (complaints per route, share answered without the default
+        model and estimated seconds saved)
+    """
+    stage_samples = STAGE_SECONDS.samples()
+    stages = []
+    for stage, label in STAGES:
+        state = stage_samples.get((stage,))
+        if not state:
+            continue
+        stages.append({
+            "stage": stage,
+            "label": label,
+            "count": state["count"],
+            "mean": state["sum"] / state["count"],
+            "p95": STAGE_SECONDS.quantile(0.95, stage=stage),
+            "max": state["max"],
+        })
+
+    db_samples = DB_SECONDS.samples().values()
+    db_count = sum(state["count"] for state in db_samples)
+    db_sum = sum(state["sum"] for state in db_samples)
+
+    routes = {}
+    for (route, _), value in TRIAGE_DECISIONS.samples().items():
+        routes[route] = routes.get(route, 0) + int(value)
+    triaged = sum(routes.values())
+
+    return {
+        "stages": stages,
+        "db": {"count": db_count, "mean": db_sum / db_count if db_count else 0.0},
+        "tokens": int(sum(
+            value for (_, token_type), value in OPENAI_TOKENS.samples().items() if token_type != "cached"
+        )),
+        "complaints": {status: int(value) for (status,), value in COMPLAINTS_PROCESSED.samples().items()},
+        "triage": {
+            "routes": routes,
+            "total": triaged,
+            "fast_path": (triaged - routes.get("full", 0)) / triaged if triaged else 0.0,
+            "seconds_saved": sum(TRIAGE_SECONDS_SAVED.samples().values()),
+        },
+    }
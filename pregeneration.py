@@ -0,0 +1,120 @@
+import logging
+import contextvars
+from concurrent.futures import Future, ThreadPoolExecutor
+from metrics import STAGE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+class ResponsePregenerator:
+    """
+    Generate complaint responses in background threads, in arrival order.
+
+    Complaints are added while the browser is still scraping and their
+    responses are generated on a small thread pool; iterating returns them
+    in the order they were added, waiting only for responses that are not
+    ready yet. Generation runs at most `lookahead` complaints ahead of the
+    consumer, so stopping early wastes little work.
+    """
+
+    def __init__(self, workers=2, lookahead=20, initializer=None):
+        """
+        Initialize the pregenerator.
+
+        Args:
+            workers (int, optional): Responses generated at once; 0 generates each
+                one when it is consumed, as if there were no pregeneration
+            lookahead (int, optional): Complaints generated ahead of the consumer
+            initializer (callable, optional): Called without arguments when each
+                worker thread starts, e.g. to have it profiled
+        """
+        self.lookahead = max(1, lookahead)
+        self._pool = ThreadPoolExecutor(
+            workers, thread_name_prefix="pregenerate", initializer=initializer
+        ) if workers > 0 else None
+        # [complaint, payload, task, future] in arrival order
+        self._jobs = []
+        self._started = 0
+        self._next = 0
+
+    def add(self, complaint, task, payload=None):
+        """
+        Queue the generation of a response.
+
+        Args:
+            complaint (dict): Complaint the response is for
+            task (callable): Called without arguments on a worker thread, with the
+                caller's logging context; its return value is the result
+            payload (optional): Value handed back with the result
+        """
+        self._jobs.append([complaint, payload, task, None])
+        self._start_until(self._next + self.lookahead)
+
+    def add_ready(self, complaint, result, payload=None):
+        """
+        Queue a complaint whose response is already known.
+
+        Args:
+            complaint (dict): Complaint the response is for
+            result: Value returned for it when iterating
+            payload (optional): Value handed back with the result
+        """
+        future = Future()
+        future.set_result(result)
+        self._jobs.append([complaint, payload, None, future])
+
+    def __len__(self):
+        """Number of complaints added and not consumed yet."""
+        return len(self._jobs) - self._next
+
+    def __iter__(self):
+        """
+        Yield (complaint, payload, result) in the order complaints were added.
+
+        New complaints may be added while iterating.
+        """
+        while self._next < len(self._jobs):
+            complaint, payload, task, future = self._jobs[self._next]
+            self._next += 1
+            self._start_until(self._next + self.lookahead)
+
+            if future is None:
+                result = task()
+            else:
+                with STAGE_SECONDS.time(stage="response_wait"):
+                    result = future.result()
+            yield complaint, payload, result
+
+    def close(self):
+        """
+        Stop generating: cancel what has not started and wait for the rest.
+
+        Returns:
+            list: (complaint, payload, result) of responses that were generated
+            but not consumed, so they can be kept for a later run
+        """
+        # Cancel everything first so queued work does not start while waiting
+        # for running work; cancel() only succeeds for work that has not started
+        remaining = [
+            (complaint, payload, future) for complaint, payload, _, future in self._jobs[self._next:]
+            if future is not None and not future.cancel()
+        ]
+        finished = []
+        for complaint, payload, future in remaining:
+            try:
+                finished.append((complaint, payload, future.result()))
+            except Exception as e:
+                logger.error("Error generating response for complaint ID %s: %s", complaint["id"], e)
+        self._next = len(self._jobs)
+
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+        return finished
+
+    def _start_until(self, end):
+        """Submit queued tasks up to (not including) position `end`."""
+        while self._pool is not None and self._started < min(end, len(self._jobs)):
+            job = self._jobs[self._started]
+            if job[3] is None:
+                job[3] = self._pool.submit(contextvars.copy_context().run, job[2])
+            self._started += 1
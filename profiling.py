@@ -0,0 +1,412 @@
+"""
+Opt-in profiling of processing runs.
+
+While profiling is enabled (PROFILING_ENABLED or the Configurações page),
+each company run is captured with cProfile and a stack sampler, and every
+WebDriver command the browser sends is counted and timed. The results are
+saved per run in PROFILE_DIR ("profiles"):
+
+    <name>.prof    cProfile statistics (snakeviz, pstats)
+    <name>.folded  sampled stacks in the folded format (flamegraph.pl, speedscope)
+    <name>.json    summary shown on the dashboard
+"""
+import os
+import re
+import sys
+import json
+import time
+import pstats
+import cProfile
+import logging
+import threading
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+_NAME_PATTERN = re.compile(r"^[\w.-]+$")
+
+
+class CommandProfiler:
+    """Count and time the WebDriver commands sent by a browser."""
+
+    def __init__(self):
+        """Initialize an empty profiler."""
+        # Command -> [count, total seconds, max seconds]
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def attach(self, driver):
+        """
+        Instrument a WebDriver instance.
+
+        Every driver and element command goes through `driver.execute`, so
+        wrapping it covers navigation, lookups, clicks and typing alike.
+
+        Args:
+            driver (WebDriver): Browser to instrument
+
+        Returns:
+            WebDriver: The same driver
+        """
+        execute = driver.execute
+
+        def timed_execute(driver_command, params=None):
+            start = time.perf_counter()
+            try:
+                return execute(driver_command, params)
+            finally:
+                self.record(driver_command, time.perf_counter() - start)
+
+        driver.execute = timed_execute
+        return driver
+
+    def record(self, command, seconds):
+        """
+        Record one command.
+
+        Args:
+            command (str): WebDriver command name, e.g. 'findElement'
+            seconds (float): Round-trip duration
+        """
+        with self._lock:
+            stats = self._stats.setdefault(command, [0, 0.0, 0.0])
+            stats[0] += 1
+            stats[1] += seconds
+            stats[2] = max(stats[2], seconds)
+
+    def summary(self):
+        """
+        Get the recorded commands, slowest in total first.
+
+        Returns:
+            list: Dicts with 'command', 'count', 'total', 'mean' and 'max' (seconds)
+        """
+        with self._lock:
+            stats = dict(self._stats)
+        return [
+            {"command": command, "count": count, "total": total, "mean": total / count, "max": longest}
+            for command, (count, total, longest) in sorted(stats.items(), key=lambda item: item[1][1], reverse=True)
+        ]
+
+
+class StackSampler:
+    """Sample the call stacks of a set of threads at a fixed interval."""
+
+    def __init__(self, interval=0.005):
+        """
+        Initialize the sampler.
+
+        Args:
+            interval (float, optional): Seconds between samples
+        """
+        self.interval = interval
+        # Folded stack ("outer;inner") -> number of samples
+        self.stacks = {}
+        # Thread -> label put at the root of its stacks
+        self._threads = {}
+        self._threads_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def add_thread(self, thread=None, label=None):
+        """
+        Sample a thread until it ends.
+
+        Args:
+            thread (threading.Thread, optional): Thread to sample. Defaults to the calling thread.
+            label (str, optional): Root frame of the thread's stacks, so the flame graph
+                separates threads doing different work
+        """
+        with self._threads_lock:
+            self._threads[thread or threading.current_thread()] = label
+
+    def start(self):
+        """Start sampling in a background thread."""
+        self._thread = threading.Thread(target=self._loop, name="stack-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop sampling and wait for the sampler thread."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def folded(self):
+        """Return the samples in the folded stack format, one stack per line."""
+        return "".join(f"{stack} {count}\n" for stack, count in sorted(self.stacks.items()))
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            with self._threads_lock:
+                # Identifiers of finished threads may be reused by unrelated ones
+                for thread in [thread for thread in self._threads if not thread.is_alive()]:
+                    del self._threads[thread]
+                threads = list(self._threads.items())
+
+            for thread, label in threads:
+                frame = frames.get(thread.ident)
+                if frame is None:
+                    continue
+                names = []
+                while frame is not None:
+                    code = frame.f_code
+                    names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                if label:
+                    names.append(label)
+                stack = ";".join(reversed(names))
+                self.stacks[stack] = self.stacks.get(stack, 0) + 1
+
+
+class RunProfiler:
+    """
+    Profile the run executed inside a `with` block and save its artifacts.
+
+    cProfile only observes the thread that enabled it, and only one run is
+    captured with cProfile at a time; runs overlapping with it are still
+    sampled and have their WebDriver commands recorded. Stack samples cover
+    the run's thread ("run" in the flame graph) and every thread registered
+    with sample_thread(), such as the workers generating responses.
+    """
+
+    _cprofile_lock = threading.Lock()
+
+    def __init__(self, name, directory=None, sample_interval=None, keep=None):
+        """
+        Initialize the profiler.
+
+        Args:
+            name (str): Name of the run's artifacts (letters, digits, '-', '_' and '.')
+            directory (str, optional): Where artifacts are saved. Defaults to
+                PROFILE_DIR ("profiles").
+            sample_interval (float, optional): Seconds between stack samples.
+                Defaults to PROFILE_SAMPLE_INTERVAL_MS (5) / 1000.
+            keep (int, optional): Profiled runs kept; older ones are deleted.
+                Defaults to PROFILE_KEEP (20).
+        """
+        if not _NAME_PATTERN.match(name):
+            raise ValueError(f"Invalid profile name: {name}")
+        if directory is None:
+            directory = os.getenv("PROFILE_DIR", "profiles")
+        if sample_interval is None:
+            sample_interval = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "5")) / 1000
+        if keep is None:
+            keep = int(os.getenv("PROFILE_KEEP", "20"))
+
+        self.name = name
+        self.directory = directory
+        self.sample_interval = sample_interval
+        self.keep = keep
+        self.commands = CommandProfiler()
+        self.details = {}
+        self._profile = None
+        self._sampler = None
+        self._start = None
+        self._started_at = None
+
+    def __enter__(self):
+        self._started_at = datetime.now()
+        if self._cprofile_lock.acquire(blocking=False):
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        else:
+            logger.info("Another run is being profiled with cProfile; only sampling run %s", self.name)
+        self._sampler = StackSampler(self.sample_interval)
+        self._sampler.add_thread(label="run")
+        self._sampler.start()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        duration = time.perf_counter() - self._start
+        self._sampler.stop()
+        if self._profile is not None:
+            self._profile.disable()
+            self._cprofile_lock.release()
+
+        try:
+            self.save(duration)
+        except Exception as e:
+            logger.error("Error saving profile %s: %s", self.name, e)
+        return False
+
+    def sample_thread(self, label="pregeneration"):
+        """
+        Sample the calling thread as part of the run until it ends.
+
+        Meant for threads the run hands work to, e.g. as a thread pool
+        initializer, so their time shows in the flame graph instead of as
+        waits in the run's thread. Does nothing outside the `with` block.
+
+        Args:
+            label (str, optional): Root frame of the thread's stacks
+        """
+        if self._sampler is not None:
+            self._sampler.add_thread(label=label)
+
+    def save(self, duration):
+        """
+        Write the run's artifacts and delete the oldest runs beyond `keep`.
+
+        Args:
+            duration (float): Wall-clock duration of the run in seconds
+
+        Returns:
+            str: Path of the summary file
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        base = os.path.join(self.directory, self.name)
+
+        files = {}
+        top_functions = []
+        if self._profile is not None:
+            self._profile.dump_stats(base + ".prof")
+            files["prof"] = self.name + ".prof"
+            top_functions = _top_functions(pstats.Stats(self._profile))
+
+        with open(base + ".folded", "w", encoding="utf-8") as f:
+            f.write(self._sampler.folded())
+        files["folded"] = self.name + ".folded"
+
+        summary = {
+            "name": self.name,
+            "started_at": self._started_at.isoformat(timespec="seconds"),
+            "duration": duration,
+            "samples": sum(self._sampler.stacks.values()),
+            "sample_interval": self.sample_interval,
+            "details": self.details,
+            "top_functions": top_functions,
+            "webdriver": self.commands.summary(),
+            "files": files,
+        }
+        path = base + ".json"
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+
+        logger.info("Profile of run saved to %s (%.1fs, %s samples)", path, duration, summary["samples"])
+        self._prune()
+        return path
+
+    def _prune(self):
+        """Delete the artifacts of the oldest profiled runs beyond `keep`."""
+        names = sorted(
+            (entry[:-len(".json")] for entry in os.listdir(self.directory) if entry.endswith(".json")),
+            key=lambda name: os.path.getmtime(os.path.join(self.directory, name + ".json")),
+            reverse=True
+        )
+        for name in names[self.keep:]:
+            for extension in (".json", ".prof", ".folded"):
+                path = os.path.join(self.directory, name + extension)
+                if os.path.exists(path):
+                    os.remove(path)
+
+
+def _top_functions(stats, limit=30):
+    """Return the functions with the highest cumulative time from pstats statistics."""
+    rows = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:limit]
+    return [
+        {
+            "function": f"{function} ({os.path.basename(filename)}:{line})",
+            "calls": calls,
+            "own": own_time,
+            "cumulative": cumulative_time,
+        }
+        for (filename, line, function), (_, calls, own_time, cumulative_time, _) in rows
+    ]
+
+
+def list_profiles(directory=None):
+    """
+    List the saved run profiles, newest first.
+
+    Args:
+        directory (str, optional): Profile directory. Defaults to PROFILE_DIR.
+
+    Returns:
+        list: Summary dicts as saved by RunProfiler
+    """
+    directory = directory or os.getenv("PROFILE_DIR", "profiles")
+    if not os.path.isdir(directory):
+        return []
+
+    profiles = []
+    for entry in os.listdir(directory):
+        if not entry.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(directory, entry), encoding="utf-8") as f:
+                profiles.append(json.load(f))
+        except Exception as e:
+            logger.error("Error reading profile %s: %s", entry, e)
+    return sorted(profiles, key=lambda profile: profile["started_at"], reverse=True)
+
+
+def load_profile(name, directory=None, min_fraction=0.005):
+    """
+    Load one run profile with its flame graph.
+
+    Args:
+        name (str): Profile name
+        directory (str, optional): Profile directory. Defaults to PROFILE_DIR.
+        min_fraction (float, optional): Frames with a smaller share of the samples
+            are left out of the flame graph
+
+    Returns:
+        dict: Summary with a 'flame' tree of {'name', 'count', 'width', 'children'}
+        nodes ('width' is the percentage of the parent), or None if it does not exist
+    """
+    directory = directory or os.getenv("PROFILE_DIR", "profiles")
+    if not _NAME_PATTERN.match(name):
+        return None
+    path = os.path.join(directory, name + ".json")
+    if not os.path.exists(path):
+        return None
+
+    with open(path, encoding="utf-8") as f:
+        profile = json.load(f)
+
+    stacks = {}
+    folded_path = os.path.join(directory, name + ".folded")
+    if os.path.exists(folded_path):
+        with open(folded_path, encoding="utf-8") as f:
+            for line in f:
+                stack, _, count = line.rstrip("\n").rpartition(" ")
+                if stack:
+                    stacks[stack] = int(count)
+    profile["flame"] = flame_tree(stacks, min_fraction)
+    return profile
+
+
+def flame_tree(stacks, min_fraction=0.005):
+    """
+    Build a flame graph tree from folded stacks.
+
+    Args:
+        stacks (dict): Folded stack -> number of samples
+        min_fraction (float, optional): Frames with a smaller share of all samples are dropped
+
+    Returns:
+        list: Root nodes {'name', 'count', 'width', 'children'}, largest first
+    """
+    root = {"children": {}, "count": 0}
+    for stack, count in stacks.items():
+        node = root
+        node["count"] += count
+        for frame in stack.split(";"):
+            node = node["children"].setdefault(frame, {"children": {}, "count": 0})
+            node["count"] += count
+
+    minimum = root["count"] * min_fraction
+
+    def convert(node):
+        children = [
+            {"name": name, "count": child["count"], "width": child["count"] / node["count"] * 100,
+             "children": convert(child)}
+            for name, child in node["children"].items()
+            if child["count"] >= minimum
+        ]
+        return sorted(children, key=lambda child: child["count"], reverse=True)
+
+    return convert(root) if root["count"] else []
@@ -0,0 +1,174 @@
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SYSTEM_PROMPT = (
+    "Você é um atendente profissional da empresa iPass. "
+    "Responda a reclamação de forma cordial, resolutiva e empática. "
+    "Use linguagem formal e profissional, mas amigável. "
+    "Peça desculpas pelo transtorno, reconheça o problema e "
+    "ofereça soluções práticas. Encerre agradecendo a oportunidade "
+    "de resolver a situação. "
+    "Limite a resposta a um máximo de 500 caracteres."
+)
+
+# Fixed instructions appended to the system prompt. Keeping every static part
+# before the complaint makes the request prefix identical across calls, which
+# is what OpenAI's automatic prompt caching matches on.
+RESPONSE_INSTRUCTIONS = (
+    "A mensagem do usuário contém apenas o texto da reclamação do cliente. "
+    "Responda de forma clara e objetiva. "
+    "Trechos omitidos de reclamações longas aparecem como [...]."
+)
+
+TRUNCATION_MARKER = " [...] "
+
+
+class Tokenizer:
+    """Count and cut text in model tokens with tiktoken, or estimate them if it cannot be loaded."""
+
+    def __init__(self, model="gpt-4o"):
+        """
+        Initialize the tokenizer.
+
+        Args:
+            model (str, optional): Model whose encoding should be used
+        """
+        self.encoding = None
+        try:
+            # Imported here so importing this module stays cheap for the web process
+            import tiktoken
+        except ImportError:
+            logger.warning("tiktoken is not installed; prompt tokens are estimated from the text length")
+            return
+
+        try:
+            try:
+                self.encoding = tiktoken.encoding_for_model(model)
+            except KeyError:
+                self.encoding = tiktoken.get_encoding("o200k_base")
+        except Exception as e:
+            # The encoding file is downloaded on first use and cached afterwards
+            logger.warning("Could not load the tiktoken encoding (%s); prompt tokens are estimated", e)
+
+    def count(self, text):
+        """Return the number of tokens in `text`."""
+        if self.encoding is not None:
+            return len(self.encoding.encode(text))
+        # About 4 characters per token for Portuguese/English text
+        return len(text) // 4 + 1
+
+    def head(self, text, tokens):
+        """Return the first `tokens` tokens of `text`."""
+        if self.encoding is not None:
+            return self.encoding.decode(self.encoding.encode(text)[:tokens])
+        return text[:tokens * 4]
+
+    def tail(self, text, tokens):
+        """Return the last `tokens` tokens of `text`."""
+        if tokens <= 0:
+            return ""
+        if self.encoding is not None:
+            return self.encoding.decode(self.encoding.encode(text)[-tokens:])
+        return text[-tokens * 4:]
+
+
+class BuiltPrompt:
+    """Messages for one request plus token accounting."""
+
+    def __init__(self, messages, prompt_tokens, original_tokens, truncated):
+        self.messages = messages
+        self.prompt_tokens = prompt_tokens
+        self.original_tokens = original_tokens
+        self.truncated = truncated
+
+    @property
+    def saved_tokens(self):
+        """Input tokens removed by truncation."""
+        return self.original_tokens - self.prompt_tokens
+
+
+class PromptBuilder:
+    """Build chat messages with a stable, cacheable prefix and a bounded complaint."""
+
+    def __init__(self, system_prompt=None, max_complaint_tokens=None, model="gpt-4o", tokenizer=None):
+        """
+        Initialize the prompt builder.
+
+        Args:
+            system_prompt (str, optional): Company-specific instructions. Defaults to
+                the SYSTEM_PROMPT environment variable or DEFAULT_SYSTEM_PROMPT.
+            max_complaint_tokens (int, optional): Token budget for the complaint text.
+                Defaults to PROMPT_MAX_COMPLAINT_TOKENS (1500); 0 disables truncation.
+            model (str, optional): Model used to pick the tokenizer encoding
+            tokenizer (Tokenizer, optional): Tokenizer to reuse between builders
+        """
+        if system_prompt is None:
+            system_prompt = os.getenv("SYSTEM_PROMPT") or DEFAULT_SYSTEM_PROMPT
+        if max_complaint_tokens is None:
+            max_complaint_tokens = int(os.getenv("PROMPT_MAX_COMPLAINT_TOKENS", "1500"))
+
+        self.system_prompt = system_prompt
+        self.max_complaint_tokens = max_complaint_tokens
+        self.tokenizer = tokenizer or Tokenizer(model)
+
+        # Built once so every request shares the exact same prefix
+        self.system_message = {
+            "role": "system",
+            "content": f"{system_prompt.strip()}\n\n{RESPONSE_INSTRUCTIONS}"
+        }
+        self.system_tokens = self.tokenizer.count(self.system_message["content"])
+
+    def fit_complaint(self, complaint_text):
+        """
+        Shorten a complaint to the token budget, keeping its beginning and end.
+
+        The opening usually states the problem and the closing what the
+        customer expects, so the middle is dropped first.
+
+        Args:
+            complaint_text (str): Full complaint text
+
+        Returns:
+            tuple: (text to send, original token count, whether it was truncated)
+        """
+        text = " ".join(complaint_text.split())
+        original_tokens = self.tokenizer.count(text)
+
+        if not self.max_complaint_tokens or original_tokens <= self.max_complaint_tokens:
+            return text, original_tokens, False
+
+        head_tokens = self.max_complaint_tokens * 2 // 3
+        tail_tokens = self.max_complaint_tokens - head_tokens
+        fitted = (
+            self.tokenizer.head(text, head_tokens).rstrip()
+            + TRUNCATION_MARKER
+            + self.tokenizer.tail(text, tail_tokens).lstrip()
+        )
+        return fitted, original_tokens, True
+
+    def build(self, complaint_text):
+        """
+        Build the chat messages for a complaint.
+
+        Args:
+            complaint_text (str): Full complaint text
+
+        Returns:
+            BuiltPrompt: Messages and token accounting for the request
+        """
+        fitted, original_tokens, truncated = self.fit_complaint(complaint_text)
+        complaint_tokens = self.tokenizer.count(fitted) if truncated else original_tokens
+
+        if truncated:
+            logger.info(
+                "Complaint truncated from %s to %s tokens", original_tokens, complaint_tokens
+            )
+
+        return BuiltPrompt(
+            messages=[self.system_message, {"role": "user", "content": fitted}],
+            prompt_tokens=self.system_tokens + complaint_tokens,
+            original_tokens=self.system_tokens + original_tokens,
+            truncated=truncated
+        )
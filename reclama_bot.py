@@ -6,13 +6,15 @@ from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException, NoSuchElementException, ElementClickInterceptedException
+from metrics import STAGE_SECONDS, STAGE_ERRORS, BROWSER_RESTARTS
 
 logger = logging.getLogger(__name__)
 
 class ReclamaBot:
     """Class for handling all Reclame Aqui website interactions via Selenium."""
     
-    def __init__(self, email, password, browser_type="chrome"):
+    def __init__(self, email, password, browser_type="chrome", base_url=None, typing_delay=0.01, max_restarts=2,
+                 command_profiler=None):
         """
         Initialize ReclamaBot with login credentials and browser configuration.
         
@@ -20,15 +22,27 @@ class ReclamaBot:
             email (str): Email for Reclame Aqui login
             password (str): Password for Reclame Aqui login
             browser_type (str): Browser to use - 'chrome' or 'firefox'
+            base_url (str, optional): Site root URL; defaults to the public Reclame Aqui site
+            typing_delay (float, optional): Pause in seconds between typed characters
+            max_restarts (int, optional): Times the browser may be restarted after a crash
+            command_profiler (CommandProfiler, optional): Records the WebDriver commands
+                of every browser this bot opens
         """
         self.email = email
         self.password = password
         self.browser_type = browser_type
         self.driver = None
-        self.base_url = "https://www.reclameaqui.com.br"
+        self.base_url = (base_url or "https://www.reclameaqui.com.br").rstrip("/")
+        self.typing_delay = typing_delay
+        self.max_restarts = max_restarts
+        self.restarts = 0
+        self.command_profiler = command_profiler
+        # Whether the last inbox walk read the whole list
+        self.walk_complete = False
         
         self._initialize_driver()
     
+    @STAGE_SECONDS.time(stage="driver_startup")
     def _initialize_driver(self):
         """Initialize the WebDriver for the specified browser."""
         try:
@@ -49,13 +63,18 @@ class ReclamaBot:
             else:
                 raise ValueError(f"Unsupported browser type: {self.browser_type}")
             
+            if self.command_profiler is not None:
+                self.command_profiler.attach(self.driver)
+            
             self.driver.implicitly_wait(10)
-            logger.info(f"Initialized {self.browser_type} WebDriver")
+            logger.info("Initialized %s WebDriver", self.browser_type)
             
         except Exception as e:
-            logger.error(f"Failed to initialize WebDriver: {str(e)}")
+            STAGE_ERRORS.inc(stage="driver_startup")
+            logger.error("Failed to initialize WebDriver: %s", e)
             raise
     
+    @STAGE_SECONDS.time(stage="login")
     def login(self):
         """
         Log in to Reclame Aqui using the provided credentials.
@@ -97,86 +116,214 @@ class ReclamaBot:
             return True
             
         except TimeoutException:
+            STAGE_ERRORS.inc(stage="login")
             logger.error("Login timed out - check credentials or website structure")
             return False
         except Exception as e:
-            logger.error(f"Login failed: {str(e)}")
+            STAGE_ERRORS.inc(stage="login")
+            logger.error("Login failed: %s", e)
             return False
     
-    def get_new_complaints(self):
+    def is_alive(self):
         """
-        Retrieve new complaints from Reclame Aqui dashboard.
+        Check whether the browser still answers WebDriver commands.
         
         Returns:
-            list: List of dictionaries with complaint details
+            bool: False if the browser or its driver process has crashed
         """
-        complaints = []
+        try:
+            self.driver.current_window_handle
+            return True
+        except Exception:
+            return False
+    
+    def restart(self):
+        """
+        Replace a crashed browser with a new one and log in again.
         
+        Returns:
+            bool: True if the new browser is logged in, False if the restart
+            failed or `max_restarts` has been used up
+        """
+        if self.restarts >= self.max_restarts:
+            logger.error("Browser crashed and the restart limit (%s) was reached", self.max_restarts)
+            return False
+        
+        self.restarts += 1
+        BROWSER_RESTARTS.inc()
+        logger.warning("Restarting crashed browser (%s of %s)", self.restarts, self.max_restarts)
+        
+        self.close()
         try:
-            logger.info("Fetching new complaints")
-            
-            # Navigate to the complaints page
-            # Note: The actual URL may vary depending on the company's dashboard structure
-            self.driver.get(f"{self.base_url}/empresa/dashboard/reclamacoes/novas")
-            
-            # Wait for complaints to load
-            WebDriverWait(self.driver, 15).until(
-                EC.presence_of_element_located((By.CSS_SELECTOR, ".complaint-list-item, .reclamacao-item"))
+            self._initialize_driver()
+        except Exception:
+            return False
+        return self.login()
+    
+    def _complaint_list_items(self):
+        """Return the complaint elements of the list page that is currently open."""
+        return self.driver.find_elements(By.CSS_SELECTOR, ".complaint-list-item, .reclamacao-item")
+    
+    @staticmethod
+    def _item_id(element):
+        """Read the complaint ID of a list element."""
+        # Might be in different formats depending on the website structure
+        return element.get_attribute("data-id") or element.get_attribute("id").split("-")[-1]
+    
+    @STAGE_SECONDS.time(stage="list_load")
+    def _load_complaint_list(self):
+        """
+        Open the new complaints page and read the ID and customer of every item.
+        
+        Returns:
+            list: (complaint_id, customer_name) tuples in page order
+        """
+        # Note: The actual URL may vary depending on the company's dashboard structure
+        self.driver.get(f"{self.base_url}/empresa/dashboard/reclamacoes/novas")
+        
+        # Wait for complaints to load
+        WebDriverWait(self.driver, 15).until(
+            EC.presence_of_element_located((By.CSS_SELECTOR, ".complaint-list-item, .reclamacao-item"))
+        )
+        
+        return [
+            (
+                self._item_id(element),
+                element.find_element(By.CSS_SELECTOR, ".customer-name, .nome-cliente").text.strip()
             )
+            for element in self._complaint_list_items()
+        ]
+    
+    @STAGE_SECONDS.time(stage="scrape_complaint")
+    def _scrape_complaint(self, index, complaint_id):
+        """
+        Open one complaint of the list page and read its full text.
+        
+        Args:
+            index (int): Position of the complaint when the list was loaded
+            complaint_id (str): ID of the complaint
             
-            # Get all complaint items
-            complaint_elements = self.driver.find_elements(By.CSS_SELECTOR, ".complaint-list-item, .reclamacao-item")
-            
-            logger.info(f"Found {len(complaint_elements)} complaint items in the page")
-            
-            # Extract information from each complaint
-            for element in complaint_elements:
-                try:
-                    # Extract complaint ID (might be in different formats depending on the website structure)
-                    complaint_id = element.get_attribute("data-id") or element.get_attribute("id").split("-")[-1]
-                    
-                    # Extract customer name
-                    customer_name_element = element.find_element(By.CSS_SELECTOR, ".customer-name, .nome-cliente")
-                    customer_name = customer_name_element.text.strip()
-                    
-                    # Open the complaint to get full text
-                    element.click()
-                    
-                    # Wait for complaint details to load
-                    WebDriverWait(self.driver, 10).until(
-                        EC.presence_of_element_located((By.CSS_SELECTOR, ".complaint-text, .texto-reclamacao"))
-                    )
+        Returns:
+            str: Complaint text
+        """
+        # The list page is reloaded after each visit, so earlier element references are stale
+        elements = self._complaint_list_items()
+        element = elements[index] if index < len(elements) else None
+        if element is None or self._item_id(element) != complaint_id:
+            # The list changed since it was loaded; look the complaint up by ID
+            element = next((item for item in elements if self._item_id(item) == complaint_id), None)
+            if element is None:
+                raise NoSuchElementException(f"Complaint {complaint_id} is no longer listed")
+        
+        # Open the complaint to get full text
+        element.click()
+        
+        # Wait for complaint details to load
+        WebDriverWait(self.driver, 10).until(
+            EC.presence_of_element_located((By.CSS_SELECTOR, ".complaint-text, .texto-reclamacao"))
+        )
+        complaint_text = self.driver.find_element(By.CSS_SELECTOR, ".complaint-text, .texto-reclamacao").text.strip()
+        
+        # Go back to the complaints list
+        self.driver.back()
+        
+        # Wait for the list to reload
+        WebDriverWait(self.driver, 10).until(
+            EC.presence_of_element_located((By.CSS_SELECTOR, ".complaint-list-item, .reclamacao-item"))
+        )
+        
+        return complaint_text
+    
+    def iter_new_complaints(self, skip=None):
+        """
+        Yield new complaints from the Reclame Aqui dashboard as they are read.
+        
+        Each complaint is yielded as soon as its text has been extracted, so
+        consumers (persistence, response generation, metrics) can start on it
+        while the browser is still reading the following ones. The browser is
+        paused while the consumer handles a complaint and must not be used by
+        it until the generator is exhausted.
+        
+        If the browser crashes while scraping, it is restarted (up to
+        `max_restarts` times) and the walk continues with the complaints
+        that were not read yet.
+        
+        Args:
+            skip (callable, optional): Called with each complaint ID; complaints for
+                which it returns True are not opened (e.g. already stored)
+        
+        Yields:
+            dict: Complaint with 'id', 'customer_name' and 'text', plus 'position'
+            (1-based place in the list) and 'total' (items in the list)
+        """
+        handled = set()
+        extracted = 0
+        self.walk_complete = False
+        
+        logger.info("Fetching new complaints")
+        
+        while True:
+            try:
+                items = self._load_complaint_list()
+                logger.info("Found %s complaint items in the page", len(items))
+                
+                # Extract information from each complaint
+                for index, (complaint_id, customer_name) in enumerate(items):
+                    if complaint_id in handled:
+                        continue
+                    if skip is not None and skip(complaint_id):
+                        handled.add(complaint_id)
+                        continue
                     
-                    # Extract complaint text
-                    complaint_text_element = self.driver.find_element(By.CSS_SELECTOR, ".complaint-text, .texto-reclamacao")
-                    complaint_text = complaint_text_element.text.strip()
+                    try:
+                        complaint_text = self._scrape_complaint(index, complaint_id)
+                    except Exception as e:
+                        if not self.is_alive():
+                            raise
+                        STAGE_ERRORS.inc(stage="scrape_complaint")
+                        logger.error("Error processing complaint item %s: %s", complaint_id, e)
+                        handled.add(complaint_id)
+                        continue
                     
-                    # Add complaint to list
-                    complaints.append({
+                    handled.add(complaint_id)
+                    extracted += 1
+                    yield {
                         "id": complaint_id,
                         "customer_name": customer_name,
-                        "text": complaint_text
-                    })
-                    
-                    # Go back to the complaints list
-                    self.driver.back()
-                    
-                    # Wait for the list to reload
-                    WebDriverWait(self.driver, 10).until(
-                        EC.presence_of_element_located((By.CSS_SELECTOR, ".complaint-list-item, .reclamacao-item"))
-                    )
-                    
-                except Exception as e:
-                    logger.error(f"Error processing a complaint item: {str(e)}")
-                    continue
-            
-            logger.info(f"Successfully extracted {len(complaints)} complaints")
-            
-        except Exception as e:
-            logger.error(f"Error getting complaints: {str(e)}")
+                        "text": complaint_text,
+                        "position": index + 1,
+                        "total": len(items)
+                    }
+                
+                logger.info("Successfully extracted %s complaints", extracted)
+                self.walk_complete = True
+                return
+                
+            except Exception as e:
+                if self.is_alive():
+                    STAGE_ERRORS.inc(stage="list_load")
+                    logger.error("Error getting complaints: %s", e)
+                    return
+                
+                logger.error("Browser crashed after %s complaints were read: %s", extracted, e)
+                if not self.restart():
+                    return
+    
+    def get_new_complaints(self, skip=None):
+        """
+        Retrieve new complaints from Reclame Aqui dashboard.
         
-        return complaints
+        Args:
+            skip (callable, optional): Called with each complaint ID; complaints for
+                which it returns True are not opened
+        
+        Returns:
+            list: List of dictionaries with complaint details, as yielded by
+            iter_new_complaints()
+        """
+        return list(self.iter_new_complaints(skip=skip))
     
+    @STAGE_SECONDS.time(stage="submit")
     def submit_response(self, complaint_id, response_text):
         """
         Submit a response to a specific complaint.
@@ -189,7 +336,7 @@ class ReclamaBot:
             bool: True if response was submitted successfully, False otherwise
         """
         try:
-            logger.info(f"Submitting response to complaint ID: {complaint_id}")
+            logger.info("Submitting response to complaint ID: %s", complaint_id)
             
             # Navigate to the specific complaint
             self.driver.get(f"{self.base_url}/empresa/reclamacao/{complaint_id}")
@@ -207,7 +354,7 @@ class ReclamaBot:
             # Enter text character by character to avoid detection as a bot
             for char in response_text:
                 response_field.send_keys(char)
-                time.sleep(0.01)
+                time.sleep(self.typing_delay)
             
             # Find and click the submit button
             submit_button = self.driver.find_element(By.CSS_SELECTOR, "button.submit-response, #submit-button")
@@ -218,14 +365,16 @@ class ReclamaBot:
                 EC.presence_of_element_located((By.CSS_SELECTOR, ".success-message, .message-success"))
             )
             
-            logger.info(f"Response to complaint ID {complaint_id} submitted successfully")
+            logger.info("Response to complaint ID %s submitted successfully", complaint_id)
             return True
             
         except TimeoutException:
-            logger.error(f"Timed out while submitting response to complaint ID {complaint_id}")
+            STAGE_ERRORS.inc(stage="submit")
+            logger.error("Timed out while submitting response to complaint ID %s", complaint_id)
             return False
         except Exception as e:
-            logger.error(f"Error submitting response to complaint ID {complaint_id}: {str(e)}")
+            STAGE_ERRORS.inc(stage="submit")
+            logger.error("Error submitting response to complaint ID %s: %s", complaint_id, e)
             return False
     
     def close(self):
@@ -235,4 +384,4 @@ class ReclamaBot:
                 self.driver.quit()
                 logger.info("WebDriver closed successfully")
             except Exception as e:
-                logger.error(f"Error closing WebDriver: {str(e)}")
+                logger.error("Error closing WebDriver: %s", e)
@@ -0,0 +1,188 @@
+import os
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Seconds between reloads of the company list while the scheduler is enabled
+REFRESH_INTERVAL_SECONDS = 15
+
+
+class TenantScheduler:
+    """
+    Run per-company processing on a bounded pool of browser workers.
+
+    Each worker thread drives one browser at a time, so the pool size caps
+    how many browsers are open at once. Due companies are dispatched least
+    recently served first, and a company with work left over is re-queued
+    behind the others instead of holding on to its worker.
+    """
+
+    def __init__(self, load_tenants, run_tenant, max_workers=None, poll_interval=1.0):
+        """
+        Initialize the scheduler.
+
+        Args:
+            load_tenants (callable): Returns the list of company dicts to schedule.
+                Each needs an `id` and a `check_interval_minutes`.
+            run_tenant (callable): Called as run_tenant(tenant, should_yield) on a
+                worker thread. Returns True if the company still has work left.
+                `should_yield()` tells it whether other companies are waiting.
+            max_workers (int, optional): Browsers open at once. Defaults to
+                BROWSER_POOL_SIZE from the environment (2).
+            poll_interval (float, optional): Seconds between schedule checks
+        """
+        if max_workers is None:
+            max_workers = int(os.getenv("BROWSER_POOL_SIZE", "2"))
+
+        self.load_tenants = load_tenants
+        self.run_tenant = run_tenant
+        self.max_workers = max(1, max_workers)
+        self.poll_interval = poll_interval
+
+        self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix="tenant")
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        # Company ID -> {"tenant", "next_run", "last_served", "running"}
+        self._state = {}
+        self._in_flight = 0
+        self._scheduled = False
+        self._thread = None
+
+    def refresh(self):
+        """Reload the company list, keeping the schedule of known companies."""
+        tenants = self.load_tenants()
+
+        with self._lock:
+            now = time.monotonic()
+            seen = set()
+            for tenant in tenants:
+                seen.add(tenant["id"])
+                state = self._state.get(tenant["id"])
+                if state is None:
+                    self._state[tenant["id"]] = {
+                        "tenant": tenant,
+                        "next_run": now if self._scheduled else float("inf"),
+                        "last_served": 0.0,
+                        "running": False
+                    }
+                else:
+                    state["tenant"] = tenant
+
+            for key in list(self._state):
+                if key not in seen and not self._state[key]["running"]:
+                    del self._state[key]
+
+        self._dispatch()
+
+    def run_all_now(self):
+        """Queue every company for an immediate run."""
+        self.refresh()
+        with self._lock:
+            for state in self._state.values():
+                if not state["running"]:
+                    state["next_run"] = 0.0
+        self._dispatch()
+
+    def enable_schedule(self):
+        """
+        Run every company now and then at its own interval.
+
+        Returns:
+            bool: False if the schedule was already enabled
+        """
+        with self._lock:
+            if self._scheduled:
+                return False
+            self._scheduled = True
+
+        self.run_all_now()
+        self._thread = threading.Thread(target=self._tick, name="tenant-scheduler", daemon=True)
+        self._thread.start()
+        logger.info("Scheduler enabled with %s browser worker(s)", self.max_workers)
+        return True
+
+    def is_running(self):
+        """Return True while any company is being processed."""
+        with self._lock:
+            return self._in_flight > 0
+
+    def is_scheduled(self):
+        """Return True once the periodic schedule has been enabled."""
+        return self._scheduled
+
+    def wait_idle(self, timeout=None):
+        """
+        Block until no company is running or due.
+
+        Args:
+            timeout (float, optional): Maximum seconds to wait
+
+        Returns:
+            bool: True if the scheduler went idle, False on timeout
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._changed:
+            while self._in_flight or self._has_due(time.monotonic()):
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._changed.wait(remaining)
+            return True
+
+    def _has_due(self, now):
+        return any(not s["running"] and s["next_run"] <= now for s in self._state.values())
+
+    def _should_yield(self):
+        with self._lock:
+            return self._in_flight >= self.max_workers and self._has_due(time.monotonic())
+
+    def _dispatch(self):
+        """Hand due companies to free workers, least recently served first."""
+        with self._lock:
+            now = time.monotonic()
+            due = sorted(
+                (s for s in self._state.values() if not s["running"] and s["next_run"] <= now),
+                key=lambda s: s["last_served"]
+            )
+            for state in due[:self.max_workers - self._in_flight]:
+                state["running"] = True
+                self._in_flight += 1
+                self._executor.submit(self._run, state)
+
+    def _run(self, state):
+        tenant = state["tenant"]
+        backlog = False
+        try:
+            backlog = bool(self.run_tenant(tenant, self._should_yield))
+        except Exception as e:
+            logger.error("Error processing company %s: %s", tenant.get("name", tenant["id"]), e, exc_info=True)
+        finally:
+            with self._changed:
+                now = time.monotonic()
+                state["running"] = False
+                state["last_served"] = now
+                if backlog:
+                    state["next_run"] = 0.0
+                elif self._scheduled:
+                    state["next_run"] = now + tenant["check_interval_minutes"] * 60
+                else:
+                    state["next_run"] = float("inf")
+                self._in_flight -= 1
+                self._changed.notify_all()
+            self._dispatch()
+
+    def _tick(self):
+        """Start companies as their interval comes due."""
+        last_refresh = time.monotonic()
+        while self._scheduled:
+            if time.monotonic() - last_refresh >= REFRESH_INTERVAL_SECONDS:
+                last_refresh = time.monotonic()
+                try:
+                    self.refresh()
+                except Exception as e:
+                    logger.error("Error reloading companies: %s", e)
+            self._dispatch()
+            time.sleep(self.poll_interval)
@@ -0,0 +1,59 @@
+import os
+import uuid
+import pytest
+from database import Database
+
+
+def _sqlite_database(tmp_path):
+    yield Database(db_path=str(tmp_path / "contract.db"))
+
+
+def _postgres_database():
+    """
+    Open PostgresDatabase on a throwaway schema of TEST_DATABASE_URL (or DATABASE_URL).
+
+    The schema is dropped afterwards, so pointing the tests at a real
+    database leaves its tables untouched.
+    """
+    url = os.getenv("TEST_DATABASE_URL") or os.getenv("DATABASE_URL")
+    if not url or not url.startswith(("postgresql:", "postgresql+", "postgres:")):
+        pytest.skip("TEST_DATABASE_URL / DATABASE_URL does not point to a PostgreSQL server")
+    pytest.importorskip("sqlalchemy")
+    pytest.importorskip("psycopg2")
+
+    from sqlalchemy import create_engine, make_url, text
+    from sqlalchemy.exc import OperationalError
+    from postgres_database import PostgresDatabase
+
+    if url.startswith("postgres:"):
+        url = "postgresql:" + url[len("postgres:"):]
+    url = make_url(url)
+    if url.drivername == "postgresql":
+        url = url.set(drivername="postgresql+psycopg2")
+    schema = f"contract_{uuid.uuid4().hex[:12]}"
+
+    admin = create_engine(url)
+    try:
+        with admin.begin() as conn:
+            conn.execute(text(f"CREATE SCHEMA {schema}"))
+    except OperationalError as e:
+        admin.dispose()
+        pytest.skip(f"PostgreSQL server not available: {e}")
+
+    db = PostgresDatabase(url.update_query_dict({"options": f"-csearch_path={schema}"}), pool_size=1, max_overflow=2)
+    try:
+        yield db
+    finally:
+        db.engine.dispose()
+        with admin.begin() as conn:
+            conn.execute(text(f"DROP SCHEMA {schema} CASCADE"))
+        admin.dispose()
+
+
+@pytest.fixture(params=["sqlite", "postgresql"])
+def db(request, tmp_path):
+    """Empty database of each storage backend."""
+    if request.param == "sqlite":
+        yield from _sqlite_database(tmp_path)
+    else:
+        yield from _postgres_database()
@@ -0,0 +1,145 @@
+import pytest
+from budget import BudgetGuard, RateLimiter, TokenBucket, estimate_cost
+
+
+class FakeClock:
+    """Clock that only moves when the code under test sleeps (or the test advances it)."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class UsageDb:
+    """Database stub returning a fixed spend for today."""
+
+    def __init__(self, spent):
+        self.spent = spent
+
+    def get_usage_cost(self, since):
+        return self.spent
+
+
+def test_bucket_refills_up_to_capacity():
+    clock = FakeClock()
+    bucket = TokenBucket(10, 1, clock)
+
+    assert bucket.reserve(10) == 0.0
+    assert bucket.reserve(1) == pytest.approx(1.0)
+
+    # The balance is back to zero after a second, then refills at 1 token/s
+    clock.now += 4
+    assert bucket.reserve(3) == 0.0
+    clock.now += 3600
+    assert bucket.reserve(10) == 0.0
+    assert bucket.reserve(1) == pytest.approx(1.0)
+
+
+def test_bucket_balance_goes_negative_and_oversized_requests_are_clamped():
+    clock = FakeClock()
+    bucket = TokenBucket(10, 2, clock)
+
+    assert bucket.reserve(50) == 0.0
+    # Only the capacity was taken, so the next caller waits for 5 tokens at 2 tokens/s
+    assert bucket.reserve(5) == pytest.approx(2.5)
+    assert bucket.reserve(5) == pytest.approx(5.0)
+
+
+def test_adjust_returns_unused_tokens_without_exceeding_capacity():
+    clock = FakeClock()
+    bucket = TokenBucket(10, 1, clock)
+
+    bucket.reserve(8)
+    bucket.adjust(5)
+    assert bucket.reserve(7) == 0.0
+    bucket.adjust(100)
+    assert bucket.reserve(10) == 0.0
+    assert bucket.reserve(1) == pytest.approx(1.0)
+
+
+def test_requests_per_minute_limit_waits():
+    clock = FakeClock()
+    limiter = RateLimiter(requests_per_minute=2, clock=clock, sleep=clock.sleep)
+
+    assert limiter.acquire(100) == 0.0
+    assert limiter.acquire(100) == 0.0
+    assert limiter.acquire(100) == pytest.approx(30.0)
+    assert clock.sleeps == [pytest.approx(30.0)]
+
+
+def test_tokens_per_minute_limit_waits_and_is_corrected_by_real_usage():
+    clock = FakeClock()
+    limiter = RateLimiter(tokens_per_minute=6000, clock=clock, sleep=clock.sleep)
+
+    assert limiter.acquire(6000) == 0.0
+    # 1000 tokens refill in 10 seconds
+    assert limiter.acquire(1000) == pytest.approx(10.0)
+
+    # The request used far fewer tokens than reserved
+    limiter.record_usage(estimated_tokens=1000, actual_tokens=200)
+    assert limiter.acquire(800) == 0.0
+    assert clock.sleeps == [pytest.approx(10.0)]
+
+
+def test_the_longer_of_both_waits_is_used():
+    clock = FakeClock()
+    limiter = RateLimiter(requests_per_minute=60, tokens_per_minute=600, clock=clock, sleep=clock.sleep)
+
+    limiter.acquire(600)
+
+    # 1 s for the next request, 20 s for 200 tokens
+    assert limiter.acquire(200) == pytest.approx(20.0)
+
+
+def test_disabled_limiter_never_waits():
+    clock = FakeClock()
+    limiter = RateLimiter(clock=clock, sleep=clock.sleep)
+
+    assert limiter.acquire(1_000_000) == 0.0
+    limiter.record_usage(1_000_000, 0)
+    assert clock.sleeps == []
+
+
+@pytest.mark.parametrize("spent, model", [(0.0, "gpt-4o"), (7.99, "gpt-4o"), (8.0, "gpt-4o-mini"), (10.0, None)])
+def test_guard_switches_to_cheaper_model_then_defers(spent, model):
+    guard = BudgetGuard(UsageDb(spent), daily_budget=10.0, soft_limit_ratio=0.8, fallback_model="gpt-4o-mini")
+
+    assert guard.select_model("gpt-4o") == model
+
+
+def test_guard_without_budget_keeps_default_model():
+    assert BudgetGuard(UsageDb(1_000.0)).select_model("gpt-4o") == "gpt-4o"
+
+
+def test_guard_from_env(monkeypatch):
+    monkeypatch.setenv("OPENAI_DAILY_BUDGET_USD", "5")
+    monkeypatch.setenv("OPENAI_BUDGET_SOFT_LIMIT", "0.5")
+    monkeypatch.setenv("OPENAI_FALLBACK_MODEL", "gpt-4.1-nano")
+
+    guard = BudgetGuard.from_env(UsageDb(2.5))
+
+    assert (guard.daily_budget, guard.soft_limit_ratio, guard.fallback_model) == (5.0, 0.5, "gpt-4.1-nano")
+    assert guard.select_model("gpt-4o") == "gpt-4.1-nano"
+
+
+def test_guard_from_env_defaults(monkeypatch):
+    for name in ["OPENAI_DAILY_BUDGET_USD", "OPENAI_BUDGET_SOFT_LIMIT", "OPENAI_FALLBACK_MODEL"]:
+        monkeypatch.delenv(name, raising=False)
+
+    guard = BudgetGuard.from_env(UsageDb(0.0))
+
+    assert (guard.daily_budget, guard.soft_limit_ratio, guard.fallback_model) == (0.0, 0.8, "gpt-4o-mini")
+
+
+def test_guard_reads_spend_recorded_in_the_database(db):
+    db.record_usage("c1", "gpt-4o", 1_000_000, 0, 500, estimate_cost("gpt-4o", 1_000_000, 0))
+    guard = BudgetGuard(db, daily_budget=3.0, soft_limit_ratio=0.8)
+
+    assert guard.select_model("gpt-4o") == "gpt-4o-mini"
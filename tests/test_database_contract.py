@@ -0,0 +1,242 @@
+"""Behaviour both storage backends (SQLite and PostgreSQL) must share."""
+from datetime import datetime, timedelta
+
+
+def _complaint(complaint_id, status="completed", customer_name="Ana Souza", text="Cobrança indevida no boleto",
+               response="Olá, Ana! Vamos verificar a cobrança.", company_id=None):
+    complaint = {
+        "complaint_id": complaint_id,
+        "customer_name": customer_name,
+        "complaint_text": text,
+        "response_text": response,
+        "status": status,
+    }
+    if company_id is not None:
+        complaint["company_id"] = company_id
+    return complaint
+
+
+def test_saved_complaint_is_processed(db):
+    assert db.save_complaint("c1", "Ana Souza", "Cobrança indevida", "Resposta", "completed")
+
+    assert db.is_complaint_processed("c1")
+    assert not db.is_complaint_processed("c2")
+
+
+def test_pending_complaint_is_not_processed(db):
+    db.save_complaint("c1", "Ana Souza", "Cobrança indevida", None, "pending")
+
+    assert not db.is_complaint_processed("c1")
+    assert [row["complaint_id"] for row in db.get_pending_complaints()] == ["c1"]
+
+
+def test_saving_again_updates_and_keeps_created_at(db):
+    db.save_complaint("c1", "Ana Souza", "Cobrança indevida", None, "pending")
+    created_at = db.get_all_complaints()[0]["created_at"]
+
+    assert db.save_complaints_bulk([_complaint("c1", status="failed")]) == 1
+
+    complaints = db.get_all_complaints()
+    assert len(complaints) == 1
+    assert complaints[0]["status"] == "failed"
+    assert complaints[0]["response_text"] == "Olá, Ana! Vamos verificar a cobrança."
+    assert complaints[0]["created_at"] == created_at
+
+
+def test_bulk_save_applies_default_company(db):
+    company_id = db.save_company("iPass", "sac@ipass.com", "secret")
+    other_id = db.save_company("Outra", "sac@outra.com", "secret")
+
+    saved = db.save_complaints_bulk(
+        [_complaint("c1"), _complaint("c2", company_id=other_id)], company_id=company_id
+    )
+
+    assert saved == 2
+    assert db.search(company_id=company_id)["total"] == 1
+    assert db.search(company_id=other_id)["total"] == 1
+
+
+def test_update_complaint_status(db):
+    db.save_complaint("c1", "Ana Souza", "Cobrança indevida", "Resposta", "failed")
+
+    assert db.update_complaint_status("c1", "completed")
+    assert db.get_all_complaints()[0]["status"] == "completed"
+
+
+def test_get_all_complaints_limits_texts(db):
+    db.save_complaint("c1", "Ana Souza", "x" * 200, "y" * 200, "completed")
+
+    complaint = db.get_all_complaints(limit=10, text_limit=50)[0]
+
+    # One extra character tells the caller the text was cut
+    assert len(complaint["complaint_text"]) == 51
+    assert len(complaint["response_text"]) == 51
+    assert len(db.get_all_complaints()[0]["complaint_text"]) == 200
+
+
+def test_search_by_text_status_and_page(db):
+    db.save_complaints_bulk([
+        _complaint("c1", text="Cobrança indevida no boleto de março"),
+        _complaint("c2", text="A tag não funciona na praça de pedágio", status="failed"),
+        _complaint("c3", text="Boleto emitido com valor errado", status="failed"),
+    ])
+
+    by_text = db.search(query="boleto")
+    assert {row["complaint_id"] for row in by_text["results"]} == {"c1", "c3"}
+
+    by_status = db.search(query="boleto", status="failed")
+    assert [row["complaint_id"] for row in by_status["results"]] == ["c3"]
+
+    first = db.search(per_page=2, page=1)
+    second = db.search(per_page=2, page=2)
+    assert (first["total"], first["pages"]) == (3, 2)
+    assert len(first["results"]) == 2 and len(second["results"]) == 1
+    assert not {row["complaint_id"] for row in first["results"]} & {row["complaint_id"] for row in second["results"]}
+
+
+def test_search_by_date(db):
+    db.save_complaint("c1", "Ana Souza", "Cobrança indevida", "Resposta", "completed")
+    today = datetime.now().date()
+
+    assert db.search(date_from=today.isoformat(), date_to=today.isoformat())["total"] == 1
+    assert db.search(date_from=(today + timedelta(days=1)).isoformat())["total"] == 0
+
+
+def test_statistics_count_pending_separately(db):
+    db.save_complaints_bulk([
+        _complaint("c1"), _complaint("c2"), _complaint("c3", status="failed"), _complaint("c4", status="pending"),
+    ])
+
+    stats = db.get_statistics()
+
+    assert (stats["total"], stats["completed"], stats["failed"], stats["pending"]) == (3, 2, 1, 1)
+    assert round(stats["success_rate"], 1) == 66.7
+
+
+def test_complaints_by_customer(db):
+    db.save_complaints_bulk([
+        _complaint("c1"), _complaint("c2", customer_name="Bruno Lima"), _complaint("c3", status="pending"),
+    ])
+
+    rows = db.get_complaints_by_customer("Ana Souza")
+
+    assert {row["complaint_id"] for row in rows} == {"c1", "c3"}
+    assert db.get_complaints_by_customer("Carla") == []
+
+
+def test_complaints_by_customer_are_per_company(db):
+    company_id = db.save_company("iPass", "sac@ipass.com", "secret")
+    db.save_complaints_bulk([_complaint("c1"), _complaint("c2", company_id=company_id)])
+
+    # None is the company configured in .env, not "any company"
+    assert [row["complaint_id"] for row in db.get_complaints_by_customer("Ana Souza")] == ["c1"]
+    assert [row["complaint_id"] for row in db.get_complaints_by_customer("Ana Souza", company_id)] == ["c2"]
+
+
+def test_pending_complaints_are_per_company(db):
+    company_id = db.save_company("iPass", "sac@ipass.com", "secret")
+    db.save_complaints_bulk([
+        _complaint("c1", status="pending"),
+        _complaint("c2", status="pending", company_id=company_id),
+        _complaint("c3", company_id=company_id),
+    ])
+
+    assert [row["complaint_id"] for row in db.get_pending_complaints()] == ["c1"]
+    assert [row["complaint_id"] for row in db.get_pending_complaints(company_id)] == ["c2"]
+
+
+def test_checkpoint_lifecycle(db):
+    company_id = db.save_company("iPass", "sac@ipass.com", "secret")
+    assert db.get_checkpoint(None) is None
+
+    assert db.save_checkpoint(None, "run1", 3, 10, "c3")
+    assert db.save_checkpoint(None, "run1", 4, 10, "c4")
+    assert db.save_checkpoint(company_id, "run2", 1, 5, "c9")
+
+    checkpoint = db.get_checkpoint(None)
+    assert (checkpoint["run_id"], checkpoint["position"], checkpoint["total"], checkpoint["last_complaint_id"]) == \
+        ("run1", 4, 10, "c4")
+    assert db.get_checkpoint(company_id)["run_id"] == "run2"
+
+    assert db.clear_checkpoint(None)
+    assert db.get_checkpoint(None) is None
+    assert db.get_checkpoint(company_id) is not None
+
+
+def test_old_complaints_can_be_read_and_deleted(db):
+    db.save_complaints_bulk([_complaint("c1"), _complaint("c2")])
+
+    old = db.get_complaints_before(datetime.now() + timedelta(minutes=1))
+    assert {row["complaint_id"] for row in old} == {"c1", "c2"}
+    assert db.get_complaints_before(datetime.now() - timedelta(days=1)) == []
+
+    assert db.delete_complaints(["c1"]) == 1
+    assert db.delete_complaints([]) == 0
+    assert [row["complaint_id"] for row in db.get_all_complaints()] == ["c2"]
+    assert db.search(query="boleto")["total"] == 1
+
+
+def test_pending_complaints_are_not_old(db):
+    db.save_complaints_bulk([_complaint("c1"), _complaint("c2", status="pending"), _complaint("c3", status="failed")])
+
+    old = db.get_complaints_before(datetime.now() + timedelta(minutes=1))
+
+    assert {row["complaint_id"] for row in old} == {"c1", "c3"}
+
+
+def test_company_lifecycle(db):
+    company_id = db.save_company("iPass", "sac@ipass.com", "secret", check_interval_minutes=30)
+    assert company_id is not None
+
+    # Names are unique
+    assert db.save_company("iPass", "outro@ipass.com", "secret") is None
+
+    assert db.save_company("iPass", "sac@ipass.com", "secret", active=False, company_id=company_id) == company_id
+    company = db.get_company(company_id)
+    assert (company["name"], company["check_interval_minutes"], bool(company["active"])) == ("iPass", 60, False)
+    assert db.get_companies(active_only=True) == []
+    assert [company["name"] for company in db.get_companies()] == ["iPass"]
+
+    assert db.delete_company(company_id)
+    assert db.get_company(company_id) is None
+
+
+def test_usage_cost(db):
+    assert db.record_usage("c1", "gpt-4o", 1000, 200, 850, 0.0045, cached_tokens=512, run_id="run1")
+    assert db.record_usage("c2", "gpt-4o-mini", 800, 150, 400, 0.0002, run_id="run1")
+
+    today = datetime.now().date().isoformat()
+    assert round(db.get_usage_cost(today), 6) == 0.0047
+    assert db.get_usage_cost((datetime.now().date() + timedelta(days=1)).isoformat()) == 0
+
+
+def _drop_checkpoints(db):
+    """Make the next checkpoint write fail."""
+    if hasattr(db, "engine"):
+        from sqlalchemy import text
+        with db.engine.begin() as conn:
+            conn.execute(text("DROP TABLE scrape_checkpoints"))
+    else:
+        import sqlite3
+        with sqlite3.connect(db.db_path) as conn:
+            conn.execute("DROP TABLE scrape_checkpoints")
+
+
+def test_pending_complaint_is_saved_with_checkpoint(db):
+    company_id = db.save_company("iPass", "sac@ipass.com", "secret")
+
+    assert db.save_pending_with_checkpoint("c1", "Ana Souza", "Cobrança indevida", company_id, "run1", 1, 3)
+    assert db.save_pending_with_checkpoint("c2", "Bruno Lima", "Tag bloqueada", company_id, "run1", 2, 3)
+
+    assert [row["complaint_id"] for row in db.get_pending_complaints(company_id)] == ["c1", "c2"]
+    checkpoint = db.get_checkpoint(company_id)
+    assert (checkpoint["run_id"], checkpoint["position"], checkpoint["total"], checkpoint["last_complaint_id"]) == \
+        ("run1", 2, 3, "c2")
+    assert db.get_checkpoint(None) is None
+
+
+def test_pending_complaint_is_not_saved_without_its_checkpoint(db):
+    _drop_checkpoints(db)
+
+    assert not db.save_pending_with_checkpoint("c1", "Ana Souza", "Cobrança indevida", None, "run1", 1, 3)
+    assert db.get_all_complaints() == []
@@ -0,0 +1,75 @@
+"""
+Import-time budget of the web process.
+
+Imports main with `python -X importtime` in fresh interpreters and fails if
+it takes longer than IMPORT_BUDGET_MS (500) or loads a module the web
+process is meant to load lazily. Run with `-s` to see the slowest imports.
+"""
+import os
+import sys
+import statistics
+import subprocess
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Only needed once the bot runs or a PostgreSQL database is configured
+LAZY_MODULES = ["selenium", "openai", "tiktoken", "sqlalchemy", "psycopg2"]
+
+BUDGET_MS = float(os.getenv("IMPORT_BUDGET_MS", "500"))
+REPEAT = 5
+
+
+def measure(env):
+    """
+    Import main once with -X importtime.
+
+    Returns:
+        dict: Module name -> (self µs, cumulative µs)
+    """
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=ROOT, env=env, capture_output=True, text=True
+    )
+    assert completed.returncode == 0, f"Importing main failed:\n{completed.stderr}"
+
+    modules = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return modules
+
+
+@pytest.fixture(scope="module")
+def imports(tmp_path_factory):
+    """Import timings of REPEAT fresh imports of main."""
+    pytest.importorskip("flask")
+    pytest.importorskip("dotenv")
+
+    tmp = tmp_path_factory.mktemp("import_time")
+    # Keep the import away from the real database and log file
+    env = dict(os.environ, DATABASE_PATH=str(tmp / "import.db"), LOG_FILE=str(tmp / "import.log"))
+    return [measure(env) for _ in range(REPEAT)]
+
+
+def test_import_main_within_budget(imports):
+    total_ms = statistics.median(run["main"][1] / 1000 for run in imports)
+
+    print(f"\n{'módulo':<40}{'próprio (ms)':>14}{'acumulado (ms)':>16}")
+    slowest = sorted(imports[-1].items(), key=lambda item: item[1][1], reverse=True)[:15]
+    for name, (self_us, cumulative_us) in slowest:
+        print(f"{name:<40}{self_us / 1000:>14.1f}{cumulative_us / 1000:>16.1f}")
+    print(f"import main: {total_ms:.0f} ms (mediana de {REPEAT}), orçamento {BUDGET_MS:.0f} ms")
+
+    assert total_ms <= BUDGET_MS
+
+
+def test_import_main_skips_lazy_modules(imports):
+    loaded = sorted({
+        module for module in LAZY_MODULES
+        if any(name == module or name.startswith(module + ".") for name in imports[-1])
+    })
+
+    assert loaded == []
@@ -0,0 +1,15 @@
+from datetime import datetime, timedelta
+from maintenance import archive_complaints, read_archive
+
+
+def test_archive_keeps_pending_complaints(db, tmp_path):
+    db.save_complaint("c1", "Ana Souza", "Cobrança indevida", "Resposta", "completed")
+    db.save_complaint("c2", "Bruno Lima", "Tag bloqueada", None, "pending")
+
+    archive_dir = tmp_path / "archive"
+
+    archived = archive_complaints(db, datetime.now() + timedelta(minutes=1), str(archive_dir), batch_size=1)
+
+    archive = [row["complaint_id"] for path in archive_dir.iterdir() for row in read_archive(str(path))]
+    assert (archived, archive) == (1, ["c1"])
+    assert [row["complaint_id"] for row in db.get_pending_complaints()] == ["c2"]
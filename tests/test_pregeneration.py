@@ -0,0 +1,193 @@
+import time
+import threading
+import pytest
+from pregeneration import ResponsePregenerator
+from triage import Triage
+
+COMPLAINT = "Cobraram duas vezes a passagem na praça de pedágio e não estornaram o valor da minha fatura"
+
+
+def _complaint(complaint_id, text=COMPLAINT, customer_name="Ana Souza"):
+    return {"id": complaint_id, "customer_name": customer_name, "text": text}
+
+
+def _drain(pregenerator, timeout=5):
+    """Iterate in a thread so a hang fails the test instead of blocking it."""
+    results = []
+    errors = []
+
+    def consume():
+        try:
+            for complaint, payload, result in pregenerator:
+                results.append((complaint["id"], payload, result))
+        except Exception as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=consume, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), "iteration did not finish"
+    return results, errors
+
+
+def test_results_come_in_arrival_order():
+    pregenerator = ResponsePregenerator(workers=3, lookahead=10)
+    for complaint_id, delay in [("c1", 0.15), ("c2", 0.0), ("c3", 0.05)]:
+        pregenerator.add(_complaint(complaint_id), lambda d=delay, c=complaint_id: time.sleep(d) or c, payload=delay)
+    pregenerator.add_ready(_complaint("c4"), "pronta")
+
+    results, errors = _drain(pregenerator)
+    pregenerator.close()
+
+    assert errors == []
+    assert results == [("c1", 0.15, "c1"), ("c2", 0.0, "c2"), ("c3", 0.05, "c3"), ("c4", None, "pronta")]
+
+
+def test_generation_overlaps_with_scraping():
+    started = threading.Event()
+    pregenerator = ResponsePregenerator(workers=1)
+
+    pregenerator.add(_complaint("c1"), lambda: started.set() or "r1")
+
+    # Generation starts as soon as the complaint is added, before it is consumed
+    assert started.wait(1)
+    pregenerator.close()
+
+
+def test_without_workers_responses_are_generated_when_consumed():
+    calls = []
+    pregenerator = ResponsePregenerator(workers=0)
+    pregenerator.add(_complaint("c1"), lambda: calls.append("c1") or "r1")
+    assert calls == []
+
+    results, _ = _drain(pregenerator)
+
+    assert calls == ["c1"]
+    assert results == [("c1", None, "r1")]
+
+
+def test_lookahead_limits_work_started_ahead():
+    started = []
+    release = threading.Event()
+    pregenerator = ResponsePregenerator(workers=4, lookahead=2)
+    for complaint_id in ["c1", "c2", "c3", "c4"]:
+        pregenerator.add(_complaint(complaint_id), lambda c=complaint_id: started.append(c) or release.wait(1) or c)
+
+    time.sleep(0.1)
+    assert sorted(started) == ["c1", "c2"]
+    release.set()
+    pregenerator.close()
+
+
+def test_complaints_added_while_iterating_are_yielded():
+    pregenerator = ResponsePregenerator(workers=1)
+    pregenerator.add(_complaint("c1"), lambda: "r1")
+
+    seen = []
+    for complaint, _, result in pregenerator:
+        seen.append(result)
+        if complaint["id"] == "c1":
+            pregenerator.add(_complaint("c2"), lambda: "r2")
+    pregenerator.close()
+
+    assert seen == ["r1", "r2"]
+    assert len(pregenerator) == 0
+
+
+def test_close_returns_finished_results_and_cancels_the_rest():
+    release = threading.Event()
+    calls = []
+    pregenerator = ResponsePregenerator(workers=1, lookahead=10)
+    pregenerator.add(_complaint("c1"), lambda: calls.append("c1") or release.wait(1) and "r1", payload="p1")
+    pregenerator.add(_complaint("c2"), lambda: calls.append("c2") or "r2", payload="p2")
+    pregenerator.add_ready(_complaint("c3"), "r3")
+
+    time.sleep(0.05)
+    release.set()
+    leftovers = pregenerator.close()
+
+    # c1 was running and is kept; c2 had not started and is dropped; c3 needed no work
+    assert [(complaint["id"], payload, result) for complaint, payload, result in leftovers] == [
+        ("c1", "p1", "r1"), ("c3", None, "r3")
+    ]
+    assert calls == ["c1"]
+    assert len(pregenerator) == 0
+
+
+def test_close_skips_failed_generations():
+    pregenerator = ResponsePregenerator(workers=1)
+    pregenerator.add(_complaint("c1"), lambda: 1 / 0)
+    pregenerator.add_ready(_complaint("c2"), "r2")
+    time.sleep(0.05)
+
+    leftovers = pregenerator.close()
+
+    assert [complaint["id"] for complaint, _, _ in leftovers] == ["c2"]
+
+
+def _queue(triage, pregenerator, complaint, generate):
+    """Queue a complaint the way the processing run does."""
+    decision = triage.decide(complaint)
+    if decision.response is not None:
+        triage.remember(complaint, decision.response)
+        pregenerator.add_ready(complaint, decision.response, payload=decision.route)
+    elif decision.pending is not None:
+        pregenerator.add(complaint, decision.pending.result, payload=decision.route)
+    else:
+        remembered = triage.remember(complaint)
+
+        def task():
+            try:
+                response = generate(complaint)
+            except BaseException as e:
+                remembered.set_exception(e)
+                raise
+            remembered.set_result(response)
+            return response
+
+        pregenerator.add(complaint, task, payload=decision.route)
+
+
+@pytest.mark.parametrize("workers", [0, 1, 2])
+def test_repeat_waits_for_the_response_being_generated(workers):
+    calls = []
+
+    def generate(complaint):
+        time.sleep(0.1)
+        calls.append(complaint["id"])
+        return f"resposta {complaint['id']}"
+
+    triage = Triage()
+    pregenerator = ResponsePregenerator(workers=workers)
+    _queue(triage, pregenerator, _complaint("c1"), generate)
+    _queue(triage, pregenerator, _complaint("c2", COMPLAINT + "."), generate)
+    _queue(triage, pregenerator, _complaint("c3", customer_name="Bruno Lima"), generate)
+
+    results, errors = _drain(pregenerator)
+    pregenerator.close()
+
+    assert errors == []
+    assert results == [
+        ("c1", "full", "resposta c1"), ("c2", "duplicate", "resposta c1"), ("c3", "full", "resposta c3")
+    ]
+    assert calls == ["c1", "c3"]
+
+
+@pytest.mark.parametrize("workers", [0, 2])
+def test_repeat_does_not_hang_when_the_first_generation_fails(workers):
+    def generate(complaint):
+        raise RuntimeError("OpenAI indisponível")
+
+    triage = Triage()
+    pregenerator = ResponsePregenerator(workers=workers)
+    _queue(triage, pregenerator, _complaint("c1"), generate)
+    _queue(triage, pregenerator, _complaint("c2"), generate)
+
+    results, errors = _drain(pregenerator)
+    leftovers_thread = threading.Thread(target=pregenerator.close, daemon=True)
+    leftovers_thread.start()
+    leftovers_thread.join(5)
+
+    assert results == []
+    assert [str(e) for e in errors] == ["OpenAI indisponível"]
+    assert not leftovers_thread.is_alive(), "close() waited for a response that never came"
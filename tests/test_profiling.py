@@ -0,0 +1,50 @@
+import time
+import threading
+from pregeneration import ResponsePregenerator
+from profiling import RunProfiler, StackSampler
+
+
+def _generate_slowly():
+    time.sleep(0.2)
+    return "resposta"
+
+
+def _folded(path):
+    stacks = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            stack, _, count = line.rstrip("\n").rpartition(" ")
+            stacks[stack] = int(count)
+    return stacks
+
+
+def test_pregeneration_workers_are_sampled(tmp_path):
+    with RunProfiler("run1", directory=str(tmp_path), sample_interval=0.002) as profiler:
+        pregenerator = ResponsePregenerator(workers=2, initializer=profiler.sample_thread)
+        pregenerator.add({"id": "c1"}, _generate_slowly)
+        results = [result for _, _, result in pregenerator]
+        pregenerator.close()
+
+    stacks = _folded(tmp_path / "run1.folded")
+    assert results == ["resposta"]
+    assert {stack.split(";")[0] for stack in stacks} == {"run", "pregeneration"}
+    # The generation itself shows up, not only the run waiting for it
+    assert sum(
+        count for stack, count in stacks.items()
+        if stack.startswith("pregeneration;") and "_generate_slowly" in stack
+    ) > 10
+
+
+def test_finished_threads_are_no_longer_sampled():
+    sampler = StackSampler(interval=0.002)
+    sampler.add_thread(label="run")
+    sampler.start()
+
+    worker = threading.Thread(target=lambda: sampler.add_thread(label="pregeneration") or time.sleep(0.05))
+    worker.start()
+    worker.join()
+    time.sleep(0.02)
+    sampler.stop()
+
+    assert any(stack.startswith("pregeneration;") for stack in sampler.stacks)
+    assert list(sampler._threads) == [threading.current_thread()]
@@ -0,0 +1,122 @@
+"""A company's processing run against a fake browser and responder."""
+import pytest
+from database import Database
+
+
+class FakeBot:
+    """Browser that lists `inbox` and can crash after scraping some complaints."""
+
+    inbox = []
+    crash_after = None
+    submitted = []
+
+    def __init__(self, **kwargs):
+        self.walk_complete = False
+
+    def login(self):
+        return True
+
+    def iter_new_complaints(self, skip=None):
+        self.walk_complete = False
+        scraped = 0
+        for index, (complaint_id, customer_name, text) in enumerate(self.inbox):
+            if skip(complaint_id):
+                continue
+            if scraped == self.crash_after:
+                raise RuntimeError("browser crashed")
+            scraped += 1
+            yield {
+                "id": complaint_id, "customer_name": customer_name, "text": text,
+                "position": index + 1, "total": len(self.inbox)
+            }
+        self.walk_complete = True
+
+    def submit_response(self, complaint_id, response_text):
+        self.submitted.append((complaint_id, response_text))
+        return True
+
+    def is_alive(self):
+        return True
+
+    def restart(self):
+        return True
+
+    def close(self):
+        pass
+
+
+class FakeResponder:
+    model = "gpt-4o"
+
+    def __init__(self, **kwargs):
+        self.last_usage = None
+
+    def generate_response(self, complaint_text, model=None):
+        return f"Resposta: {complaint_text}"
+
+
+@pytest.fixture
+def main(tmp_path, monkeypatch):
+    for module in ["flask", "dotenv", "selenium", "openai"]:
+        pytest.importorskip(module)
+    monkeypatch.setenv("LOG_FILE", str(tmp_path / "bot.log"))
+
+    import main
+    import reclama_bot
+    import ia_responder
+    from budget import BudgetGuard
+
+    db = Database(db_path=str(tmp_path / "run.db"))
+    monkeypatch.setitem(main._services, "db", db)
+    monkeypatch.setitem(main._services, "budget_guard", BudgetGuard(db))
+    monkeypatch.setattr(main, "get_openai_client", lambda: None)
+    monkeypatch.setattr(main, "COMPLAINT_DELAY_SECONDS", 0)
+    monkeypatch.setattr(main, "TRIAGE_ENABLED", False)
+    monkeypatch.setattr(main, "PREGENERATE_WORKERS", 0)
+    monkeypatch.setattr(reclama_bot, "ReclamaBot", FakeBot)
+    monkeypatch.setattr(ia_responder, "IAResponder", FakeResponder)
+    monkeypatch.setattr(FakeBot, "submitted", [])
+    monkeypatch.setattr(FakeBot, "crash_after", None)
+    return main
+
+
+COMPANY = {"id": None, "name": "Padrão", "email": "sac@ipass.com", "password": "secret"}
+
+
+def test_run_resumes_after_crash_and_drops_complaints_that_left_the_inbox(main):
+    db = main.get_db()
+    FakeBot.inbox = [("c1", "Ana Souza", "Tag bloqueada"), ("c2", "Bruno Lima", "Cobrança dupla"),
+                     ("c3", "Carla Dias", "Estorno atrasado")]
+    FakeBot.crash_after = 2
+
+    main._run_company(COMPANY, lambda: False, "run1")
+
+    # Both scraped complaints survive the crash, with the checkpoint past the second
+    assert FakeBot.submitted == []
+    assert [row["complaint_id"] for row in db.get_pending_complaints()] == ["c1", "c2"]
+    assert db.get_checkpoint(None)["last_complaint_id"] == "c2"
+
+    # c1 was answered elsewhere meanwhile
+    FakeBot.inbox = FakeBot.inbox[1:]
+    FakeBot.crash_after = None
+
+    main._run_company(COMPANY, lambda: False, "run2")
+
+    assert FakeBot.submitted == [("c2", "Resposta: Cobrança dupla"), ("c3", "Resposta: Estorno atrasado")]
+    assert {row["complaint_id"]: row["status"] for row in db.get_all_complaints()} == \
+        {"c2": "completed", "c3": "completed"}
+    assert db.get_checkpoint(None) is None
+
+
+def test_incomplete_walk_keeps_pending_complaints(main):
+    db = main.get_db()
+    FakeBot.inbox = [("c1", "Ana Souza", "Tag bloqueada"), ("c2", "Bruno Lima", "Cobrança dupla")]
+    FakeBot.crash_after = 1
+    main._run_company(COMPANY, lambda: False, "run1")
+
+    # The next run crashes before walking the whole list, so it cannot tell c1 left the inbox
+    FakeBot.inbox = [("c3", "Carla Dias", "Estorno atrasado"), ("c2", "Bruno Lima", "Cobrança dupla")]
+    main._run_company(COMPANY, lambda: False, "run2")
+
+    assert [row["complaint_id"] for row in db.get_pending_complaints()] == ["c1", "c3"]
+    assert db.get_checkpoint(None)["last_complaint_id"] == "c3"
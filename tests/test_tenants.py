@@ -0,0 +1,115 @@
+import threading
+from tenants import TenantScheduler
+
+
+def _tenants(*ids):
+    return [{"id": tenant_id, "name": f"Empresa {tenant_id}", "check_interval_minutes": 60} for tenant_id in ids]
+
+
+class Recorder:
+    """run_tenant that records each turn and reports backlog for `backlog[id]` more turns."""
+
+    def __init__(self, backlog=None):
+        self.backlog = dict(backlog or {})
+        self.turns = []
+        self.yield_answers = []
+        self._lock = threading.Lock()
+
+    def __call__(self, tenant, should_yield):
+        with self._lock:
+            self.turns.append(tenant["id"])
+            self.yield_answers.append((tenant["id"], should_yield()))
+            left = self.backlog.get(tenant["id"], 0)
+            self.backlog[tenant["id"]] = left - 1
+        return left > 0
+
+
+def test_company_with_backlog_goes_behind_waiting_companies():
+    run = Recorder(backlog={1: 2})
+    scheduler = TenantScheduler(lambda: _tenants(1, 2, 3), run, max_workers=1)
+
+    scheduler.run_all_now()
+
+    assert scheduler.wait_idle(timeout=5)
+    assert run.turns == [1, 2, 3, 1, 1]
+
+
+def test_yield_is_asked_only_while_others_wait_for_a_worker():
+    single = Recorder()
+    scheduler = TenantScheduler(lambda: _tenants(1, 2), single, max_workers=1)
+    scheduler.run_all_now()
+    assert scheduler.wait_idle(timeout=5)
+
+    pooled = Recorder()
+    scheduler = TenantScheduler(lambda: _tenants(1, 2), pooled, max_workers=2)
+    scheduler.run_all_now()
+    assert scheduler.wait_idle(timeout=5)
+
+    # With one worker, company 2 waits while company 1 runs; nobody waits after it
+    assert single.yield_answers == [(1, True), (2, False)]
+    assert sorted(pooled.yield_answers) == [(1, False), (2, False)]
+
+
+def test_pool_size_caps_companies_running_at_once():
+    running = []
+    peak = []
+    lock = threading.Lock()
+    release = threading.Event()
+
+    def run(tenant, should_yield):
+        with lock:
+            running.append(tenant["id"])
+            peak.append(len(running))
+        release.wait(0.05)
+        with lock:
+            running.remove(tenant["id"])
+        return False
+
+    scheduler = TenantScheduler(lambda: _tenants(1, 2, 3, 4, 5), run, max_workers=2)
+    scheduler.run_all_now()
+
+    assert scheduler.wait_idle(timeout=5)
+    assert len(peak) == 5
+    assert max(peak) == 2
+    assert not scheduler.is_running()
+
+
+def test_failing_company_does_not_stop_the_others():
+    turns = []
+
+    def run(tenant, should_yield):
+        turns.append(tenant["id"])
+        if tenant["id"] == 1:
+            raise RuntimeError("login falhou")
+        return False
+
+    scheduler = TenantScheduler(lambda: _tenants(1, 2), run, max_workers=1)
+    scheduler.run_all_now()
+
+    assert scheduler.wait_idle(timeout=5)
+    assert turns == [1, 2]
+
+
+def test_refresh_drops_removed_companies():
+    tenants = _tenants(1, 2)
+    run = Recorder()
+    scheduler = TenantScheduler(lambda: tenants, run, max_workers=1)
+    scheduler.refresh()
+
+    tenants.pop()
+    scheduler.run_all_now()
+
+    assert scheduler.wait_idle(timeout=5)
+    assert run.turns == [1]
+
+
+def test_wait_idle_times_out_while_a_company_runs():
+    release = threading.Event()
+    scheduler = TenantScheduler(lambda: _tenants(1), lambda tenant, should_yield: release.wait(5) and False,
+                                max_workers=1)
+    scheduler.run_all_now()
+
+    assert not scheduler.wait_idle(timeout=0.05)
+    assert scheduler.is_running()
+    release.set()
+    assert scheduler.wait_idle(timeout=5)
@@ -0,0 +1,121 @@
+import pytest
+from database import Database
+from triage import Triage, tokenize
+
+PRAISE = "Quero agradecer a ajuda de vocês, muito obrigada e parabéns pela equipe"
+COMPLAINT = "Cobraram duas vezes a passagem na praça de pedágio e não estornaram o valor da minha fatura"
+
+
+def _complaint(text, complaint_id="c1", customer_name="Ana Souza"):
+    return {"id": complaint_id, "customer_name": customer_name, "text": text}
+
+
+@pytest.fixture
+def db(tmp_path):
+    return Database(db_path=str(tmp_path / "triage.db"))
+
+
+def test_clear_praise_gets_company_template():
+    decision = Triage(company_name="Acme Tag", routes={"agradecimento": "template"}).decide(_complaint(PRAISE))
+
+    assert decision.route == "template"
+    assert decision.skips_model
+    assert decision.response.startswith("Olá, Ana!")
+    assert "Acme Tag" in decision.response
+    assert "iPass" not in decision.response
+
+
+def test_template_needs_a_company_name():
+    decision = Triage(company_id=5, routes={"agradecimento": "template"}).decide(_complaint(PRAISE))
+
+    assert decision.route == "full"
+    assert decision.response is None
+
+
+@pytest.mark.parametrize("text", [
+    "Meu problema não foi resolvido até hoje. Obrigado pela atenção.",
+    "nada foi resolvido, não estou satisfeito",
+    "Obrigada pela ajuda de vocês",
+    "Agradeço, mas ainda não recebi o estorno, obrigado",
+])
+def test_complaints_with_thanks_go_to_the_model(text):
+    decision = Triage(company_name="iPass", routes={"agradecimento": "template"}).decide(_complaint(text))
+
+    assert decision.route == "full"
+    assert decision.response is None
+
+
+def test_template_safe_rejects_negation_few_keywords_and_mixed_categories():
+    triage = Triage(company_name="iPass")
+
+    assert triage._template_safe(tokenize(PRAISE), "agradecimento", 1.0)
+    assert not triage._template_safe(tokenize("agradeço e obrigado, mas nunca resolveram"), "agradecimento", 1.0)
+    assert not triage._template_safe(tokenize("muito obrigado"), "agradecimento", 1.0)
+    assert not triage._template_safe(tokenize(PRAISE), "agradecimento", 0.7)
+
+
+def test_simple_category_uses_cheap_model():
+    triage = Triage(routes={"cancelamento": "cheap"}, cheap_model="gpt-4o-mini")
+
+    decision = triage.decide(_complaint("Quero cancelar minha conta, já pedi o cancelamento duas vezes"))
+
+    assert (decision.route, decision.category, decision.model) == ("cheap", "cancelamento", "gpt-4o-mini")
+
+
+def test_other_languages_go_to_the_full_model():
+    triage = Triage(routes={"cancelamento": "cheap"})
+
+    decision = triage.decide(_complaint("I want to cancel my account and this is the second time I ask for it"))
+
+    assert decision.route == "full"
+
+
+def test_repeat_within_run_waits_for_the_first_response():
+    triage = Triage()
+    first = _complaint(COMPLAINT)
+    assert triage.decide(first).route == "full"
+    remembered = triage.remember(first)
+
+    pending = triage.decide(_complaint(COMPLAINT + ".", complaint_id="c2"))
+    assert pending.route == "duplicate"
+    assert pending.skips_model and pending.pending is remembered
+
+    remembered.set_result("Resposta da primeira")
+    ready = triage.decide(_complaint(COMPLAINT, complaint_id="c3"))
+    assert ready.response == "Resposta da primeira"
+
+
+def test_failed_generation_is_not_reused():
+    triage = Triage()
+    triage.remember(_complaint(COMPLAINT)).set_exception(RuntimeError("timeout"))
+
+    assert triage.decide(_complaint(COMPLAINT, complaint_id="c2")).route == "full"
+
+
+def test_repeats_are_per_customer():
+    triage = Triage()
+    triage.remember(_complaint(COMPLAINT), "Resposta")
+
+    assert triage.decide(_complaint(COMPLAINT, complaint_id="c2", customer_name="Bruno Lima")).route == "full"
+
+
+def test_stored_response_is_reused_only_within_the_company(db):
+    company_id = db.save_company("Acme", "sac@acme.com", "secret")
+    db.save_complaint("c1", "Ana Souza", COMPLAINT, "Resposta da Acme", "completed", company_id=company_id)
+    db.save_complaint("c2", "Ana Souza", COMPLAINT, "Resposta da conta padrão", "completed")
+
+    same_company = Triage(db, company_id=company_id).decide(_complaint(COMPLAINT, complaint_id="c3"))
+    env_company = Triage(db).decide(_complaint(COMPLAINT, complaint_id="c4"))
+
+    assert same_company.response == "Resposta da Acme"
+    assert env_company.response == "Resposta da conta padrão"
+
+
+def test_stored_pending_response_counts_and_failed_does_not(db):
+    db.save_complaint("c1", "Ana Souza", COMPLAINT, "Resposta gerada", "pending")
+    db.save_complaint("c2", "Bruno Lima", COMPLAINT, "Resposta que falhou", "failed")
+    triage = Triage(db)
+
+    assert triage._find_duplicate("Ana Souza", tokenize(COMPLAINT)) == "Resposta gerada"
+    assert triage._find_duplicate("Bruno Lima", tokenize(COMPLAINT)) is None
+    assert triage._find_duplicate("Ana Souza", tokenize("Minha tag parou de funcionar no estacionamento")) is None
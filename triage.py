@@ -0,0 +1,377 @@
+import os
+import re
+import math
+import logging
+import threading
+import unicodedata
+from concurrent.futures import Future
+from metrics import STAGE_SECONDS, TRIAGE_DECISIONS, TRIAGE_SECONDS_SAVED
+
+logger = logging.getLogger(__name__)
+
+# Keyword stems per category, matched against the start of accent-free words
+CATEGORY_KEYWORDS = {
+    "agradecimento": ["obrigad", "agradec", "parabens", "elogi"],
+    "cancelamento": ["cancel", "encerr", "desist", "rescis"],
+    "cobranca": ["cobr", "fatur", "debit", "boleto", "duplicad", "indevid", "valor", "juros", "multa"],
+    "reembolso": ["estorn", "reembols", "devolu", "ressarc", "restitu", "dinheiro"],
+    "tag": ["tag", "adesivo", "leitur", "pedagi", "passagem", "estacionament", "praca"],
+    "atendimento": ["atendiment", "atendent", "telefon", "chat", "protocol", "retorn", "demor", "ninguem"],
+    "cadastro": ["cadastr", "senha", "aplicativ", "app", "login", "acess", "placa", "veicul", "email"],
+}
+
+# How each category is answered: "template" (no API call), "cheap" (smaller
+# model) or "full" (default model). Categories not listed use "full".
+DEFAULT_ROUTES = {
+    "agradecimento": "template",
+    "cancelamento": "cheap",
+    "atendimento": "cheap",
+    "cadastro": "cheap",
+}
+
+# Words that turn praise into a complaint ("não foi resolvido", "nada resolvido")
+NEGATIONS = {"nao", "nada", "nunca", "nem", "nenhum", "nenhuma", "jamais", "sem", "ainda"}
+
+# Distinct keyword stems a complaint needs before it gets a template response;
+# a single "obrigado" usually just closes a complaint
+TEMPLATE_MIN_KEYWORDS = 2
+
+TEMPLATES = {
+    "agradecimento": (
+        "Olá, {first_name}! Agradecemos muito pelo seu retorno e pela confiança na {company}. "
+        "Ficamos felizes em saber da sua experiência e seguimos à disposição pelos nossos "
+        "canais de atendimento sempre que precisar."
+    ),
+}
+
+# Common words used to tell Portuguese from the other languages customers write in
+STOPWORDS = {
+    "pt": {"de", "que", "nao", "para", "com", "uma", "os", "no", "na", "do", "da", "em", "pelo", "pela", "por", "mais",
+           "foi", "meu", "minha", "estou", "voces"},
+    "es": {"que", "el", "los", "las", "por", "para", "una", "con", "pero", "mi", "estoy", "ustedes", "fue", "muy", "del"},
+    "en": {"the", "and", "to", "of", "my", "is", "was", "for", "with", "not", "you", "have", "this", "it", "i"},
+}
+
+_ZERO_WIDTH = re.compile("[\u200b-\u200f\u2060\ufeff]")
+
+
+def normalize_text(text):
+    """Normalize Unicode forms, drop invisible characters and collapse whitespace."""
+    text = unicodedata.normalize("NFKC", text or "")
+    text = _ZERO_WIDTH.sub("", text)
+    return " ".join(text.split())
+
+
+def tokenize(text):
+    """Split text into lowercase, accent-free words."""
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    stripped = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return re.findall(r"[a-z0-9]+", stripped)
+
+
+def detect_language(words):
+    """
+    Guess the language of a complaint from its most common words.
+
+    Args:
+        words (list): Tokens as returned by tokenize()
+
+    Returns:
+        str: 'pt', 'es' or 'en', or None if there are too few clues
+    """
+    hits = {language: sum(1 for word in words if word in stopwords) for language, stopwords in STOPWORDS.items()}
+    language, best = max(hits.items(), key=lambda item: item[1])
+    return language if best >= 2 else None
+
+
+def similarity(words_a, words_b):
+    """Jaccard similarity of two token lists."""
+    a, b = set(words_a), set(words_b)
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class KeywordClassifier:
+    """
+    Score complaints against keyword stems per category.
+
+    Each stem is weighted like an IDF term: stems shared by several
+    categories count less than stems unique to one.
+    """
+
+    def __init__(self, categories=None):
+        """
+        Initialize the classifier.
+
+        Args:
+            categories (dict, optional): Category name -> list of keyword stems.
+                Defaults to CATEGORY_KEYWORDS.
+        """
+        self.categories = categories or CATEGORY_KEYWORDS
+        stem_counts = {}
+        for stems in self.categories.values():
+            for stem in stems:
+                stem_counts[stem] = stem_counts.get(stem, 0) + 1
+        self.weights = {
+            stem: math.log(1 + len(self.categories) / count) for stem, count in stem_counts.items()
+        }
+
+    def classify(self, words):
+        """
+        Pick the best matching category.
+
+        Args:
+            words (list): Tokens as returned by tokenize()
+
+        Returns:
+            tuple: (category, confidence between 0 and 1); ('geral', 0.0) when
+            no keyword matches
+        """
+        scores = {}
+        for category, stems in self.categories.items():
+            score = 0.0
+            for word in words:
+                for stem in stems:
+                    if word.startswith(stem):
+                        score += self.weights[stem]
+                        break
+            if score:
+                scores[category] = score
+
+        if not scores:
+            return "geral", 0.0
+
+        category, best = max(scores.items(), key=lambda item: item[1])
+        return category, best / sum(scores.values())
+
+    def matched_stems(self, words, category):
+        """
+        List the keyword stems of a category found in a complaint.
+
+        Args:
+            words (list): Tokens as returned by tokenize()
+            category (str): Category name
+
+        Returns:
+            set: Stems matched by at least one word
+        """
+        return {
+            stem for stem in self.categories.get(category, [])
+            if any(word.startswith(stem) for word in words)
+        }
+
+
+class TriageDecision:
+    """How one complaint will be answered."""
+
+    def __init__(self, route, category, confidence, language, text, response=None, model=None, pending=None):
+        self.route = route
+        self.category = category
+        self.confidence = confidence
+        self.language = language
+        self.text = text
+        self.response = response
+        self.model = model
+        # Future of a response still being generated for an earlier duplicate
+        self.pending = pending
+
+    @property
+    def skips_model(self):
+        """True if the response is known, or being generated, without a new OpenAI call."""
+        return self.response is not None or self.pending is not None
+
+
+class Triage:
+    """
+    Local pre-processing that decides how each complaint is answered.
+
+    Repeat complaints from the same customer reuse the earlier response,
+    simple categories get a template or a cheaper model, and everything
+    else goes to the default model.
+    """
+
+    def __init__(self, db=None, company_id=None, routes=None, cheap_model=None, duplicate_threshold=None, min_confidence=None,
+                 company_name=None):
+        """
+        Initialize the triage stage.
+
+        Args:
+            db (Database, optional): Database used to find earlier complaints of a customer
+            company_id (int, optional): Company whose complaints are compared for duplicates
+            routes (dict, optional): Category -> route. Defaults to DEFAULT_ROUTES updated
+                with TRIAGE_ROUTES from the environment (e.g. "cobranca=cheap,cadastro=full").
+            cheap_model (str, optional): Model for the "cheap" route. Defaults to
+                TRIAGE_CHEAP_MODEL (gpt-4o-mini).
+            duplicate_threshold (float, optional): Word overlap above which a complaint
+                repeats an earlier one. Defaults to TRIAGE_DUPLICATE_THRESHOLD (0.85).
+            min_confidence (float, optional): Classifier confidence needed to leave the
+                default model. Defaults to TRIAGE_MIN_CONFIDENCE (0.6).
+            company_name (str, optional): Company named in template responses. Without
+                it no template is used and those complaints go to the model.
+        """
+        if routes is None:
+            routes = dict(DEFAULT_ROUTES)
+            for pair in filter(None, os.getenv("TRIAGE_ROUTES", "").split(",")):
+                category, _, route = pair.partition("=")
+                routes[category.strip()] = route.strip()
+        if cheap_model is None:
+            cheap_model = os.getenv("TRIAGE_CHEAP_MODEL", "gpt-4o-mini")
+        if duplicate_threshold is None:
+            duplicate_threshold = float(os.getenv("TRIAGE_DUPLICATE_THRESHOLD", "0.85"))
+        if min_confidence is None:
+            min_confidence = float(os.getenv("TRIAGE_MIN_CONFIDENCE", "0.6"))
+
+        self.db = db
+        self.company_id = company_id
+        self.company_name = company_name
+        self.routes = routes
+        self.cheap_model = cheap_model
+        self.duplicate_threshold = duplicate_threshold
+        self.min_confidence = min_confidence
+        self.classifier = KeywordClassifier()
+
+        # Complaints of this run, per customer: [(words, Future of the response)]
+        self._recent = {}
+        self._recent_lock = threading.Lock()
+        # Running mean of default-model generation time, to estimate time saved
+        self._full_seconds = 0.0
+        self._full_count = 0
+
+    @STAGE_SECONDS.time(stage="triage")
+    def decide(self, complaint):
+        """
+        Decide how to answer a complaint.
+
+        Args:
+            complaint (dict): Scraped complaint with 'id', 'customer_name' and 'text'
+
+        Returns:
+            TriageDecision: Route, category and, for templates and duplicates, the response
+        """
+        text = normalize_text(complaint["text"])
+        words = tokenize(text)
+        language = detect_language(words)
+        category, confidence = self.classifier.classify(words)
+
+        previous = self._find_duplicate(complaint.get("customer_name"), words)
+        if isinstance(previous, Future):
+            if previous.done() and previous.exception() is None:
+                return TriageDecision("duplicate", category, confidence, language, text, response=previous.result())
+            return TriageDecision("duplicate", category, confidence, language, text, pending=previous)
+        if previous is not None:
+            return TriageDecision("duplicate", category, confidence, language, text, response=previous)
+
+        route = self.routes.get(category, "full")
+        # Keywords and templates are Portuguese; anything else or uncertain goes to the full model
+        if confidence < self.min_confidence or language not in ("pt", None):
+            route = "full"
+
+        if route == "template" and (not self.company_name or not self._template_safe(words, category, confidence)):
+            route = "full"
+
+        if route == "template" and category in TEMPLATES:
+            first_name = (complaint.get("customer_name") or "").split(" ")[0] or "cliente"
+            response = TEMPLATES[category].format(first_name=first_name, company=self.company_name)
+            return TriageDecision("template", category, confidence, language, text, response=response)
+
+        if route == "cheap":
+            return TriageDecision("cheap", category, confidence, language, text, model=self.cheap_model)
+
+        return TriageDecision("full", category, confidence, language, text)
+
+    def remember(self, complaint, response=None):
+        """
+        Remember a complaint of this run so later repeats reuse its response.
+
+        Complaints are remembered when they are queued, before their response
+        exists, so a repeat read while the first one is still being generated
+        waits for that response instead of generating another.
+
+        Args:
+            complaint (dict): Complaint with 'customer_name' and 'text'
+            response (str, optional): Response, if it is already known
+
+        Returns:
+            Future: Resolve it with set_result() once the response is generated
+        """
+        future = Future()
+        if response is not None:
+            future.set_result(response)
+
+        customer = complaint.get("customer_name")
+        if customer:
+            words = tokenize(normalize_text(complaint["text"]))
+            with self._recent_lock:
+                self._recent.setdefault(customer, []).append((words, future))
+        return future
+
+    def record(self, complaint, decision, response_text, generation_seconds):
+        """
+        Count a decision once its response has been produced.
+
+        Args:
+            complaint (dict): The complaint that was answered
+            decision (TriageDecision): Decision returned by decide()
+            response_text (str): Response sent to the customer
+            generation_seconds (float): Time spent producing the response
+        """
+        TRIAGE_DECISIONS.inc(route=decision.route, category=decision.category)
+
+        if decision.route == "full":
+            self._full_count += 1
+            self._full_seconds += (generation_seconds - self._full_seconds) / self._full_count
+        else:
+            expected = self._full_seconds or self._observed_generation_seconds()
+            TRIAGE_SECONDS_SAVED.inc(max(0.0, expected - generation_seconds))
+
+        logger.info(
+            "Complaint ID %s triaged as %s (%s, %.0f%% confidence)",
+            complaint["id"], decision.route, decision.category, decision.confidence * 100
+        )
+
+    def _find_duplicate(self, customer_name, words):
+        """
+        Find an earlier, near-identical complaint of the same customer.
+
+        Returns:
+            The response (str) of a stored complaint, the Future of the response
+            to a complaint of this run, or None
+        """
+        if not customer_name or not words:
+            return None
+
+        with self._recent_lock:
+            recent = list(self._recent.get(customer_name, []))
+        for previous_words, future in recent:
+            failed = future.done() and future.exception() is not None
+            if not failed and similarity(words, previous_words) >= self.duplicate_threshold:
+                return future
+
+        if self.db is not None:
+            # Pending rows with a response were generated by a run that stopped before submitting them
+            for row in self.db.get_complaints_by_customer(customer_name, company_id=self.company_id):
+                if row["status"] not in ("completed", "pending") or not row["response_text"]:
+                    continue
+                if similarity(words, tokenize(row["complaint_text"] or "")) >= self.duplicate_threshold:
+                    return row["response_text"]
+        return None
+
+    def _template_safe(self, words, category, confidence):
+        """
+        Check that a complaint clearly matches a template category.
+
+        Templates are posted without review, so they need only keywords of
+        their category, several of them, and no negation anywhere in the text.
+        """
+        return (
+            confidence >= 1.0
+            and len(self.classifier.matched_stems(words, category)) >= TEMPLATE_MIN_KEYWORDS
+            and not NEGATIONS.intersection(words)
+        )
+
+    @staticmethod
+    def _observed_generation_seconds():
+        """Mean OpenAI generation time recorded so far, for the first run without a baseline."""
+        state = STAGE_SECONDS.samples().get(("openai",))
+        return state["sum"] / state["count"] if state and state["count"] else 0.0